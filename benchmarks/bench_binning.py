@@ -0,0 +1,67 @@
+# Throughput of the binning pyramid compared with binning every level separately.
+#   python benchmarks/bench_binning.py [--levels 1,2,4,8] [--repeat 10]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binning import BinningPyramid, bin_frame
+from harness import peak_memory_mib, summarize
+
+
+FRAME_SIZES = [(512, 512), (1024, 1024), (2048, 2048), (3072, 3072)]
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(levels, repeat):
+    rng = np.random.default_rng(0)
+    print(f"levels {','.join(map(str, levels))}")
+    print(f"{'frame':>11} {'pyramid ms':>11} {'separate ms':>12} {'single ms':>10} {'pyramid fps':>12} {'MPix/s':>8}")
+    for h, w in FRAME_SIZES:
+        frame = rng.integers(0, 65535, size=(h, w), dtype=np.uint16)
+        pyramid = BinningPyramid(levels)
+        pyramid.compute(frame)  # allocate the buffers outside the measurement
+        t_pyramid = best_time(lambda: pyramid.compute(frame), repeat)
+        t_separate = best_time(lambda: [bin_frame(frame, level) for level in levels], repeat)
+        # cost of the cheapest non trivial level alone, for "several cost little more than one"
+        single = min([level for level in levels if level > 1] or [1])
+        t_single = best_time(lambda: bin_frame(frame, single), repeat)
+        print(f"{h:>5}x{w:<5} {t_pyramid * 1e3:>11.2f} {t_separate * 1e3:>12.2f} {t_single * 1e3:>10.2f} "
+              f"{1 / t_pyramid:>12.1f} {h * w / t_pyramid / 1e6:>8.0f}")
+
+
+def benchmark(quick=False):
+    # Metrics for run_benchmarks.py: all levels of a 2048x2048 frame
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 65535, size=(2048, 2048), dtype=np.uint16)
+    pyramid = BinningPyramid(range(1, 9))
+    pyramid.compute(frame)
+    times = []
+    for _ in range(10 if quick else 50):
+        start = time.perf_counter()
+        pyramid.compute(frame)
+        times.append(time.perf_counter() - start)
+    result = {"frames_per_s": round(len(times) / sum(times), 1)}
+    result.update(summarize(times, "", 1e3, "ms"))
+    result["peak_mib"] = peak_memory_mib()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the binning pyramid compared with binning every level separately.")
+    parser.add_argument("--levels", default="1,2,3,4,5,6,7,8")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run([int(level) for level in args.levels.split(',')], args.repeat)
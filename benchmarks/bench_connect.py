@@ -0,0 +1,82 @@
+# Connect and reconnect latency of the OPC UA worker against the simulator: time from
+# starting the worker until CONNECTED, and from a dropped connection until CONNECTED again
+# (loss detection by the health checks, backoff, connect and subscription restore).
+#   python benchmarks/bench_connect.py [--quick]
+import argparse
+import json
+import time
+
+from harness import free_port, peak_memory_mib, summarize, wait_until
+
+from PyQt6 import QtCore
+
+from opcua_simulator import DEFAULT_NODES, PlcSimulator, variable_node_ids
+from opcua_worker import ConnectionState, OpcuaWorker
+
+
+class WorkerUnderTest:
+    def __init__(self, url, node_list):
+        self.states = []  # (time, state)
+        self.thread = QtCore.QThread()
+        self.worker = OpcuaWorker(url, "admin1", "admin1", node_list)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.start)
+        self.worker.status_changed.connect(lambda state: self.states.append((time.perf_counter(), state)))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.worker.stop_requested.emit()
+        self.thread.quit()
+        self.thread.wait()
+
+    @property
+    def state(self):
+        return self.states[-1][1] if self.states else None
+
+
+def run(quick=False, variables=100):
+    repeat = 3 if quick else 10
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    # in process so the benchmark can drop the connections at a known time
+    url = f"opc.tcp://127.0.0.1:{free_port()}"
+    simulator = PlcSimulator(url, variables, rate=1.0)
+    simulator.start()
+    node_list = DEFAULT_NODES + variable_node_ids(variables)
+    connects = []
+    reconnects = []
+    try:
+        for _ in range(repeat):
+            under_test = WorkerUnderTest(url, node_list)
+            t0 = time.perf_counter()
+            under_test.start()
+            if not wait_until(app, lambda: under_test.state == ConnectionState.CONNECTED, 20):
+                raise RuntimeError("no connection to the simulator")
+            connects.append(under_test.states[-1][0] - t0)
+            under_test.stop()
+
+        under_test = WorkerUnderTest(url, node_list)
+        under_test.start()
+        wait_until(app, lambda: under_test.state == ConnectionState.CONNECTED, 20)
+        for _ in range(repeat):
+            count = len(under_test.states)
+            t0 = time.perf_counter()
+            simulator.disconnect_clients()
+            if not wait_until(app, lambda: len(under_test.states) > count and under_test.state == ConnectionState.CONNECTED, 30):
+                raise RuntimeError("no reconnect")
+            reconnects.append(under_test.states[-1][0] - t0)
+        under_test.stop()
+    finally:
+        simulator.stop()
+    result = {}
+    result.update(summarize(connects, "connect_", 1e3, "ms"))
+    result.update(summarize(reconnects, "reconnect_", 1e3, "ms"))
+    result["peak_mib"] = peak_memory_mib()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    print(json.dumps(run(parser.parse_args().quick), indent=2))
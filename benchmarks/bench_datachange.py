@@ -0,0 +1,69 @@
+# Cost of MySubHandler.datachange_notification per notification, with the node history
+# attached like in OpcuaWorker.
+#   python benchmarks/bench_datachange.py [--quick]
+import argparse
+from datetime import datetime
+import json
+import time
+
+from harness import peak_memory_mib, summarize
+
+from opcua import ua
+
+from client_sub import MySubHandler
+from history import NodeHistory
+
+
+class FakeNode:
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+
+
+class FakeData:
+    # what python-opcua passes as data: data.monitored_item.Value is the DataValue
+    def __init__(self, value):
+        self.monitored_item = self
+        self.Value = value
+
+
+def run(quick=False):
+    n_nodes = 200
+    n_notifications = 20000 if quick else 200000
+    handler = MySubHandler(NodeHistory(65536))
+    node_ids = [f"ns=4;s=MAIN.aSim[{i}]" for i in range(n_nodes)]
+    handler.register(node_ids)
+    nodes = [FakeNode(handler.resolve(node_id)) for node_id in node_ids]
+    samples = []
+    for i in range(1000):
+        data_value = ua.DataValue(ua.Variant(float(i), ua.VariantType.Double))
+        data_value.SourceTimestamp = data_value.ServerTimestamp = datetime.utcnow()
+        samples.append((float(i), FakeData(data_value)))
+
+    # the fastest of several rounds, single rounds vary a lot on shared machines
+    best = None
+    clock = time.perf_counter
+    for _ in range(5):
+        latencies = []
+        start = clock()
+        for i in range(n_notifications // 5):
+            value, data = samples[i % 1000]
+            node = nodes[i % n_nodes]
+            t0 = clock()
+            handler.datachange_notification(node, value, data)
+            latencies.append(clock() - t0)
+            if i % 1000 == 999:
+                handler.take_changes()  # the GUI drains every frame
+        elapsed = clock() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, latencies)
+    elapsed, latencies = best
+    result = {"notifications_per_s": round(len(latencies) / elapsed, 1)}
+    result.update(summarize(latencies))
+    result["peak_mib"] = peak_memory_mib()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    print(json.dumps(run(parser.parse_args().quick), indent=2))
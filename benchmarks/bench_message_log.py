@@ -0,0 +1,62 @@
+# Cost of Ui_MainWindow.show_message while the error_handling table fills up to its
+# row limit and stays there, including the batched inserts and the repaint of the view.
+#   python benchmarks/bench_message_log.py [--quick]
+import argparse
+import json
+import string
+import time
+
+from harness import close_window, create_window, peak_memory_mib, start_simulator, stop_simulator, summarize
+
+
+def distinct_text(i):
+    # digits are folded into one pattern by the message log, letters are not
+    letters = []
+    while True:
+        i, digit = divmod(i, 26)
+        letters.append(string.ascii_lowercase[digit])
+        if i == 0:
+            return "".join(letters)
+
+
+def run(quick=False):
+    n_messages = 3000 if quick else 20000
+    events_every = 50  # messages between two event loop passes, like a busy GUI
+    simulator, url = start_simulator()
+    try:
+        app, window = create_window(url)
+        max_rows = window.message_log.max_rows
+        calls = []
+        flushes = []
+        filling = []  # s per message until the table is full
+        steady = []  # s per message at the row limit
+        for i in range(n_messages):
+            t0 = time.perf_counter()
+            window.show_message("Benchmark", f"Meldung {distinct_text(i)} vom Prüfstand")
+            t1 = time.perf_counter()
+            calls.append(t1 - t0)
+            if i % events_every == events_every - 1:
+                window.message_log.flush()
+                app.processEvents()
+                t2 = time.perf_counter()
+                flushes.append(t2 - t1)
+            (filling if window.message_log.rowCount() < max_rows else steady).append(time.perf_counter() - t0)
+        result = {
+            "messages_per_s": round(n_messages / (sum(calls) + sum(flushes)), 1),
+            "filling_per_s": round(len(filling) / sum(filling), 1) if filling else None,
+            "steady_per_s": round(len(steady) / sum(steady), 1) if steady else None,
+            "rows": window.message_log.rowCount(),
+        }
+        result.update(summarize(calls, "call_"))
+        result.update(summarize(flushes, "flush_", 1e3, "ms"))
+        result["peak_mib"] = peak_memory_mib()
+        close_window(app, window)
+    finally:
+        stop_simulator(simulator)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    print(json.dumps(run(parser.parse_args().quick), indent=2))
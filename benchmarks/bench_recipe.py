@@ -0,0 +1,86 @@
+# End-to-end recipe load: from the drop of a recipe file until the PLC acknowledged the
+# scan parameters (parse + validation in the background, retrieve_variables_json_measurement,
+# advance_update_parameters and the Write call), plus the GUI thread part alone.
+#   python benchmarks/bench_recipe.py [--quick]
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from harness import close_window, create_window, peak_memory_mib, start_simulator, stop_simulator, summarize, wait_until
+
+from opcua_worker import ConnectionState
+
+
+RECIPE = {
+    "ScanParameter": {"Mode(StopAndGo/Continuous)": "StopAndGo", "Z-Shift Range": 0.0, "numberOfPositions": 360,
+                      "numberOfImagesPerPosition": 1, "numberOfSkippedImages": 0,
+                      "distanceSourceObject(mm)": 300.0, "distanceSourceDetector(mm)": 900.0},
+    "PreScanParameter": {"numberOfPositions": 36, "numberOfImagesPerPosition": 1},
+    "Normalization": {"normalizationMethod(flat field/lut)": "flat field", "numberOfDarkFrames": 10, "numberOfLutSteps": 4},
+    "ImageSensor0": {"flipValue": 0, "exposureTime(ms)": 50.0, "gain(mdB)": 0, "blackLevel": 100},
+    "ImageSensor1": {"gain(mdB)": 0},
+    "Scintilator": {"scintilatorId": "CsI", "centerOfRotation(pixels)": 768.0, "middlePlane(pixels)": 768.0, "pixelSize(mm)": 0.1},
+    "Source": {"voltage(kV)": 150.0, "current(mA)": 0.2, "focalSpotSize(small/large)": "Small"},
+}
+
+
+def run(quick=False):
+    iterations = 10 if quick else 50
+    simulator, url = start_simulator()
+    try:
+        app, window = create_window(url)
+        if not wait_until(app, lambda: window.status == ConnectionState.CONNECTED, 20):
+            raise RuntimeError("no connection to the simulator")
+        window.changePage(1)  # the recipe drop target is on the lazily built Advance page
+        acknowledged = []
+        window.opcua_worker.parameters_written.connect(lambda failed: acknowledged.append(time.perf_counter()))
+        gui_times = []
+        retrieve = window.retrieve_variables_json_measurement
+        # the updated signal is connected to the bound method, measure through a wrapper slot
+        window.groupBox_8.updated.disconnect()
+
+        def timed_retrieve():
+            t0 = time.perf_counter()
+            retrieve()
+            gui_times.append(time.perf_counter() - t0)
+        window.groupBox_8.updated.connect(timed_retrieve)
+
+        end_to_end = []
+        with tempfile.TemporaryDirectory() as directory:
+            def write_recipe(i):
+                # new content every time, the recipe cache would hide the parse otherwise. The modes
+                # alternate, each recipe only fills the fields of its own mode.
+                recipe = json.loads(json.dumps(RECIPE))
+                recipe["ScanParameter"]["numberOfPositions"] = 360 + i
+                recipe["ScanParameter"]["Mode(StopAndGo/Continuous)"] = ("StopAndGo", "Continuous")[i % 2]
+                path = os.path.join(directory, f"recipe_{i}.json")
+                with open(path, 'w') as f:
+                    json.dump(recipe, f)
+                return path
+
+            # the first recipe goes to the fresh window, like the first drop of a user
+            for i in range(iterations):
+                path = write_recipe(i)
+                count = len(acknowledged)
+                t0 = time.perf_counter()
+                window.groupBox_8.loader.load(path)
+                if not wait_until(app, lambda: len(acknowledged) > count, 10):
+                    raise RuntimeError("parameters were not acknowledged")
+                end_to_end.append(acknowledged[-1] - t0)
+        result = {"loads_per_s": round(iterations / sum(end_to_end), 1),
+                  "first_load_ms": round(end_to_end[0] * 1e3, 3)}
+        result.update(summarize(end_to_end, "", 1e3, "ms"))
+        result.update(summarize(gui_times, "gui_", 1e3, "ms"))
+        result["peak_mib"] = peak_memory_mib()
+        close_window(app, window)
+    finally:
+        stop_simulator(simulator)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    print(json.dumps(run(parser.parse_args().quick), indent=2))
@@ -0,0 +1,83 @@
+# Startup of the GUI in a fresh process: time to the first paint of the window, until the
+# deferred services (OPC UA worker, preprocessing, reconstruction queue) exist and until the
+# simulator is connected. Times from launch rely on perf_counter being CLOCK_MONOTONIC in
+# every process, which holds on Linux.
+#   python benchmarks/bench_startup.py [--quick]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import REPO, peak_memory_mib, start_simulator, stop_simulator, summarize
+
+from main import FIRST_PAINT_TARGET_MS
+
+
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {repo!r})
+os.chdir({repo!r})
+import main
+from PyQt6 import QtCore, QtWidgets
+app = QtWidgets.QApplication(sys.argv[:1])
+window = main.Ui_MainWindow()
+times = {{}}
+window.services_started.connect(lambda: times.setdefault("services", time.perf_counter()))
+
+def poll():
+    if window.status == 1:  # ConnectionState.CONNECTED
+        times["connected"] = time.perf_counter()
+        window.close()
+        app.quit()
+timer = QtCore.QTimer()
+timer.timeout.connect(poll)
+timer.start(1)
+QtCore.QTimer.singleShot(20000, app.quit)
+window.show()
+app.exec()
+print(json.dumps({{"started": main.STARTED, "first_paint_ms": window.first_paint_ms, **times}}))
+"""
+
+
+def launch(url):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", LOCAL_GUI_OPCUA_URL=url)
+    launched = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", CHILD.format(repo=REPO)], env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, text=True, timeout=60)
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if "connected" not in result:
+        raise RuntimeError("no connection to the simulator")
+    first_paint = result["started"] + result["first_paint_ms"] / 1000
+    return (result["first_paint_ms"] / 1000, first_paint - launched,
+            result["services"] - launched, result["connected"] - launched)
+
+
+def run(quick=False):
+    repeat = 3 if quick else 10
+    simulator, url = start_simulator()
+    samples = []
+    try:
+        launch(url)  # compiles the cached UI form
+        for _ in range(repeat):
+            samples.append(launch(url))
+    finally:
+        stop_simulator(simulator)
+    paint, launch_paint, services, connected = zip(*samples)
+    result = {}
+    result.update(summarize(paint, "first_paint_", 1e3, "ms"))
+    result.update(summarize(launch_paint, "launch_to_paint_", 1e3, "ms"))
+    result.update(summarize(services, "launch_to_services_", 1e3, "ms"))
+    result.update(summarize(connected, "launch_to_connected_", 1e3, "ms"))
+    result["peak_mib"] = peak_memory_mib()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    result = run(parser.parse_args().quick)
+    print(json.dumps(result, indent=2))
+    print(f"first paint p50 {result['first_paint_p50_ms']:.0f} ms, target {FIRST_PAINT_TARGET_MS} ms: "
+          f"{'met' if result['first_paint_p50_ms'] <= FIRST_PAINT_TARGET_MS else 'missed'}")
@@ -0,0 +1,69 @@
+# Jitter of the 16 ms update_GUI timer and the time spent in update_GUI while the
+# simulator pushes many changing variables that are shown in widgets.
+#   python benchmarks/bench_update_gui.py [--quick]
+import argparse
+import json
+import time
+
+from harness import close_window, create_window, peak_memory_mib, start_simulator, stop_simulator, summarize, wait_until
+
+import main
+from opcua_simulator import variable_node_ids
+from opcua_worker import ConnectionState
+
+
+def run(quick=False, variables=1000, rate=10.0):
+    duration = 5 if quick else 20
+    ticks = []  # (start, duration) of every update_GUI call
+    update_gui = main.Ui_MainWindow.update_GUI
+
+    def timed_update_gui(window):
+        t0 = time.perf_counter()
+        update_gui(window)
+        ticks.append((t0, time.perf_counter() - t0))
+    # patched before the window connects its timer
+    main.Ui_MainWindow.update_GUI = timed_update_gui
+
+    simulator, url = start_simulator(variables, rate)
+    try:
+        app, window = create_window(url)
+        node_ids = variable_node_ids(variables)
+        # the worker is created with window.node_list after the first paint
+        window.node_list.extend(node_ids)
+        if not wait_until(app, lambda: window.status == ConnectionState.CONNECTED, 20):
+            raise RuntimeError("no connection to the simulator")
+        # every value goes to one of a few line edits, like the position displays
+        widgets = [window.R_nActPos, window.ZB_nActPos]
+        for i, node_id in enumerate(node_ids):
+            widget = widgets[i % len(widgets)]
+            window.gui_updaters[window.sub_handler.resolve(node_id)] = lambda value, widget=widget: window.show_position(widget, value)
+        seq_start = window.sub_handler.seq
+        del ticks[:]
+        t_start = time.perf_counter()
+        wait_until(app, lambda: time.perf_counter() - t_start > duration, duration + 1)
+        elapsed = time.perf_counter() - t_start
+        notifications = window.sub_handler.seq - seq_start
+        starts = [start for start, _ in ticks]
+        intervals = [b - a for a, b in zip(starts, starts[1:])]
+        jitter = [abs(interval - window.update_gui_timer.interval() / 1000) for interval in intervals]
+        result = {
+            "notifications_per_s": round(notifications / elapsed, 1),
+            "frames_per_s": round(len(ticks) / elapsed, 1),
+        }
+        result.update(summarize(jitter, "jitter_", 1e3, "ms"))
+        result.update(summarize([d for _, d in ticks], "update_", 1e3, "ms"))
+        result["peak_mib"] = peak_memory_mib()
+        close_window(app, window)
+    finally:
+        main.Ui_MainWindow.update_GUI = update_gui
+        stop_simulator(simulator)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--variables", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=10.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.quick, args.variables, args.rate), indent=2))
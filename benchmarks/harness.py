@@ -0,0 +1,126 @@
+# Helpers shared by the benchmarks: latency summaries, peak memory, the simulator
+# process, an offscreen main window and the baseline comparison.
+import json
+import os
+import resource
+import socket
+import sys
+import time
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def summarize(samples, prefix="", unit=1e6, suffix="us"):
+    # samples in s -> p50 / p99 / max in microseconds (or unit / suffix)
+    if len(samples) == 0:
+        return {}
+    p50, p99 = np.percentile(samples, (50, 99))
+    return {f"{prefix}p50_{suffix}": round(float(p50) * unit, 3),
+            f"{prefix}p99_{suffix}": round(float(p99) * unit, 3),
+            f"{prefix}max_{suffix}": round(float(np.max(samples)) * unit, 3)}
+
+
+def peak_memory_mib():
+    # peak resident set size of this process, ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(app, condition, timeout):
+    # Process Qt events until condition() is true, returns False on timeout
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.001)
+    return True
+
+
+def start_simulator(variables=10, rate=10.0):
+    # Simulator in its own process on a free port, returns (process, url)
+    from headless import start_simulator
+    url = f"opc.tcp://127.0.0.1:{free_port()}"
+    return start_simulator(url, variables, ["--rate", str(rate)]), url
+
+
+def stop_simulator(process):
+    import signal
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(5)
+    except Exception:
+        process.kill()
+
+
+def create_window(url):
+    # Offscreen Ui_MainWindow connected to url. Returns (app, window).
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ["LOCAL_GUI_OPCUA_URL"] = url
+    os.chdir(REPO)  # the .ui file is loaded relative to the working directory
+    from PyQt6 import QtWidgets
+    import main
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = main.Ui_MainWindow()
+    window.show()
+    return app, window
+
+
+def close_window(app, window):
+    window.close()
+    app.processEvents()
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+
+def lower_is_better(metric):
+    # single worst samples are reported but too noisy to compare
+    return metric.endswith(("_us", "_ms", "_s", "_mib")) and "max_" not in metric and not higher_is_better(metric)
+
+
+def load_baselines(path=BASELINE_PATH, mode="full"):
+    # baselines.json: {"full" | "quick": {benchmark: {metric: value}}}, quick runs have their own
+    try:
+        with open(path) as f:
+            return json.load(f).get(mode, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baselines(results, path=BASELINE_PATH, mode="full"):
+    try:
+        with open(path) as f:
+            baselines = json.load(f)
+    except (OSError, ValueError):
+        baselines = {}
+    baselines.setdefault(mode, {}).update(results)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+
+def compare(results, baselines, tolerance):
+    # Returns [(benchmark, metric, baseline, current, relative change)] of metrics that got
+    # worse by more than tolerance, throughput counts as worse when it drops
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baselines.get(name, {}).get(metric)
+            if not isinstance(base, (int, float)) or not isinstance(value, (int, float)) or base == 0:
+                continue
+            change = (value - base) / abs(base)
+            if (higher_is_better(metric) and change < -tolerance) or (lower_is_better(metric) and change > tolerance):
+                regressions.append((name, metric, base, value, change))
+    return regressions
@@ -0,0 +1,123 @@
+# Runs the benchmark suite, every benchmark in a fresh process with an offscreen Qt
+# platform and a temporary home directory, and compares the results with the stored
+# baselines in baselines.json.
+#   python benchmarks/run_benchmarks.py                  all benchmarks, compare with the baselines
+#   python benchmarks/run_benchmarks.py --quick --check  short runs, exit code 1 on a regression
+#   python benchmarks/run_benchmarks.py --repeat 5 --only datachange,connect --save-baseline
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from harness import BASELINE_PATH, compare, load_baselines, save_baselines
+
+
+# name -> (module, function returning {metric: value})
+BENCHMARKS = {
+    "datachange": ("bench_datachange", "run"),
+    "show_message": ("bench_message_log", "run"),
+    "recipe_load": ("bench_recipe", "run"),
+    "update_gui": ("bench_update_gui", "run"),
+    "connect": ("bench_connect", "run"),
+    "binning": ("bench_binning", "benchmark"),
+    "startup": ("bench_startup", "run"),
+}
+
+
+def run_child(name, quick):
+    # Inside the benchmark process: run it and print the result as the last line
+    module, function = BENCHMARKS[name]
+    result = getattr(importlib.import_module(module), function)(quick)
+    print(json.dumps(result))
+
+
+def run_isolated(name, quick, home):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", HOME=home)
+    command = [sys.executable, os.path.abspath(__file__), "--child", name] + (["--quick"] if quick else [])
+    process = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=900)
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {"error": f"exit code {process.returncode}"}
+    try:
+        return json.loads(lines[-1])
+    except ValueError:
+        return {"error": lines[-1]}
+
+
+def median_results(runs):
+    # Median of every numeric metric over repeated runs of one benchmark, single runs on
+    # a shared machine are off by 30 % and more. A failed run fails the benchmark.
+    for metrics in runs:
+        if "error" in metrics:
+            return metrics
+    result = {}
+    for metric, value in runs[0].items():
+        values = [metrics[metric] for metrics in runs if isinstance(metrics.get(metric), (int, float))]
+        result[metric] = round(statistics.median(values), 3) if len(values) == len(runs) and not isinstance(value, bool) else value
+    return result
+
+
+def print_results(results, baselines):
+    for name, metrics in results.items():
+        print(name)
+        base = baselines.get(name, {})
+        for metric, value in metrics.items():
+            line = f"  {metric:<24} {value!s:>12}"
+            if isinstance(value, (int, float)) and isinstance(base.get(metric), (int, float)) and base[metric]:
+                line += f"   baseline {base[metric]!s:>12} ({(value - base[metric]) / abs(base[metric]):+.0%})"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the GUI's hot paths")
+    parser.add_argument("--only", help="comma separated names: " + ",".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for CI")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark, the median of each metric is reported")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if a metric regressed")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.quick)
+        return 0
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr, flush=True)
+            results[name] = median_results([run_isolated(name, args.quick, home) for _ in range(max(args.repeat, 1))])
+
+    mode = "quick" if args.quick else "full"
+    baselines = load_baselines(args.baseline, mode)
+    print_results(results, baselines)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = [name for name, metrics in results.items() if "error" in metrics]
+    if args.save_baseline:
+        save_baselines({name: metrics for name, metrics in results.items() if name not in failed}, args.baseline, mode)
+        print(f"baselines saved to {args.baseline}")
+        return 1 if failed else 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for name, metric, base, value, change in regressions:
+        print(f"REGRESSION {name}.{metric}: {base} -> {value} ({change:+.0%})")
+    if args.check and (regressions or failed):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+def sum_dtype(dtype):
+    # Accumulator for block sums of dtype: uint32 holds the sums of 8 and 16 bit frames up to
+    # 256 x 256 blocks, wider integers get 64 bits, floats are summed as float32 / float64.
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return np.dtype(np.float64 if dtype.itemsize > 4 else np.float32)
+    if dtype.kind in 'ub' and dtype.itemsize <= 2:
+        return np.dtype(np.uint32)
+    return np.dtype(np.uint64 if dtype.kind == 'u' else np.int64)
+
+
+def block_mean(sums, count, out):
+    # Mean of block sums in the dtype of out, integer frames keep the floor of the mean
+    if out.dtype.kind == 'f':
+        return np.divide(sums, count, out=out, casting='unsafe')
+    return np.floor_divide(sums, count, out=out, casting='unsafe')
+
+
+def block_sum(source, step, out=None, rows=None):
+    # Sum over step x step blocks, edges that do not fill a block are cropped. The sums have the
+    # dtype of out, sum_dtype(source.dtype) without out. Strided slice additions over whole rows
+    # are much faster than a reshape + sum over the non-contiguous block axes. rows is an optional
+    # (h // step, w) work buffer in the same dtype.
+    h = source.shape[0] // step
+    w = source.shape[1] // step
+    dtype = out.dtype if out is not None else sum_dtype(source.dtype)
+    if rows is None:
+        rows = np.empty((h, source.shape[1]), dtype=dtype)
+    if out is None:
+        out = np.empty((h, w), dtype=dtype)
+    if step == 1:
+        out[...] = source[:h, :w]
+        return out
+    np.add(source[0:h * step:step], source[1:h * step:step], out=rows, dtype=dtype)
+    for i in range(2, step):
+        rows += source[i:h * step:step]
+    np.add(rows[:, 0:w * step:step], rows[:, 1:w * step:step], out=out)
+    for i in range(2, step):
+        out += rows[:, i:w * step:step]
+    return out
+
+
+def bin_frame(frame, factor):
+    # Mean over factor x factor blocks, edges that do not fill a block are cropped
+    if factor <= 1:
+        return frame
+    sums = block_sum(frame, factor)
+    return block_mean(sums, factor * factor, np.empty(sums.shape, dtype=frame.dtype))
+
+
+def plan_levels(levels):
+    # For every level the largest smaller level that divides it. Block sums of a level
+    # are computed from the sums of that parent, e.g. 8 from 4, 4 from 2, 6 from 3.
+    levels = sorted(set(int(level) for level in levels if int(level) >= 1))
+    plan = {}
+    for level in levels:
+        parents = [p for p in levels if p < level and level % p == 0]
+        plan[level] = max(parents) if parents else 1
+    return levels, plan
+
+
+class BinningPyramid:
+    # Builds all requested binning levels of a frame in one pass. Intermediate block
+    # sums are reused by the higher levels and all buffers are allocated once per frame
+    # shape, so adding a level costs only a reduction of an already reduced image.
+    def __init__(self, levels):
+        self.levels, self.plan = plan_levels(levels)
+        self._shape = None
+        self._sums = {}  # level -> block sums in sum_dtype of the frame
+        self._rows = {}  # level -> row sums, work buffer of block_sum
+        self._out = {}  # level -> mean image in the frame dtype
+
+    def _allocate(self, shape, dtype):
+        self._shape = (shape, dtype)
+        self._sums.clear()
+        self._rows.clear()
+        self._out.clear()
+        h, w = shape
+        accumulator = sum_dtype(dtype)
+        for level in self.levels:
+            if level == 1:
+                continue
+            parent_width = w // self.plan[level]
+            self._rows[level] = np.empty((h // level, parent_width), dtype=accumulator)
+            self._sums[level] = np.empty((h // level, w // level), dtype=accumulator)
+            self._out[level] = np.empty((h // level, w // level), dtype=dtype)
+
+    def compute(self, frame, copy=False):
+        # Returns {level: binned frame}. Without copy the arrays are reused by the next call.
+        if self._shape != (frame.shape, frame.dtype):
+            self._allocate(frame.shape, frame.dtype)
+        result = {}
+        for level in self.levels:
+            if level == 1:
+                result[1] = frame.copy() if copy else frame
+                continue
+            parent = self.plan[level]
+            source = frame if parent == 1 else self._sums[parent]
+            sums = block_sum(source, level // parent, out=self._sums[level], rows=self._rows[level])
+            out = block_mean(sums, level * level, self._out[level])
+            result[level] = out.copy() if copy else out
+        return result
@@ -1,27 +1,137 @@
 from opcua.common.subscription import SubHandler
+from opcua import ua
+import threading
+
+
+class NodeRecord:
+    # Latest sample of one node, updated in place to avoid allocations per notification
+    __slots__ = ("value", "source_timestamp", "server_timestamp", "status", "seq")
 
-class MySubHandler(SubHandler):
     def __init__(self):
+        self.value = None
+        self.source_timestamp = None
+        self.server_timestamp = None
+        self.status = None
+        self.seq = 0
+
+    def as_tuple(self):
+        return (self.value, self.source_timestamp, self.server_timestamp, self.status, self.seq)
+
+
+class MySubHandler(SubHandler):
+    # Runs on the opcua subscription thread. All state is guarded by a single lock
+    # that is only held for a few attribute assignments, readers get copies.
+    def __init__(self, history=None):
         super().__init__()
-        self.node_values = {}
+        self.history = history  # optional history.NodeHistory fed with every numeric sample
+        self.recorder = None  # optional session_log.SessionRecorder fed with every notification
+        self._lock = threading.Lock()
+        self._records = {}  # NodeId -> NodeRecord
+        self._node_ids = {}  # node id string -> NodeId, resolved once
+        self._seq = 0  # global sequence counter, increases with every notification
+        # Values changed since the GUI last drained them, the newest value per node wins
+        self._changed = {}
+
+    def resolve(self, node_id):
+        # Accept a NodeId or its string form and return the NodeId used as key
+        if isinstance(node_id, ua.NodeId):
+            return node_id
+        resolved = self._node_ids.get(node_id)
+        if resolved is None:
+            resolved = ua.NodeId.from_string(node_id)
+            self._node_ids[node_id] = resolved
+        return resolved
+
+    def register(self, node_ids):
+        # Pre-create the records so notifications never have to allocate one
+        with self._lock:
+            for node_id in node_ids:
+                self._records.setdefault(self.resolve(node_id), NodeRecord())
 
     def datachange_notification(self, node, val, data):
-        try:
-            attributes = vars(val)
-        except TypeError:
-            self.error_flag = True
-            print(f"TypeError: {val} does not have a __dict__ attribute")
-            return
-        node_id_str = node.nodeid.to_string()
-        if node_id_str not in self.node_values:
-            self.node_values[node_id_str] = {}
-        attributes = vars(val)
-        for attr_name, attr_value in attributes.items():
-            self.node_values[node_id_str][attr_name] = attr_value
+        nodeid = node.nodeid
+        data_value = data.monitored_item.Value
+        with self._lock:
+            record = self._records.get(nodeid)
+            if record is None:
+                record = self._records[nodeid] = NodeRecord()
+            self._seq += 1
+            record.value = val
+            record.source_timestamp = data_value.SourceTimestamp
+            record.server_timestamp = data_value.ServerTimestamp
+            record.status = data_value.StatusCode
+            record.seq = self._seq
+            self._changed[nodeid] = val
+        if self.history is not None:
+            self.history.append(nodeid, data_value.SourceTimestamp, val)
+        if self.recorder is not None:
+            self.recorder.notification(nodeid, val, data_value.SourceTimestamp, data_value.StatusCode)
+
+    def inject(self, samples):
+        # Replay of a session log: [(node id, value, source timestamp, status code)] applied
+        # like notifications of the server, under one lock acquisition
+        with self._lock:
+            for node_id, val, source_timestamp, status in samples:
+                nodeid = self.resolve(node_id)
+                record = self._records.get(nodeid)
+                if record is None:
+                    record = self._records[nodeid] = NodeRecord()
+                self._seq += 1
+                record.value = val
+                record.source_timestamp = source_timestamp
+                record.server_timestamp = source_timestamp
+                record.status = status
+                record.seq = self._seq
+                self._changed[nodeid] = val
+        if self.history is not None:
+            for node_id, val, source_timestamp, status in samples:
+                self.history.append(self.resolve(node_id), source_timestamp, val)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def pending(self):
+        # nodes changed since the GUI last drained them
+        return len(self._changed)
+
+    def take_changes(self):
+        # Return every node that changed since the last call and start a new dirty-set
+        with self._lock:
+            changed = self._changed
+            self._changed = {}
+        return changed
+
+    def get(self, node_id):
+        # (value, source timestamp, server timestamp, status, seq) or None if never received
+        nodeid = self.resolve(node_id)
+        with self._lock:
+            record = self._records.get(nodeid)
+            return record.as_tuple() if record is not None and record.seq else None
+
+    def snapshot(self, node_ids=None):
+        # Consistent copy of several nodes taken under one lock acquisition
+        with self._lock:
+            if node_ids is None:
+                return {nodeid: record.as_tuple() for nodeid, record in self._records.items() if record.seq}
+            result = {}
+            for node_id in node_ids:
+                record = self._records.get(self.resolve(node_id))
+                if record is not None and record.seq:
+                    result[node_id] = record.as_tuple()
+            return result
+
+    def changed_since(self, seq):
+        # Nodes updated after the given sequence number, together with the current sequence number
+        with self._lock:
+            changed = {nodeid: record.as_tuple() for nodeid, record in self._records.items() if record.seq > seq}
+            return changed, self._seq
 
     def get_attribute_value(self, node_id, attribute_name):
-        if node_id in self.node_values and attribute_name in self.node_values[node_id]:
-            return self.node_values[node_id][attribute_name]
+        sample = self.get(node_id)
+        if sample is not None and hasattr(sample[0], attribute_name):
+            return getattr(sample[0], attribute_name)
         else:
             print(f"Attribute {attribute_name} not found for node {node_id}")
             return None
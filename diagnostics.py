@@ -0,0 +1,69 @@
+from PyQt6 import QtWidgets
+from PyQt6.QtCore import Qt
+
+from metrics import metrics
+
+
+class DiagnosticsPanel(QtWidgets.QDialog):
+    # Non-modal window with the last metrics sample: rates, gauges and timings.
+    # Only redrawn while it is visible.
+    COLUMNS = ["Messwert", "Wert / Anzahl", "p50 (ms)", "p99 (ms)", "max (ms)"]
+
+    def __init__(self, reporter=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnose")
+        self.resize(720, 520)
+        layout = QtWidgets.QVBoxLayout(self)
+        self.status = QtWidgets.QLabel(self)
+        layout.addWidget(self.status)
+        self.tree = QtWidgets.QTreeWidget(self)
+        self.tree.setHeaderLabels(self.COLUMNS)
+        self.tree.setRootIsDecorated(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.header().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.tree)
+        self.groups = {}
+        self.items = {}  # (group, name) -> QTreeWidgetItem, reused between samples
+
+        if reporter is None:
+            self.status.setText("Instrumentierung deaktiviert. Mit LOCAL_GUI_METRICS=1 starten, um Messwerte zu erfassen.")
+        else:
+            self.status.setText("Aktualisierung jede Sekunde.")
+            reporter.sampled.connect(self.show_sample)
+            if metrics.last_sample:
+                self.show_sample(metrics.last_sample)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if metrics.last_sample:
+            self.show_sample(metrics.last_sample)
+
+    def group(self, name):
+        item = self.groups.get(name)
+        if item is None:
+            item = self.groups[name] = QtWidgets.QTreeWidgetItem(self.tree, [name])
+            item.setFirstColumnSpanned(True)
+            item.setExpanded(True)
+        return item
+
+    def row(self, group, name, values):
+        item = self.items.get((group, name))
+        if item is None:
+            item = self.items[(group, name)] = QtWidgets.QTreeWidgetItem(self.group(group), [name])
+            for column in range(1, len(self.COLUMNS)):
+                item.setTextAlignment(column, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        for column, value in enumerate(values, 1):
+            text = "" if value is None else str(value)
+            if item.text(column) != text:
+                item.setText(column, text)
+
+    def show_sample(self, sample):
+        if not self.isVisible():
+            return
+        self.status.setText(f"Stand {sample.get('time', '')}")
+        for name, rate in sorted(sample.get("rates_per_s", {}).items()):
+            self.row("Raten (1/s)", name, [rate])
+        for name, value in sorted(sample.get("gauges", {}).items()):
+            self.row("Zustände", name, [value])
+        for name, timing in sorted(sample.get("timings", {}).items()):
+            self.row("Zeiten", name, [timing.get("count"), timing.get("p50_ms"), timing.get("p99_ms"), timing.get("max_ms")])
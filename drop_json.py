@@ -1,16 +1,22 @@
 from PyQt6 import QtWidgets
 from PyQt6.QtCore import pyqtSignal
-import json
-import os
+
+from recipe import RecipeLoader
 
 class DropGroupBox(QtWidgets.QGroupBox):
     updated = pyqtSignal() 
+    load_failed = pyqtSignal(str, str)  # path, error
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
         self.parameters = None  # This will be a dictionary of dictionaries
         self.file_name = None
+        self.errors = []  # validation errors of the last recipe
+        # Files are parsed and validated in the background
+        self.loader = RecipeLoader(self)
+        self.loader.loaded.connect(self.recipe_loaded)
+        self.loader.failed.connect(self.load_failed)
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -22,10 +28,12 @@ class DropGroupBox(QtWidgets.QGroupBox):
         if event.mimeData().hasUrls():
             file_path = event.mimeData().urls()[0].toLocalFile()
             if file_path.lower().endswith('.json'):
-                with open(file_path) as f:
-                    data = json.load(f)
-                self.parameters = data
-                self.file_name = os.path.splitext(os.path.basename(file_path))[0]
-                self.updated.emit()
+                self.loader.load(file_path)
         event.accept()
+
+    def recipe_loaded(self, recipe):
+        self.parameters = recipe.parameters
+        self.file_name = recipe.name
+        self.errors = recipe.errors
+        self.updated.emit()
         
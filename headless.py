@@ -0,0 +1,179 @@
+from PyQt6 import QtCore
+
+import argparse
+import json
+import numpy as np
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from metrics import EventLoopLag, metrics, reporter_from_environment
+from opcua_worker import OpcuaWorker, ConnectionState
+from opcua_simulator import DEFAULT_NODES, variable_node_ids
+
+
+class HeadlessRunner(QtCore.QObject):
+    # The client side of Ui_MainWindow without widgets: the OPC UA worker on its own
+    # thread and the 16 ms drain of the subscription changes on the main thread.
+    # Measures notification throughput, reconnect times and how late the drain timer fires.
+    def __init__(self, url, username, password, node_list, drain_interval=16, history_depth=65536, parent=None):
+        super().__init__(parent)
+        self.drain_interval = drain_interval
+        self.opcua_thread = QtCore.QThread(self)
+        self.opcua_worker = OpcuaWorker(url, username, password, node_list, history_depth=history_depth)
+        self.opcua_worker.moveToThread(self.opcua_thread)
+        self.opcua_thread.started.connect(self.opcua_worker.start)
+        self.opcua_worker.status_changed.connect(self.status_changed)
+        self.sub_handler = self.opcua_worker.my_sub_handler
+
+        self.drain_timer = QtCore.QTimer(self)
+        self.drain_timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self.drain_timer.setInterval(drain_interval)
+        self.drain_timer.timeout.connect(self.drain)
+
+        self.status = None
+        self.started = None
+        self.first_connected = None
+        self.lost_at = None
+        self.recovery_times = []  # s from the first failed health check of a working connection to the next CONNECTED
+        self.state_changes = []  # (s since start, ConnectionState)
+        self.lateness = []  # ms the drain timer fired after its due time
+        self.drain_times = []  # ms spent in one drain
+        self.drained_values = 0
+        self._last_tick = None
+        self._seq_start = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.opcua_thread.start()
+        self.drain_timer.start()
+
+    def stop(self):
+        self.drain_timer.stop()
+        self.opcua_worker.stop_requested.emit()
+        self.opcua_thread.quit()
+        self.opcua_thread.wait()
+
+    def status_changed(self, status):
+        now = time.perf_counter()
+        self.state_changes.append((round(now - self.started, 3), status))
+        if status == ConnectionState.CONNECTED:
+            if self.first_connected is None:
+                self.first_connected = now
+                self._seq_start = self.sub_handler.seq
+            if self.lost_at is not None:
+                self.recovery_times.append(now - self.lost_at)
+                self.lost_at = None
+        elif status in (ConnectionState.DEGRADED, ConnectionState.DISCONNECTED) and self.lost_at is None and self.first_connected is not None:
+            self.lost_at = now
+        self.status = status
+
+    def drain(self):
+        # Same work as Ui_MainWindow.update_GUI minus the widgets
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            self.lateness.append(max(0.0, (now - self._last_tick) * 1000 - self.drain_interval))
+        self._last_tick = now
+        changes = self.sub_handler.take_changes()
+        for value in changes.values():
+            str(value)
+        self.drained_values += len(changes)
+        self.drain_times.append((time.perf_counter() - now) * 1000)
+
+    def report(self):
+        now = time.perf_counter()
+        connected_time = now - self.first_connected if self.first_connected else 0
+        notifications = self.sub_handler.seq - self._seq_start if self._seq_start is not None else 0
+
+        def percentiles(values):
+            if not values:
+                return None
+            p50, p99 = np.percentile(values, (50, 99))
+            return {"p50": round(float(p50), 3), "p99": round(float(p99), 3), "max": round(float(max(values)), 3)}
+
+        return {
+            "duration_s": round(now - self.started, 3),
+            "time_to_connect_s": round(self.first_connected - self.started, 3) if self.first_connected else None,
+            "notifications": notifications,
+            "notifications_per_s": round(notifications / connected_time, 1) if connected_time else 0,
+            "drained_values": self.drained_values,
+            "recoveries": len(self.recovery_times),
+            "recovery_s": percentiles(self.recovery_times),
+            "drain_lateness_ms": percentiles(self.lateness),
+            "drain_time_ms": percentiles(self.drain_times),
+            "state_changes": self.state_changes,
+        }
+
+
+def start_simulator(endpoint, variables, simulator_args):
+    # Simulator in its own process, so its threads do not share the GIL with the client
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "opcua_simulator.py"),
+               "--endpoint", endpoint, "--variables", str(variables)] + simulator_args
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # wait until the server listens
+    for line in process.stdout:
+        if line.startswith("Simulator listening"):
+            # keep echoing the injected events, a full pipe would block the simulator
+            threading.Thread(target=echo_simulator, args=(process.stdout,), daemon=True).start()
+            return process
+    raise RuntimeError("Simulator did not start")
+
+
+def echo_simulator(stdout):
+    for line in stdout:
+        print("[simulator]", line.rstrip(), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the OPC UA client logic without a window and report latency figures. "
+                                                 "Unknown options are passed on to opcua_simulator.py.")
+    parser.add_argument("--url", default=os.environ.get("LOCAL_GUI_OPCUA_URL", "opc.tcp://127.0.0.1:48400"))
+    parser.add_argument("--username", default=os.environ.get("LOCAL_GUI_OPCUA_USER", "admin1"))
+    parser.add_argument("--password", default=os.environ.get("LOCAL_GUI_OPCUA_PASSWORD", "admin1"))
+    parser.add_argument("--variables", type=int, default=100, help="simulated process values to subscribe")
+    parser.add_argument("--duration", type=float, default=30.0, help="s")
+    parser.add_argument("--history-depth", type=int, default=int(os.environ.get("LOCAL_GUI_HISTORY_DEPTH") or 65536),
+                        help="samples kept per node")
+    parser.add_argument("--simulator", action="store_true", help="start a local simulator on --url")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args, simulator_args = parser.parse_known_args(argv)
+
+    simulator = start_simulator(args.url, args.variables, simulator_args) if args.simulator else None
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv[:1])
+    # LOCAL_GUI_METRICS* work here as in the GUI, the last sample is added to the report
+    reporter = reporter_from_environment()
+    runner = HeadlessRunner(args.url, args.username, args.password, DEFAULT_NODES + variable_node_ids(args.variables),
+                            history_depth=args.history_depth)
+    if reporter is not None:
+        event_loop_lag = EventLoopLag("headless", parent=runner)
+        event_loop_lag.start()
+        reporter.start()
+    runner.start()
+    QtCore.QTimer.singleShot(int(args.duration * 1000), app.quit)
+    try:
+        app.exec()
+    finally:
+        runner.stop()
+        if simulator is not None:
+            simulator.send_signal(signal.SIGINT)
+            try:
+                simulator.wait(5)
+            except subprocess.TimeoutExpired:
+                simulator.kill()
+    report = runner.report()
+    if reporter is not None:
+        reporter.close()
+        report["metrics"] = metrics.sample()
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
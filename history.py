@@ -0,0 +1,139 @@
+import numpy as np
+import threading
+import time
+from datetime import datetime
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(timestamp):
+    # opcua delivers naive UTC datetimes, plots work on float seconds since epoch
+    if timestamp is None:
+        return time.time()
+    return (timestamp - EPOCH).total_seconds()
+
+
+class RingBuffer:
+    # Time-series buffer for one node. Memory stays at depth samples no matter how
+    # long a scan runs, the oldest samples are overwritten. The arrays start small and
+    # double until they reach depth, nodes that rarely change never take the full depth.
+    def __init__(self, depth, initial=1024):
+        self.depth = depth
+        self.times = np.empty(min(depth, initial), dtype=np.float64)
+        self.values = np.empty(min(depth, initial), dtype=np.float64)
+        self._head = 0  # next write position
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t, value):
+        with self._lock:
+            # keep time monotonic so range queries can use binary search
+            if self._count and t < self.times[self._head - 1]:
+                t = self.times[self._head - 1]
+            if self._count == len(self.times) < self.depth:
+                self._grow()
+            self.times[self._head] = t
+            self.values[self._head] = value
+            self._head = (self._head + 1) % len(self.times)
+            if self._count < len(self.times):
+                self._count += 1
+
+    def _grow(self):
+        # Only called when the arrays are full for the first time, the samples are still in
+        # order from index 0 and the head has wrapped to 0
+        size = min(2 * len(self.times), self.depth)
+        times = np.empty(size, dtype=np.float64)
+        values = np.empty(size, dtype=np.float64)
+        times[:self._count] = self.times
+        values[:self._count] = self.values
+        self.times, self.values = times, values
+        self._head = self._count
+
+    def _segments(self):
+        # Chronological views of the stored samples, at most two because of the wrap-around
+        if self._count < len(self.times):
+            return [(self.times[:self._count], self.values[:self._count])]
+        return [(self.times[self._head:], self.values[self._head:]),
+                (self.times[:self._head], self.values[:self._head])]
+
+    def range(self, t0=None, t1=None):
+        # Copy of all samples with t0 <= t < t1
+        times = []
+        values = []
+        with self._lock:
+            for seg_t, seg_v in self._segments():
+                lo = 0 if t0 is None else np.searchsorted(seg_t, t0, side='left')
+                hi = len(seg_t) if t1 is None else np.searchsorted(seg_t, t1, side='left')
+                if hi > lo:
+                    times.append(seg_t[lo:hi])
+                    values.append(seg_v[lo:hi])
+            if not times:
+                return np.empty(0), np.empty(0)
+            return np.concatenate(times), np.concatenate(values)
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None
+            return self.times[self._head - 1], self.values[self._head - 1]
+
+
+def decimate(times, values, t0, t1, n_bins):
+    # Reduce samples to n_bins min/max/mean triples, enough to draw one column per pixel.
+    # Empty bins are NaN so the plot shows gaps instead of invented values.
+    edges = np.linspace(t0, t1, n_bins + 1)
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    mins = np.full(n_bins, np.nan)
+    maxs = np.full(n_bins, np.nan)
+    means = np.full(n_bins, np.nan)
+    if len(times) == 0:
+        return centers, mins, maxs, means
+
+    bins = np.searchsorted(edges, times, side='right') - 1
+    np.clip(bins, 0, n_bins - 1, out=bins)
+    # samples are sorted, so every non-empty bin is one contiguous run
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    used = bins[starts]
+    counts = np.diff(np.r_[starts, len(bins)])
+    mins[used] = np.minimum.reduceat(values, starts)
+    maxs[used] = np.maximum.reduceat(values, starts)
+    means[used] = np.add.reduceat(values, starts) / counts
+    return centers, mins, maxs, means
+
+
+class NodeHistory:
+    # Ring buffers for all subscribed numeric nodes, fed by MySubHandler
+    def __init__(self, depth=65536):
+        self.depth = depth
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def buffer(self, nodeid):
+        buf = self._buffers.get(nodeid)
+        if buf is None:
+            with self._lock:
+                buf = self._buffers.setdefault(nodeid, RingBuffer(self.depth))
+        return buf
+
+    def append(self, nodeid, timestamp, value):
+        # Only numeric values can be plotted, structures and strings are skipped
+        if isinstance(value, (bool, int, float)):
+            self.buffer(nodeid).append(to_seconds(timestamp), value)
+
+    def range(self, nodeid, t0=None, t1=None):
+        buf = self._buffers.get(nodeid)
+        if buf is None:
+            return np.empty(0), np.empty(0)
+        return buf.range(t0, t1)
+
+    def decimated(self, nodeid, t0, t1, n_bins):
+        # Min/max/mean per screen column between t0 and t1
+        times, values = self.range(nodeid, t0, t1)
+        return decimate(times, values, t0, t1, n_bins)
+
+    def node_ids(self):
+        return list(self._buffers)
@@ -0,0 +1,325 @@
+from PyQt6 import QtCore
+from PyQt6.QtGui import QImage, QPixmap
+
+import numpy as np
+import os
+import threading
+import time
+
+from binning import bin_frame
+
+
+class FrameSource:
+    # Interface of a frame source. read() blocks until the next frame is available
+    # and returns a 2D uint16 array, or None when the source is exhausted.
+    def open(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SyntheticFrameSource(FrameSource):
+    # Moving test pattern with noise at a fixed frame rate, used without a detector
+    def __init__(self, width=1536, height=1536, fps=30, bit_depth=16):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps
+        self.max_value = (1 << bit_depth) - 1
+        self._next = 0
+        self._phase = 0
+        self._rng = np.random.default_rng()
+
+    def open(self):
+        y, x = np.mgrid[0:self.height, 0:self.width]
+        r = np.hypot(x - self.width / 2, y - self.height / 2)
+        # bright disk on a dark background, the disk is shifted a little every frame
+        self._base = (self.max_value * 0.2 * (1 + np.cos(x / 40.0))).astype(np.uint16)
+        self._disk = (r < min(self.width, self.height) / 4).astype(np.uint16) * int(self.max_value * 0.5)
+        self._next = time.perf_counter()
+
+    def read(self):
+        self._next += self.interval
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._phase = (self._phase + 8) % self.width
+        frame = self._base + np.roll(self._disk, self._phase, axis=1)
+        frame += self._rng.integers(0, self.max_value // 64, size=frame.shape, dtype=np.uint16)
+        return frame
+
+
+class FileFrameSource(FrameSource):
+    # Replays frames from a .npy stack (frames, height, width) or a directory of .npy frames
+    def __init__(self, path, fps=30, loop=True):
+        self.path = path
+        self.interval = 1.0 / fps
+        self.loop = loop
+        self._frames = None
+        self._index = 0
+        self._next = 0
+
+    def open(self):
+        if os.path.isdir(self.path):
+            files = sorted(f for f in os.listdir(self.path) if f.lower().endswith('.npy'))
+            self._frames = [np.load(os.path.join(self.path, f), mmap_mode='r') for f in files]
+        else:
+            stack = np.load(self.path, mmap_mode='r')
+            self._frames = stack if stack.ndim == 3 else stack[np.newaxis]
+        self._index = 0
+        self._next = time.perf_counter()
+
+    def read(self):
+        if self._index >= len(self._frames):
+            if not self.loop or not len(self._frames):
+                return None
+            self._index = 0
+        self._next += self.interval
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        frame = np.asarray(self._frames[self._index])
+        self._index += 1
+        return frame
+
+
+def create_frame_source(spec):
+    # "synthetic" or a path to .npy frames
+    if spec == "synthetic":
+        return SyntheticFrameSource()
+    return FileFrameSource(spec)
+
+
+class LatestFrameSlot:
+    # Single-slot buffer between two threads. put() always replaces the previous
+    # frame, so a slow consumer drops frames instead of building up a queue.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._taken_seq = 0
+        self.dropped = 0
+        self._event = threading.Event()
+
+    def put(self, frame):
+        with self._lock:
+            if self._seq != self._taken_seq:
+                self.dropped += 1
+            self._frame = frame
+            self._seq += 1
+        self._event.set()
+
+    def take(self):
+        # Newest frame if one arrived since the last take(), else None
+        with self._lock:
+            if self._seq == self._taken_seq:
+                return None
+            self._taken_seq = self._seq
+            self._event.clear()
+            return self._frame
+
+    def wait(self, timeout=None):
+        if self._event.wait(timeout):
+            return self.take()
+        return None
+
+
+def auto_window(frame, low_percentile=0.5, high_percentile=99.5, sample_step=8):
+    # Display window from a strided subsample, a full sort of the frame is too slow
+    sample = frame[::sample_step, ::sample_step]
+    low, high = np.percentile(sample, (low_percentile, high_percentile))
+    if high <= low:
+        high = low + 1
+    return int(low), int(high)
+
+
+class Windowing:
+    # 16 bit -> 8 bit mapping through a lookup table, rebuilt only when the window changes
+    def __init__(self):
+        self._window = None
+        self._lut = None
+
+    def lut(self, low, high):
+        if self._window != (low, high):
+            values = np.arange(65536, dtype=np.float32)
+            scaled = (values - low) * (255.0 / (high - low))
+            self._lut = np.clip(scaled, 0, 255).astype(np.uint8)
+            self._window = (low, high)
+        return self._lut
+
+    def apply(self, frame, low, high, out=None):
+        if frame.dtype == np.uint8:
+            return frame
+        return np.take(self.lut(low, high), frame, out=out)
+
+
+def numpy_to_qimage(array):
+    # QImage over the NumPy buffer without a copy. The array must stay alive as long
+    # as the image is used, it is attached to the image for that reason.
+    array = np.ascontiguousarray(array)
+    height, width = array.shape
+    image = QImage(array.data, width, height, array.strides[0], QImage.Format.Format_Grayscale8)
+    image.ndarray = array
+    return image
+
+
+class FrameProcessor(threading.Thread):
+    # Takes the newest raw frame, applies preprocessing, binning and windowing and
+    # offers the 8 bit result to the GUI. Runs beside the producer so acquisition never waits.
+    def __init__(self, raw_slot, display_slot):
+        super().__init__(daemon=True)
+        self.raw_slot = raw_slot
+        self.display_slot = display_slot
+        self.binning = 1
+        self.preprocess = None  # optional callable(frame, binning) -> binned, corrected frame
+        self.windowing = Windowing()
+        self.window = None  # fixed (low, high) or None for automatic
+        self._smoothed_window = None
+        self._buffers = [None, None]  # alternating output buffers, the GUI may still show the other one
+        self._buffer_index = 0
+        self._stop_event = threading.Event()
+        self.processed = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def process(self, frame):
+        preprocess = self.preprocess
+        if preprocess is not None:
+            frame = preprocess(frame, self.binning)
+        else:
+            frame = bin_frame(frame, self.binning)
+        if self.window is not None:
+            low, high = self.window
+        else:
+            low, high = auto_window(frame)
+            if self._smoothed_window is not None:
+                # smooth the automatic window so the brightness does not flicker
+                low = int(0.8 * self._smoothed_window[0] + 0.2 * low)
+                high = int(0.8 * self._smoothed_window[1] + 0.2 * high)
+            self._smoothed_window = (low, high)
+        out = self._buffers[self._buffer_index]
+        if out is None or out.shape != frame.shape:
+            out = self._buffers[self._buffer_index] = np.empty(frame.shape, dtype=np.uint8)
+        self._buffer_index ^= 1
+        return self.windowing.apply(frame, low, high, out=out)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            frame = self.raw_slot.wait(0.1)
+            if frame is None:
+                continue
+            try:
+                self.display_slot.put(self.process(frame))
+                self.processed += 1
+            except Exception as e:
+                print("Error while processing a live frame:", e)
+
+
+class FrameProducer(threading.Thread):
+    # Acquires frames from a FrameSource as fast as the source delivers them
+    def __init__(self, source, raw_slot, sinks=()):
+        super().__init__(daemon=True)
+        self.source = source
+        self.raw_slot = raw_slot
+        self.sinks = sinks  # callables receiving every acquired frame, e.g. ProjectionWriter.put
+        self._stop_event = threading.Event()
+        self.acquired = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            self.source.open()
+            while not self._stop_event.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                self.raw_slot.put(frame)
+                for sink in self.sinks:
+                    sink(frame)
+                self.acquired += 1
+        except Exception as e:
+            print("Error while acquiring live frames:", e)
+        finally:
+            self.source.close()
+
+
+class LiveView(QtCore.QObject):
+    # Shows the newest processed frame in a QLabel once per display frame
+    def __init__(self, label, sources, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self.sources = sources  # one FrameSource per camera
+        self.source_index = 0
+        self.raw_slot = LatestFrameSlot()
+        self.display_slot = LatestFrameSlot()
+        self.producer = None
+        self.processor = FrameProcessor(self.raw_slot, self.display_slot)
+        self.sinks = []
+        self._image = None
+        self.displayed = 0
+
+        self.display_timer = QtCore.QTimer(self)
+        self.display_timer.setInterval(16)
+        self.display_timer.timeout.connect(self.show_frame)
+
+    def start(self):
+        if not self.processor.is_alive():
+            self.processor.start()
+        self.start_producer()
+        self.display_timer.start()
+
+    def start_producer(self):
+        self.stop_producer()
+        self.producer = FrameProducer(self.sources[self.source_index], self.raw_slot, self.sinks)
+        self.producer.start()
+
+    def stop_producer(self):
+        if self.producer is not None:
+            self.producer.stop()
+            self.producer.join(1.0)
+            self.producer = None
+
+    def stop(self):
+        self.display_timer.stop()
+        self.stop_producer()
+        self.processor.stop()
+
+    def add_sink(self, sink):
+        # the producer reads the list on every frame, replacing it keeps iteration safe
+        self.sinks = self.sinks + [sink]
+        if self.producer is not None:
+            self.producer.sinks = self.sinks
+
+    def remove_sink(self, sink):
+        self.sinks = [s for s in self.sinks if s != sink]
+        if self.producer is not None:
+            self.producer.sinks = self.sinks
+
+    def set_binning(self, factor):
+        self.processor.binning = max(1, int(factor))
+
+    def set_preprocessor(self, preprocess):
+        # callable(frame, binning) or None for the raw frames
+        self.processor.preprocess = preprocess
+
+    def switch_camera(self, index):
+        if 0 <= index < len(self.sources) and index != self.source_index:
+            self.source_index = index
+            if self.display_timer.isActive():
+                self.start_producer()
+
+    def show_frame(self):
+        frame = self.display_slot.take()
+        if frame is None:
+            return
+        self._image = numpy_to_qimage(frame)
+        pixmap = QPixmap.fromImage(self._image)
+        self.label.setPixmap(pixmap.scaled(self.label.size(), QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                                           QtCore.Qt.TransformationMode.FastTransformation))
+        self.displayed += 1
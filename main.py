@@ -1,14 +1,27 @@
-from PyQt6 import QtWidgets, uic, QtCore, QtGui
+import time
+STARTED = time.perf_counter()  # the time to first paint is measured from here
+
+from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6.QtGui import QPixmap, QImage, QDoubleValidator
-from PyQt6.QtWidgets import QTableWidgetItem, QMenu, QFileDialog, QGraphicsView, QGraphicsScene, QMessageBox
+from PyQt6.QtWidgets import QMenu, QFileDialog, QGraphicsView, QGraphicsScene, QMessageBox
 from PyQt6.QtCore import Qt, QLocale
-from datetime import datetime
 
-import opcua as ua
-import time
+import importlib
+import os
 import sys
+import threading
 
-from client_sub import MySubHandler
+from message_log import MessageLogModel, SeverityFilterModel, SEVERITY_NAMES, INFO, WARNING, ERROR
+from metrics import EventLoopLag, metrics, reporter_from_environment
+from diagnostics import DiagnosticsPanel
+from ui_cache import CompiledUi
+
+# Imported in the background after the first paint, numpy and opcua alone take longer
+# than building the window
+DEFERRED_MODULES = ["numpy", "opcua_worker", "motion_control", "parameter_transfer", "preprocessing",
+                    "live_view", "reconstruction", "projection_writer"]
+FIRST_PAINT_TARGET_MS = 300  # from STARTED, warned about when exceeded
+LAZY_PAGES = ["page_7"]  # Advance page of stackedWidget, built on the first changePage
 
 ########################################################################################
 if hasattr(QtCore.Qt, 'AA_EnableHighDpiScaling'):
@@ -19,231 +32,551 @@ if hasattr(QtCore.Qt, 'AA_UseHighDpiPixmaps'):
 #######################################################################################
 
 class Ui_MainWindow(QtWidgets.QMainWindow):
+    scan_written = QtCore.pyqtSignal(str)  # emitted from the thread that closes the projection writer
+    modules_imported = QtCore.pyqtSignal()  # emitted from the background import thread
+    services_started = QtCore.pyqtSignal()
+    calibration_mismatch = QtCore.pyqtSignal(str)  # emitted from the live view processing thread
+
     def __init__(self):
         super().__init__()
-        uic.loadUi('gui_v2.0.ui', self)
+        # precompiled form, regenerated when gui_v2.0.ui changes
+        self.form = CompiledUi('gui_v2.0.ui', LAZY_PAGES)
+        self.form.setup(self)
+        self.setup_message_log()
 
-        self.client = None
         self.server_connected = False  # State of the server connection
-        self.prev_server_connected = None 
         self.status = None
-        self.initial_attempt = False
-        self.error_displayed = False
-        self.retry_count = 0  # Counter for connection retries
+        self.functions_assigned = False
         self.stackedWidget.setCurrentIndex(0)
-        self.stackedWidget_2.setCurrentIndex(0)
 
-        self.url = "opc.tcp://localhost:4840"
-        self.username = "admin1"
-        self.password = "admin1"
+        # the environment can point the GUI at another server, e.g. opcua_simulator.py
+        self.url = os.environ.get("LOCAL_GUI_OPCUA_URL", "opc.tcp://localhost:4840")
+        self.username = os.environ.get("LOCAL_GUI_OPCUA_USER", "admin1")
+        self.password = os.environ.get("LOCAL_GUI_OPCUA_PASSWORD", "admin1")
+        # samples kept per node for the plots, the buffers grow up to this depth
+        self.history_depth = int(os.environ.get("LOCAL_GUI_HISTORY_DEPTH") or 65536)
         self.node_list = ["ns=4;s=MAIN.myVar1", "ns=4;s=MAIN.myVar1"]
-        self.active_subscriptions = []
-        self.subscription_info = {}
 
-        self.connection_check_timer = QtCore.QTimer(self)
-        self.connection_check_timer.timeout.connect(self.check_server_status)
-        self.connection_check_timer.start(500) 
+        self.BOOL1 = None
+        # Optional instrumentation, enabled before the worker exists so every service call is timed
+        self.metrics_reporter = reporter_from_environment(self)
+        self.diagnostics_panel = None
+        # Widget updaters per NodeId, only nodes that changed since the last frame are applied
+        self.gui_updaters = {}
 
-        self.update_gui_timer = QtCore.QTimer()
-        self.update_gui_timer.setInterval(50)
+        self.update_gui_timer = QtCore.QTimer(self)
+        self.update_gui_timer.setInterval(16)  # once per display frame
         self.update_gui_timer.timeout.connect(self.update_GUI)
 
-        QtCore.QTimer.singleShot(500, self.opcua_server_connect)
+        # Created by start_services once the window is painted and the heavy modules are imported
+        self.opcua_thread = None
+        self.opcua_worker = None
+        self.sub_handler = None
+        self.motion = None
+        self.preprocessor = None
+        self.live_view = None
+        self.reconstruction = None
+        # LOCAL_GUI_RECORD records the session to a file (path, "1" for a new file in ~/.local_gui/sessions),
+        # LOCAL_GUI_REPLAY plays a recorded session back instead of connecting to the server
+        self.recorder = None
+        self.player = None
+        self.replay_path = os.environ.get("LOCAL_GUI_REPLAY")
+        self.first_paint_ms = None
+        self.importing = False
+        self.closing = False
+        self.modules_imported.connect(self.start_services)
+        self.installEventFilter(self)
+        # in case no paint event arrives, e.g. a window started minimized
+        QtCore.QTimer.singleShot(2000, self.import_modules)
+        self.setup_metrics()
+
+        # Scan output
+        self.scan_writer = None
+        self.directoryPB.clicked.connect(self.select_directory)
+        self.startScan.clicked.connect(self.start_scan)
+        self.scan_written.connect(self.scan_finished)
+        self.scan_writer_timer = QtCore.QTimer(self)
+        self.scan_writer_timer.setInterval(200)
+        self.scan_writer_timer.timeout.connect(self.check_scan_writer)
+
+        self.last_scan_directory = None
+        self.manualReconstruction.clicked.connect(self.manual_reconstruction)
+        self.manual_reconstruction_text = self.manualReconstruction.text()
+
+    def eventFilter(self, watched, event):
+        # The first paint of the window starts the background part of the startup
+        if watched is self and event.type() == QtCore.QEvent.Type.Paint and self.first_paint_ms is None:
+            self.first_paint_ms = (time.perf_counter() - STARTED) * 1000
+            self.removeEventFilter(self)
+            print(f"Time to first paint: {self.first_paint_ms:.0f} ms")
+            if self.first_paint_ms > FIRST_PAINT_TARGET_MS:
+                print(f"Warning: first paint took longer than {FIRST_PAINT_TARGET_MS} ms")
+            if metrics.enabled:
+                metrics.gauge("startup.first_paint_ms", round(self.first_paint_ms, 1))
+            QtCore.QTimer.singleShot(0, self.import_modules)
+        return super().eventFilter(watched, event)
+
+    def import_modules(self):
+        if self.importing or self.closing:
+            return
+        self.importing = True
+        threading.Thread(target=self.import_deferred_modules, daemon=True).start()
+
+    def import_deferred_modules(self):
+        # Runs on a plain thread while the event loop keeps the window responsive
+        for name in DEFERRED_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Error while importing {name}:", e)
+        self.modules_imported.emit()
+
+    def start_services(self):
+        if self.closing:
+            return
+        from live_view import LiveView, create_frame_source
+        from motion_control import AXES
+        from opcua_worker import OpcuaWorker, STATUS_NODE
+        from preprocessing import Preprocessor
+        from reconstruction import ReconstructionQueue
+
+        self.node_list += [axis.actual_position for axis in AXES.values()]
+        if self.replay_path:
+            self.start_replay(self.replay_path)
+        else:
+            # All OPC UA I/O runs in a dedicated worker thread, it connects as soon as the thread runs
+            self.opcua_thread = QtCore.QThread(self)
+            self.opcua_worker = OpcuaWorker(self.url, self.username, self.password, self.node_list,
+                                           history_depth=self.history_depth)
+            self.opcua_worker.moveToThread(self.opcua_thread)
+            self.opcua_thread.started.connect(self.opcua_worker.start)
+            self.opcua_worker.status_changed.connect(self.gui_main)
+            self.opcua_worker.message.connect(self.show_message)
+            self.opcua_worker.parameters_written.connect(self.parameters_written)
+            self.sub_handler = self.opcua_worker.my_sub_handler
+            self.start_recording()
+            self.opcua_thread.start()
+        if self.sub_handler is not None:
+            self.gui_updaters[self.sub_handler.resolve(STATUS_NODE)] = self.set_BOOL1
+            self.setup_motion_control()
+
+        # Live view sources: "synthetic" or paths to .npy frames, one per camera separated by os.pathsep
+        # dark.npy / flat.npy / lut_steps.npy for the preprocessed live view
+        self.calibration_mismatch.connect(lambda text: self.show_message("Kalibrierung", text, WARNING))
+        self.preprocessor = Preprocessor(threads=min(4, os.cpu_count() or 1), report=self.calibration_mismatch.emit)
+        calibration_dir = os.environ.get("LOCAL_GUI_CALIBRATION_DIR")
+        if calibration_dir:
+            self.preprocessor.load_calibration(calibration_dir)
+        live_view_sources = os.environ.get("LOCAL_GUI_LIVE_SOURCE")
+        if live_view_sources:
+            sources = [create_frame_source(spec) for spec in live_view_sources.split(os.pathsep)]
+            self.live_view = LiveView(self.liveView, sources, self)
+            if self.form.is_built("page_7"):
+                self.setup_live_view_controls()
+            self.live_view.start()
+
+        # Reconstruction jobs run in a process pool, a coarse preview is queued before the full volume
+        self.reconstruction = ReconstructionQueue(parent=self)
+        self.reconstruction.started.connect(self.reconstruction_started)
+        self.reconstruction.progress.connect(self.reconstruction_progress)
+        self.reconstruction.finished.connect(self.reconstruction_finished)
+        self.reconstruction.failed.connect(self.reconstruction_failed)
+        self.reconstruction.canceled.connect(self.reconstruction_canceled)
+        if metrics.enabled:
+            metrics.gauge("startup.services_started_ms", round((time.perf_counter() - STARTED) * 1000, 1))
+        self.services_started.emit()
+
+    def start_recording(self):
+        path = os.environ.get("LOCAL_GUI_RECORD")
+        if not path or path == "0":
+            return
+        from session_log import SessionRecorder, default_session_path
+        if path == "1":
+            path = default_session_path()
+        try:
+            self.recorder = SessionRecorder(path, {"url": self.url})
+        except OSError as e:
+            self.show_message("Aufzeichnung", f"{path} konnte nicht angelegt werden: {e}", ERROR)
+            return
+        self.sub_handler.recorder = self.recorder
+        self.show_message("Aufzeichnung", f"Sitzung wird in {path} aufgezeichnet.")
+
+    def start_replay(self, path):
+        # A recorded session takes the place of the server, the motion and parameter controls stay inactive
+        from client_sub import MySubHandler
+        from replay import ReplayBar, SessionPlayer
+        from session_log import SessionLog
+        try:
+            log = SessionLog(path)
+        except (OSError, ValueError) as e:
+            self.show_message("Wiedergabe", f"{path} konnte nicht geöffnet werden: {e}", ERROR)
+            return
+        try:
+            speed = float(os.environ.get("LOCAL_GUI_REPLAY_SPEED") or 1)
+        except ValueError:
+            speed = 1.0
+        self.sub_handler = MySubHandler()
+        self.player = SessionPlayer(log, self.sub_handler, speed, self)
+        self.player.event_replayed.connect(self.replay_event)
+        self.player.finished.connect(lambda: self.show_message("Wiedergabe", "Ende der Aufzeichnung erreicht."))
+        self.show_message("Wiedergabe", f"{path}: {log.header.get('url', '')}, {self.player.duration:.0f} s aufgezeichnet.")
+        self.player.play()
+        self.statusbar.addPermanentWidget(ReplayBar(self.player, self))
+
+    def replay_event(self, event_type, data):
+        if event_type == "state":
+            # a seek repeats the state at the target time
+            if data != self.status:
+                self.gui_main(data)
+        elif event_type == "parameters":
+            values = ", ".join(f"{name}={value}" for name, value in data.items())
+            self.show_message("Parameter", f"Aufgezeichnete Übertragung: {values}")
+        elif event_type == "parameters_written":
+            self.parameters_written(data)
+
+    def setup_live_view_controls(self):
+        # the controls are on the Advance page, connected once the page exists
+        self.json_liveview_binning.currentIndexChanged.connect(self.change_liveview_binning)
+        self.json_liveview_switch_camera.toggled.connect(self.switch_camera)
+        self.json_liveview_preprocessed.toggled.connect(self.preprocess_liveview)
+        self.change_liveview_binning(self.json_liveview_binning.currentIndex())
+
+    def build_page(self, index):
+        # Create the widgets of a lazily built page of stackedWidget
+        page = self.stackedWidget.widget(index)
+        if page is None or not self.form.build_page(page.objectName()):
+            return
+        if page.objectName() == "page_7":
+            self.stackedWidget_2.setCurrentIndex(0)
+            if self.functions_assigned:
+                self.assign_recipe_functions()
+            if self.live_view is not None:
+                self.setup_live_view_controls()
 
     # update status of the system to the user
-    def show_message(self, title, message):
-        message = f"{title}: {message}"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        row_position = self.error_handling.rowCount()
-        self.error_handling.insertRow(row_position)
-        
-        self.error_handling.setItem(row_position, 0, QTableWidgetItem(message))
-        self.error_handling.setItem(row_position, 1, QTableWidgetItem(timestamp))
-        self.error_handling.resizeColumnsToContents()
-        self.error_handling.resizeRowsToContents()
-        self.error_handling.scrollToBottom()
+    def show_message(self, title, message, severity=INFO):
+        self.message_log.append(f"{title}: {message}", severity)
+
+    def setup_message_log(self):
+        # error_handling is a view over a bounded model, rows are appended in batches
+        self.message_log = MessageLogModel(parent=self)
+        self.message_filter = SeverityFilterModel(self)
+        self.message_filter.setSourceModel(self.message_log)
+        self.error_handling.setModel(self.message_filter)
+        header = self.error_handling.horizontalHeader()
+        header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeMode.Fixed)
+        header.resizeSection(1, self.error_handling.fontMetrics().horizontalAdvance("0000-00-00 00:00:00") + 12)
+        self.error_handling.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        self.error_handling.verticalHeader().setDefaultSectionSize(self.error_handling.fontMetrics().height() + 4)
+        self.error_handling.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.error_handling.customContextMenuRequested.connect(self.message_log_menu)
+        self.message_log.rowsInserted.connect(self.error_handling.scrollToBottom)
+
+    # choose the lowest severity shown in the message log
+    def message_log_menu(self, position):
+        menu = QMenu(self)
+        for severity, name in SEVERITY_NAMES.items():
+            action = menu.addAction(f"Ab {name} anzeigen")
+            action.setCheckable(True)
+            action.setChecked(severity == self.message_filter.minimum_severity)
+            action.setData(severity)
+        action = menu.exec(self.error_handling.viewport().mapToGlobal(position))
+        if action is not None:
+            self.message_filter.set_minimum_severity(action.data())
+
+    def setup_metrics(self):
+        # Ctrl+Shift+D opens the diagnostics panel, it explains how to enable the metrics if they are off
+        QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Shift+D"), self, self.show_diagnostics)
+        if self.metrics_reporter is None:
+            return
+        self.event_loop_lag = EventLoopLag("gui", parent=self)
+        self.event_loop_lag.start()
+        metrics.add_source(self.sample_subscription)
+        self.metrics_reporter.start()
+
+    def sample_subscription(self):
+        if self.sub_handler is None:
+            return
+        metrics.set_total("gui.notifications", self.sub_handler.seq)
+        metrics.gauge("gui.pending_changes", self.sub_handler.pending)
+        metrics.gauge("gui.message_log_rows", self.message_log.rowCount())
+
+    def show_diagnostics(self):
+        if self.diagnostics_panel is None:
+            self.diagnostics_panel = DiagnosticsPanel(self.metrics_reporter, self)
+        self.diagnostics_panel.show()
+        self.diagnostics_panel.raise_()
 
     def closeEvent(self, event):
+        self.closing = True
         self.update_gui_timer.stop()
-        self.connection_check_timer.stop()
-        self.opcua_server_disconnect()
+        if self.metrics_reporter is not None:
+            metrics.remove_source(self.sample_subscription)
+            self.metrics_reporter.close()
+        if self.live_view is not None:
+            self.live_view.stop()
+        if self.scan_writer is not None:
+            self.scan_writer.close()
+        if self.reconstruction is not None:
+            self.reconstruction.close()
+        if self.opcua_worker is not None:
+            self.opcua_worker.stop_requested.emit()  # blocks until the worker has disconnected
+            self.motion.close()
+            self.opcua_thread.quit()
+            self.opcua_thread.wait()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.player is not None:
+            self.player.close()
+        self.message_log.close()
         event.accept()  # Accept the close event
 
+    def setup_motion_control(self):
+        # Jog while a direction button is held, absolute move on Enter in the target field.
+        # Commands are coalesced per axis, HALT is sent at once on its own path.
+        from motion_control import AXES
+        if self.opcua_worker is not None:
+            self.motion = self.opcua_worker.motion
+        axis_widgets = {
+            "R": (self.R_cButton, self.R_aButton, self.R_Stop, self.R_nEinPos, self.R_nActPos),
+            "ZB": (self.Z_upButton, self.Z_downButton, self.Z_Stop, self.ZB_nEinPos, self.ZB_nActPos),
+        }
+        for name, (positive, negative, stop, target, actual) in axis_widgets.items():
+            # actual positions arrive by subscription and are shown at most once per display frame
+            self.gui_updaters[self.sub_handler.resolve(AXES[name].actual_position)] = lambda value, actual=actual: self.show_position(actual, value)
+            if self.motion is None:
+                continue  # replay, nothing to move
+            positive.pressed.connect(lambda name=name: self.motion.jog(name, 1))
+            positive.released.connect(lambda name=name: self.motion.jog(name, 0))
+            negative.pressed.connect(lambda name=name: self.motion.jog(name, -1))
+            negative.released.connect(lambda name=name: self.motion.jog(name, 0))
+            stop.clicked.connect(lambda checked=False, name=name: self.motion.stop(name))
+            target.returnPressed.connect(lambda name=name, target=target: self.move_axis(name, target.text()))
+
+    def move_axis(self, axis, text):
+        try:
+            position = float(text.strip().replace(',', '.'))
+        except ValueError:
+            self.show_message("Achssteuerung", f"Ungültige Zielposition: {text}", ERROR)
+            return
+        self.motion.move_to(axis, position)
+
+    def show_position(self, widget, value):
+        text = "" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+        if widget.text() != text:
+            widget.setText(text)
+
     # set the pages between normal, advance and expert user
     def changePage(self, index):
         # Update the stacked widget to show the page corresponding to the selected index
+        self.build_page(index)
         self.stackedWidget.setCurrentIndex(index)
 
     # set the mode to continuous or stop and go
     def changeMode(self, index):
         self.stackedWidget_2.setCurrentIndex(index)
 
+    # directory for the scan output
+    def select_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Speicherort wählen", self.path.text())
+        if directory:
+            self.path.setText(directory)
+
+    def start_scan(self):
+        # Stream the acquired projections of the scan to disk
+        if self.live_view is None:
+            self.show_message("Scan", "Keine Bildquelle konfiguriert.", ERROR)
+            return
+        if self.scan_writer is not None:
+            self.show_message("Scan", "Es läuft bereits ein Scan.", WARNING)
+            return
+        name = self.name.text().strip()
+        directory = self.path.text().strip()
+        if not name or not directory:
+            self.show_message("Scan", "Bitte Name und Speicherort angeben.", ERROR)
+            return
+        self.build_page(1)  # the scan fields are on the Advance page
+        try:
+            if self.json_scan_mode.currentIndex() == 0:  # Continuous
+                n_projections = int(self.json_continous_frames.text())
+            else:
+                n_projections = int(self.json_stopngo_positions.text()) * int(self.json_stopngo_frames.text())
+        except ValueError:
+            self.show_message("Scan", "Ungültige Anzahl an Projektionen.", ERROR)
+            return
+        binnings = [i for i in range(1, 9) if getattr(self, f"advance_ScanBin{i}", False)] or [1]
+        metadata = self.groupBox_8.parameters or {}
+        from projection_writer import ProjectionWriter
+        self.scan_writer = ProjectionWriter(directory, name, n_projections, binnings, metadata)
+        self.scan_writer.start()
+        self.live_view.add_sink(self.scan_writer.put)
+        self.scan_writer_timer.start()
+        self.show_message("Scan", f"Scan {name} gestartet ({n_projections} Projektionen).")
+
+    def check_scan_writer(self):
+        writer = self.scan_writer
+        if writer is None or not writer.complete:
+            return
+        self.scan_writer_timer.stop()
+        self.live_view.remove_sink(writer.put)
+        # the last queued frames are written and the files closed off the GUI thread
+        threading.Thread(target=self.close_scan_writer, args=(writer,), daemon=True).start()
+
+    def close_scan_writer(self, writer):
+        writer.close()
+        self.scan_written.emit(writer.directory)
+
+    def scan_finished(self, directory):
+        writer = self.scan_writer
+        self.scan_writer = None
+        if writer.dropped:
+            self.show_message("Scan", f"{len(writer.dropped)} Projektionen verworfen, Datenträger zu langsam.", WARNING)
+        if writer.error:
+            self.show_message("Scan", f"Fehler beim Schreiben: {writer.error}", ERROR)
+        self.show_message("Scan", f"Scan gespeichert in {directory}")
+        self.last_scan_directory = directory
+
+    # reconstruct the last scan or a chosen scan directory, while jobs run the button cancels them
+    def manual_reconstruction(self):
+        if self.reconstruction is None:
+            return
+        if self.reconstruction.busy:
+            self.reconstruction.cancel()
+            return
+        directory = self.last_scan_directory or QFileDialog.getExistingDirectory(self, "Scan wählen", self.path.text())
+        if not directory:
+            return
+        try:
+            self.reconstruction.submit_with_preview(directory)
+        except (OSError, ValueError, KeyError) as e:
+            self.show_message("Rekonstruktion", f"Scan kann nicht gelesen werden: {e}", ERROR)
+            return
+        self.manualReconstruction.setText("Rekonstruktion abbrechen")
+
+    def reconstruction_started(self, job_id, description):
+        self.show_message("Rekonstruktion", f"Gestartet: {description}")
+
+    def reconstruction_progress(self, job_id, percent):
+        self.manualReconstruction.setText(f"Rekonstruktion abbrechen ({percent} %)")
+
+    def reconstruction_finished(self, job_id, path):
+        self.show_message("Rekonstruktion", f"Volumen gespeichert in {path}")
+        if path.endswith("_preview.npy") and self.live_view is None:
+            self.show_volume_slice(path)
+        self.reconstruction_done()
+
+    def reconstruction_failed(self, job_id, error):
+        self.show_message("Rekonstruktion", f"Fehlgeschlagen: {error}", ERROR)
+        self.reconstruction_done()
+
+    def reconstruction_canceled(self, job_id):
+        self.show_message("Rekonstruktion", "Abgebrochen.", WARNING)
+        self.reconstruction_done()
+
+    def reconstruction_done(self):
+        if not self.reconstruction.busy:
+            self.manualReconstruction.setText(self.manual_reconstruction_text)
+
+    # middle slice of a reconstructed volume in the liveView label
+    def show_volume_slice(self, path):
+        import numpy as np
+        from live_view import numpy_to_qimage
+        volume = np.load(path, mmap_mode='r')
+        image = np.array(volume[volume.shape[0] // 2])
+        low, high = np.percentile(image, (0.5, 99.5))
+        image = ((np.clip(image, low, high) - low) * (255 / max(high - low, 1e-12))).astype(np.uint8)
+        self.preview_image = numpy_to_qimage(image)
+        pixmap = QPixmap.fromImage(self.preview_image)
+        self.liveView.setPixmap(pixmap.scaled(self.liveView.size(), Qt.AspectRatioMode.KeepAspectRatio,
+                                              Qt.TransformationMode.SmoothTransformation))
+
+    # binning of the live view, the combo box lists the factors 1 to 8
+    def change_liveview_binning(self, index):
+        self.live_view.set_binning(index + 1)
+
+    # show the second image sensor in the live view
+    def switch_camera(self, checked):
+        self.live_view.switch_camera(1 if checked else 0)
+
+    # dark/flat-field or LUT corrected live view
+    def preprocess_liveview(self, checked):
+        self.live_view.set_preprocessor(self.preprocessor.process if checked else None)
+
     # initiate the widgets and to assign functions to widgets 
     def assign_functions(self):
         self.comboBox.activated.connect(self.changePage)
+        if self.form.is_built("page_7"):
+            self.assign_recipe_functions()
+
+    # recipe drop target and scan mode of the Advance page, once the page exists
+    def assign_recipe_functions(self):
         self.groupBox_8.updated.connect(self.retrieve_variables_json_measurement)
+        self.groupBox_8.load_failed.connect(self.recipe_load_failed)
         self.json_scan_mode.activated.connect(self.changeMode)
 
-    def setup(self):
-        # Get the node once and store it
-        if self.client is not None:
-            try:
-                self.bBOOL1 = self.client.get_node("ns=4;s=OPCUA.bBOOL1")
-            except Exception as e:
-                print("Error while getting the node:", e)
-
-    def opcua_server_connect(self, retries=3):
-        wait_time = 1  # Initial wait time between retries
-        for i in range(retries):
-            try:
-                self.client = ua.Client(self.url)
-                self.client.set_user(self.username)
-                self.client.set_password(self.password)
-                self.client.connect()
-                print("Connected to OPC UA server")
-                self.client.load_type_definitions()
-                self.setup()
-                return  # Exit the function since connection is successful
-            except Exception as e:
-                self.server_connected = False
-                self.show_message("Systemstatus", f"Beim Versuch, eine Verbindung zum OPC UA-Server herzustellen, ist ein Fehler aufgetreten {i+1}")
-                if i < retries - 1:  # Don't wait after the last attempt
-                    time.sleep(wait_time)  # Wait for an increasing time before retrying
-                    wait_time *= 5  # Double the wait time for the next retry
-        self.show_message("Systemstatus", "Alle Verbindungsversuche sind fehlgeschlagen. Bitte überprüfen Sie Ihre Servereinstellungen und starten Sie die GUI erneut.")
-
-    def opcua_server_disconnect(self):
-        if self.client is not None:
-            try:
-                if self.subscription_info:
-                    single_subscription, _ = list(self.subscription_info.values())[0]
-                    try:
-                        for _, (_, handle) in self.subscription_info.items():
-                            # Check if the subscription is still active before unsubscribing
-                            if single_subscription in self.active_subscriptions:
-                                single_subscription.unsubscribe(handle)
-                                time.sleep(0.1)
-                        single_subscription.delete()
-                        time.sleep(0.1)
-                        self.active_subscriptions.remove(single_subscription)
-                    except Exception as e:
-                        print("Error while unsubscribing from subscription:", e)
-
-                    self.subscription_info.clear()
-
-                self.client.disconnect()
-                print("Disconnected from OPC UA server")
-            except Exception as e:
-                print("Error disconnecting from OPC UA server:", e)
-        else:
-            print("OPC UA client not initialized or already disconnected")
-
-    def delete_subscriptions(self):
-        if self.client is not None:
-            try:
-                if self.subscription_info:
-                    single_subscription, _ = list(self.subscription_info.values())[0]
-                    try:
-                        single_subscription.delete()
-                        time.sleep(0.1)
-                        self.active_subscriptions.remove(single_subscription)
-                    except Exception as e:
-                        print("Error while deleting subscription:", e)
-
-                    self.subscription_info.clear()
-
-                print("Subscriptions deleted")
-            except Exception as e:
-                print("Error deleting subscriptions:", e)
-        else:
-            print("OPC UA client not initialized or already disconnected")
-
-    def subscribe_to_nodes(self):
-        if self.client is not None:
-            try:
-                self.my_sub_handler = MySubHandler()
-                self.client.load_type_definitions()
-                single_subscription = self.client.create_subscription(100, self.my_sub_handler)
-                self.active_subscriptions.append(single_subscription)
-                for node_id in self.node_list:
-                    handle = single_subscription.subscribe_data_change(self.client.get_node(node_id))
-                    print(f"Subscribed to data changes for {node_id}")
-                    self.subscription_info[node_id] = (single_subscription, handle)
-            except Exception as e:
-                print(f"Error subscribing to data changes for nodes: {e}")
-        else:
-            print("OPC UA client not initialized or already disconnected")
-                
-    def is_connected(self):
-        if self.client is None:
-            return False
-        try:
-            self.client.get_endpoints()
-            return True
-        except Exception:
-            return False
-
-    def get_status(self):
-        # Check the value of the node
-        if self.client is not None and hasattr(self, 'bBOOL1'):
-            try:
-                self.BOOL1 = self.bBOOL1.get_value()
-                return True
-            except Exception as e:
-                return False
-
-    def check_server_status(self):
-        self.get_status()
-        current_status = self.is_connected()
-        if current_status != self.prev_server_connected:
-            if not current_status:
-                self.status = 0
-            elif current_status:
-                if self.get_status():
-                    self.status = 1
-                elif not self.get_status():
-                    self.status = 2
-            self.gui_main(self.status)
-        self.prev_server_connected = current_status
+    def set_BOOL1(self, value):
+        self.BOOL1 = value
 
     def update_GUI(self):
-        if self.client is not None:
-            try:       
-                self.BOOL1 = self.bBOOL1.get_value()
-
-                # Reset error flag because update was successful
-                self.error_displayed = False
-            except Exception as e:
-                if not self.error_displayed:
-                    print("Error while updating the GUI:", e)
-                    self.error_displayed = True
+        # Apply only the values pushed by the subscription since the previous frame
+        if metrics.enabled:
+            t0 = time.perf_counter()
+        changes = self.sub_handler.take_changes()
+        for node_id, value in changes.items():
+            updater = self.gui_updaters.get(node_id)
+            if updater is not None:
+                updater(value)
+        if metrics.enabled:
+            metrics.time("gui.update_GUI", time.perf_counter() - t0)
+            metrics.count("gui.drained_values", len(changes))
 
     def gui_main(self, status):
-        if status == 0: # Disconnected from OPCUA Server
-            print("Disconnected from the server. Attempting to reconnect.")
-            self.show_message("Systemstatus", "Disconnected from the server. Attempting to reconnect.")
-            self.delete_subscriptions()
+        # Connection handling runs in the OPC UA worker, only the GUI reacts here
+        from opcua_worker import ConnectionState
+        if self.recorder is not None:
+            self.recorder.event("state", status)
+        previous_status = self.status
+        self.server_connected = status == ConnectionState.CONNECTED
+        self.status = status
+        if status == ConnectionState.DISCONNECTED:
             self.update_gui_timer.stop()
-            self.opcua_server_connect()
-        elif status == 1: # Connected to OPCUA Server and Twincat is in Running mode
-            print("System Ready!")
-            self.show_message("Systemstatus", "System Ready!")
-            self.assign_functions()
-            self.subscribe_to_nodes()
+            # retries report themselves, only announce the loss of a working connection
+            if previous_status in (ConnectionState.CONNECTED, ConnectionState.PLC_CONFIG, ConnectionState.DEGRADED):
+                print("Disconnected from the server. Attempting to reconnect.")
+                self.show_message("Systemstatus", "Disconnected from the server. Attempting to reconnect.", ERROR)
+        elif status == ConnectionState.CONNECTING:
+            self.statusbar.showMessage("Verbindung zum OPC UA-Server wird hergestellt ...")
+        elif status == ConnectionState.CONNECTED: # Twincat is in Running mode
+            self.statusbar.clearMessage()
+            if previous_status != ConnectionState.DEGRADED:
+                print("System Ready!")
+                self.show_message("Systemstatus", "System Ready!")
+            if not self.functions_assigned:
+                self.assign_functions()
+                self.functions_assigned = True
             self.update_gui_timer.start()
-        elif status == 2: # Connected to OPCUA Server and Twincat is in Config mode
+        elif status == ConnectionState.PLC_CONFIG: # Twincat is in Config mode
+            self.statusbar.clearMessage()
             print("Warning: Twincat is in Config mode. No data received from server.")
-            self.show_message("Systemstatus", "Twincat is in Config mode. No data received from server.")
+            self.show_message("Systemstatus", "Twincat is in Config mode. No data received from server.", WARNING)
             self.update_gui_timer.stop()
+        elif status == ConnectionState.DEGRADED:
+            # subscriptions stay alive, values may be stale until the server answers again
+            self.statusbar.showMessage("Verbindung zum OPC UA-Server gestört ...")
+
+    def recipe_load_failed(self, path, error):
+        self.show_message("Rezept", f"{path} konnte nicht gelesen werden: {error}", ERROR)
 
     def retrieve_variables_json_measurement(self):
 
         print('json parameter file dropped')
 
         file_name = self.groupBox_8.file_name
-        # Retrieve all parameters from Json
+        # Retrieve all parameters from Json, already validated against recipe.RECIPE_SCHEMA
         parameters = self.groupBox_8.parameters
+        for error in self.groupBox_8.errors:
+            self.show_message("Rezept", error, WARNING)
 
         # Retrieve ScanParameter from Json
         scan_parameters = parameters.get('ScanParameter', {})
@@ -290,6 +623,10 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.json_current_measurement = source_parameters.get('current(mA)', None)
         self.json_focal_measurement = source_parameters.get('focalSpotSize(small/large)', None)
 
+        # Normalization and flip of the recipe also apply to the preprocessed live view
+        if self.preprocessor is not None:
+            self.preprocessor.configure(parameters)
+
         # Set Scan name
         self.name.setText(file_name)
 
@@ -397,16 +734,17 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.advance_preScanBin7 = '7' in bin_set
         self.advance_preScanBin8 = '8' in bin_set
 
-        if int(self.json_lut_steps.text()) > 2:
+        try:
+            lut_steps = int(self.json_lut_steps.text())
+        except ValueError:
+            self.show_message("Parameter", f"Ungültiger Wert für LUT-Stufen: {self.json_lut_steps.text()}", ERROR)
+            return
+        if lut_steps > 2:
             self.advance_LutOrFlatFieldCorrection = False
         else:
             self.advance_LutOrFlatFieldCorrection = True
 
-        print(self.advance_ScanBin1)
-        print(self.advance_ScanBin2)
-        print(self.advance_ScanBin8)
-        print(self.advance_LutOrFlatFieldCorrection)
-        print(self.advance_filePath)
+        self.send_parameters()
 
         # # stScan
         # self.advance_
@@ -436,8 +774,44 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         # self.advance_
         # self.advance_
 
+    def send_parameters(self):
+        # Convert the collected advance_ parameters and push them to the PLC in one write
+        from parameter_transfer import SCAN_PARAMETERS, active_mode_values, convert_parameters
+        values = {name: getattr(self, name) for name, _, _ in SCAN_PARAMETERS if hasattr(self, name)}
+        # the fields of the other scan mode are empty and not sent
+        converted, errors = convert_parameters(active_mode_values(values))
+        for name, raw in errors:
+            self.show_message("Parameter", f"Ungültiger Wert für {name}: {raw}", ERROR)
+        if errors:
+            return
+        if self.opcua_worker is None:
+            self.show_message("Parameter", "Keine Verbindung zur SPS, Scanparameter nicht übertragen.", WARNING)
+            return
+        if self.recorder is not None:
+            self.recorder.event("parameters", converted)
+        self.opcua_worker.parameters_write_requested.emit(converted)
+
+    def parameters_written(self, failed):
+        if self.recorder is not None:
+            self.recorder.event("parameters_written", failed)
+        if failed:
+            for name, error in failed.items():
+                self.show_message("Parameter", f"{name} konnte nicht geschrieben werden: {error}", ERROR)
+        else:
+            self.show_message("Parameter", "Scanparameter an die SPS übertragen.")
+
 
 if __name__ == "__main__":
+    if "--headless" in sys.argv:
+        # client logic without a window, see headless.py
+        import headless
+        sys.exit(headless.main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+    if "--replay" in sys.argv:
+        # python main.py --replay SESSION.lgs [--speed N], the same as LOCAL_GUI_REPLAY / LOCAL_GUI_REPLAY_SPEED
+        arguments = sys.argv[1:]
+        os.environ["LOCAL_GUI_REPLAY"] = arguments[arguments.index("--replay") + 1]
+        if "--speed" in arguments:
+            os.environ["LOCAL_GUI_REPLAY_SPEED"] = arguments[arguments.index("--speed") + 1]
     app = QtWidgets.QApplication(sys.argv)
     mainWindow = Ui_MainWindow()
     mainWindow.show()
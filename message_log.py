@@ -0,0 +1,188 @@
+from PyQt6 import QtCore
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor
+
+from collections import deque
+from datetime import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+
+
+INFO = 0
+WARNING = 1
+ERROR = 2
+SEVERITY_NAMES = {INFO: "Info", WARNING: "Warnung", ERROR: "Fehler"}
+LOG_LEVELS = {INFO: logging.INFO, WARNING: logging.WARNING, ERROR: logging.ERROR}
+SEVERITY_COLORS = {WARNING: QColor(200, 120, 0), ERROR: QColor(200, 0, 0)}
+
+DEFAULT_LOG_PATH = os.path.join(os.path.expanduser("~"), ".local_gui", "system_messages.log")
+
+
+class LogEntry:
+    __slots__ = ("message", "timestamp", "severity", "count")
+
+    def __init__(self, message, timestamp, severity):
+        self.message = message
+        self.timestamp = timestamp
+        self.severity = severity
+        self.count = 1
+
+
+class MessageLogModel(QtCore.QAbstractTableModel):
+    # System messages for the error_handling view. Rows live in a bounded ring buffer,
+    # appends are collected and inserted in one batch per flush interval, and repeated
+    # messages are folded into the previous row or rate limited instead of adding rows.
+    HEADERS = ["Status", "Zeit"]
+
+    def __init__(self, max_rows=1000, flush_interval=100, repeat_interval=10.0, log_path=DEFAULT_LOG_PATH, parent=None):
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self.repeat_interval = repeat_interval  # s, a message with the same pattern is shown at most once per interval
+        self._entries = deque()
+        self._pending = []
+        self._last_seen = {}  # (severity, message pattern) -> (time, entry)
+        self.suppressed = 0
+
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.timeout.connect(self.flush)
+
+        self._logger = None
+        self._handler = None
+        self._listener = None
+        if log_path:
+            self._start_file_log(log_path)
+
+    def _start_file_log(self, log_path):
+        # The GUI thread only puts records into a queue, a listener thread writes the rotating file
+        try:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+        except OSError as e:
+            print("Error while opening the message log file:", e)
+            return
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        log_queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(log_queue, file_handler)
+        self._listener.start()
+        self._logger = logging.getLogger("local_gui.messages")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        # the logger is shared by all models, close() removes this model's handler again
+        self._handler = logging.handlers.QueueHandler(log_queue)
+        self._logger.addHandler(self._handler)
+
+    def close(self):
+        self.flush()
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler = None
+            self._logger = None
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if index.column() == 0:
+                return entry.message if entry.count == 1 else f"{entry.message} ({entry.count}x)"
+            return entry.timestamp
+        if role == Qt.ItemDataRole.UserRole:
+            return entry.severity
+        if role == Qt.ItemDataRole.ForegroundRole and entry.severity in SEVERITY_COLORS:
+            return SEVERITY_COLORS[entry.severity]
+        return None
+
+    def append(self, message, severity=INFO):
+        now = time.monotonic()
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self._logger is not None:
+            self._logger.log(LOG_LEVELS[severity], message)
+
+        # numbers (retry counters, delays) do not make a message new, a different severity does
+        key = (severity, re.sub(r"\d+(\.\d+)?", "#", message))
+        last = self._last_seen.get(key)
+        if last is not None and now - last[0] < self.repeat_interval:
+            entry = last[1]
+            row = self._row(entry)
+            # an evicted row is not folded into, the message gets a new row below
+            if row is not None or any(pending is entry for pending in self._pending):
+                # fold the repeat into the row that is already shown
+                entry.count += 1
+                entry.timestamp = timestamp
+                entry.message = message
+                self._last_seen[key] = (now, entry)
+                self.suppressed += 1
+                if row is not None:
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, 1))
+                return
+
+        entry = LogEntry(message, timestamp, severity)
+        self._last_seen[key] = (now, entry)
+        self._pending.append(entry)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _row(self, entry):
+        # repeats almost always hit one of the newest rows, search from the end
+        for row in range(len(self._entries) - 1, -1, -1):
+            if self._entries[row] is entry:
+                return row
+        return None
+
+    def flush(self):
+        # Insert all pending rows at once and drop the oldest rows above max_rows
+        if not self._pending:
+            return
+        pending = self._pending[-self.max_rows:]
+        self._pending = []
+        overflow = len(self._entries) + len(pending) - self.max_rows
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._entries.popleft()
+            self.endRemoveRows()
+        first = len(self._entries)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(pending) - 1)
+        self._entries.extend(pending)
+        self.endInsertRows()
+        # forget patterns whose rows are gone
+        if len(self._last_seen) > 2 * self.max_rows:
+            alive = set(map(id, self._entries))
+            self._last_seen = {key: value for key, value in self._last_seen.items() if id(value[1]) in alive}
+
+
+class SeverityFilterModel(QtCore.QSortFilterProxyModel):
+    # Hides messages below the selected severity
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.minimum_severity = INFO
+
+    def set_minimum_severity(self, severity):
+        self.minimum_severity = severity
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        index = self.sourceModel().index(source_row, 0, source_parent)
+        return self.sourceModel().data(index, Qt.ItemDataRole.UserRole) >= self.minimum_severity
@@ -0,0 +1,285 @@
+from PyQt6 import QtCore
+
+from datetime import datetime, timezone
+import json
+import os
+import threading
+import time
+
+
+# Instrumentation of the client: duration of every OPC UA service call, lag of the Qt
+# event loops, notification rate and backlog per subscription and the GUI drain.
+# Disabled unless LOCAL_GUI_METRICS, LOCAL_GUI_METRICS_FILE or LOCAL_GUI_METRICS_PORT
+# is set. Then nothing is patched and the hooks in the hot paths cost one attribute check.
+DEFAULT_METRICS_PATH = os.path.join(os.path.expanduser("~"), ".local_gui", "metrics.jsonl")
+
+
+class Timing:
+    # Count, total and maximum since start, percentiles over the most recent samples
+    __slots__ = ("count", "total", "max", "recent", "index")
+
+    def __init__(self, size=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = [0.0] * size
+        self.index = 0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent[self.index] = seconds
+        self.index = (self.index + 1) % len(self.recent)
+
+    def summary(self):
+        # milliseconds
+        recent = sorted(self.recent[:self.count] if self.count < len(self.recent) else self.recent)
+        if not recent:
+            return {"count": 0}
+        return {"count": self.count,
+                "mean_ms": round(self.total / self.count * 1000, 3),
+                "p50_ms": round(recent[len(recent) // 2] * 1000, 3),
+                "p99_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000, 3),
+                "max_ms": round(self.max * 1000, 3)}
+
+
+class Metrics:
+    # Counters, gauges and timings shared by all threads. sample() turns the counters into
+    # rates and is called once per interval by the MetricsReporter.
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._sources = []  # callables run before every sample, they update totals and gauges
+        self._previous = {}  # counter -> value at the last sample
+        self._previous_time = None
+        self.last_sample = {}
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            instrument_opcua()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_total(self, name, total):
+        # counter that is kept elsewhere, e.g. the sequence number of the subscription handler
+        with self._lock:
+            self._counters[name] = total
+
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def time(self, name, seconds):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = Timing()
+            timing.add(seconds)
+
+    def add_source(self, source):
+        self._sources.append(source)
+
+    def remove_source(self, source):
+        if source in self._sources:
+            self._sources.remove(source)
+
+    def sample(self):
+        for source in list(self._sources):
+            try:
+                source()
+            except Exception as e:
+                print("Error while sampling metrics:", e)
+        now = time.perf_counter()
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: timing.summary() for name, timing in self._timings.items()}
+        elapsed = now - self._previous_time if self._previous_time is not None else None
+        rates = {}
+        if elapsed:
+            for name, value in counters.items():
+                rates[name] = round((value - self._previous.get(name, 0)) / elapsed, 1)
+        self._previous = counters
+        self._previous_time = now
+        self.last_sample = {"time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                            "counters": counters, "rates_per_s": rates, "gauges": gauges, "timings": timings}
+        return self.last_sample
+
+
+metrics = Metrics()
+
+_opcua_instrumented = False
+
+
+def instrument_opcua():
+    # Time every request from sending until its response (or error) arrives, named after the
+    # request type. Publish requests are held by the server until it has notifications, their
+    # duration is the publish wait and not a round-trip. Subscriptions report notifications
+    # and the server side backlog (unacknowledged notification messages) per publish response.
+    global _opcua_instrumented
+    if _opcua_instrumented:
+        return
+    _opcua_instrumented = True
+    from opcua import ua
+    from opcua.client.ua_client import UASocketClient
+    from opcua.common.subscription import Subscription
+    send_request = UASocketClient._send_request
+    publish_callback = Subscription.publish_callback
+
+    def timed_send_request(self, request, callback=None, timeout=1000, message_type=ua.MessageType.SecureMessage):
+        name = "opcua." + type(request).__name__.replace("Request", "")
+        t0 = time.perf_counter()
+        future = send_request(self, request, callback, timeout, message_type)
+
+        def done(future):
+            metrics.time(name, time.perf_counter() - t0)
+            if future.cancelled() or future.exception() is not None:
+                metrics.count(name + ".errors")
+        future.add_done_callback(done)
+        return future
+
+    def counted_publish_callback(self, publishresult):
+        prefix = f"subscription.{self.subscription_id}"
+        message = publishresult.NotificationMessage
+        notifications = sum(len(getattr(data, "MonitoredItems", ())) for data in message.NotificationData)
+        metrics.count(prefix + ".publish_responses")
+        metrics.count(prefix + ".notifications", notifications)
+        metrics.gauge(prefix + ".backlog", len(publishresult.AvailableSequenceNumbers or ()))
+        if message.PublishTime is not None:
+            publish_time = message.PublishTime
+            if publish_time.tzinfo is None:
+                publish_time = publish_time.replace(tzinfo=timezone.utc)
+            metrics.time(prefix + ".delivery_delay", max(0.0, (datetime.now(timezone.utc) - publish_time).total_seconds()))
+        t0 = time.perf_counter()
+        publish_callback(self, publishresult)
+        metrics.time(prefix + ".handler", time.perf_counter() - t0)
+
+    UASocketClient._send_request = timed_send_request
+    Subscription.publish_callback = counted_publish_callback
+
+
+class EventLoopLag(QtCore.QObject):
+    # A precise timer in the thread of this object, the delay beyond its interval is the time
+    # the event loop was busy with something else
+    def __init__(self, name, interval=100, parent=None):
+        super().__init__(parent)
+        self.name = name + ".event_loop_lag"
+        self.interval = interval
+        self.timer = None
+        self.due = None
+
+    @QtCore.pyqtSlot()
+    def start(self):
+        # must run in the thread whose event loop is measured
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(self.interval)
+        self.timer.timeout.connect(self.tick)
+        self.due = time.perf_counter() + self.interval / 1000
+        self.timer.start()
+
+    @QtCore.pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter()
+        metrics.time(self.name, max(0.0, now - self.due))
+        self.due = now + self.interval / 1000
+
+
+def start_metrics_server(port):
+    # Serves the last sample as JSON on http://127.0.0.1:<port>/metrics. http.server is only
+    # imported here, it pulls in ssl and email and would slow down every start.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(metrics.last_sample).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class MetricsReporter(QtCore.QObject):
+    # Samples the metrics once per interval in the GUI thread, appends every file_every-th
+    # sample to a JSON lines file and serves the last sample on http://127.0.0.1:<port>/metrics
+    sampled = QtCore.pyqtSignal(dict)
+
+    def __init__(self, interval=1000, path=None, port=None, file_every=10, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.file_every = file_every
+        self.samples = 0
+        self.server = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if port:
+            try:
+                self.server = start_metrics_server(port)
+            except OSError as e:
+                print(f"Metrics endpoint on port {port} not available:", e)
+                self.server = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.sample)
+
+    def start(self):
+        self.timer.start()
+
+    def sample(self):
+        sample = metrics.sample()
+        self.samples += 1
+        if self.path and self.samples % self.file_every == 0:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(sample) + "\n")
+            except OSError as e:
+                print("Error while writing the metrics file:", e)
+        self.sampled.emit(sample)
+
+    def close(self):
+        self.timer.stop()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def reporter_from_environment(parent=None):
+    # MetricsReporter configured by LOCAL_GUI_METRICS (1 = panel only), LOCAL_GUI_METRICS_FILE
+    # (path, "1" for the default path) and LOCAL_GUI_METRICS_PORT, None if all are unset
+    enabled = os.environ.get("LOCAL_GUI_METRICS", "") not in ("", "0")
+    path = os.environ.get("LOCAL_GUI_METRICS_FILE") or None
+    if path == "1":
+        path = DEFAULT_METRICS_PATH
+    try:
+        port = int(os.environ.get("LOCAL_GUI_METRICS_PORT") or 0)
+    except ValueError:
+        print("LOCAL_GUI_METRICS_PORT is not a port number")
+        port = 0
+    if not (enabled or path or port):
+        return None
+    metrics.enable()
+    return MetricsReporter(path=path, port=port or None, parent=parent)
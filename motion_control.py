@@ -0,0 +1,189 @@
+from opcua import ua
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from message_log import ERROR, WARNING
+from parameter_transfer import convert_value
+
+
+class Axis:
+    # PLC variables of one axis. Jogging runs while bJogPos / bJogNeg are set, an absolute
+    # move starts on the rising edge of bMoveAbs (reset by the PLC) with the target nEinPos,
+    # bStop stops the axis with the PLC's stop deceleration, bMoveAbs and bStop are reset by the PLC.
+    def __init__(self, name, prefix):
+        self.name = name
+        self.jog_positive = f"{prefix}.bJogPos"
+        self.jog_negative = f"{prefix}.bJogNeg"
+        self.target_position = f"{prefix}.nEinPos"
+        self.move_absolute = f"{prefix}.bMoveAbs"
+        self.stop = f"{prefix}.bStop"
+        self.actual_position = f"{prefix}.nActPos"
+        # types used until the server's are read after connecting, writes never look them up
+        self.types = {self.jog_positive: ua.VariantType.Boolean, self.jog_negative: ua.VariantType.Boolean,
+                      self.target_position: ua.VariantType.Double, self.move_absolute: ua.VariantType.Boolean,
+                      self.stop: ua.VariantType.Boolean}
+
+    def release(self):
+        # values that end jogging
+        return [(self.jog_positive, False), (self.jog_negative, False)]
+
+
+# Rotation table (R_* widgets) and Z axis (Z_* / ZB_* widgets).
+# Placeholders: the axis structures of the PLC project are not part of this repository, the
+# OPCUA.stR / OPCUA.stZB paths and their member names are assumptions named after the
+# widgets. Replace them with the real GVL paths before moving an axis.
+AXES = {
+    "R": Axis("R", "ns=4;s=OPCUA.stR"),
+    "ZB": Axis("ZB", "ns=4;s=OPCUA.stZB"),
+}
+
+
+class MotionController:
+    # Sends motion commands from the GUI to the PLC without blocking the GUI thread.
+    # Every axis has a single pending command slot, a new command replaces the one not
+    # yet sent, so mashing buttons never queues stale writes. The OPC UA worker sends
+    # the pending commands of all axes in one Write call. Stops bypass the slot and the
+    # worker's event queue and are written at once from their own thread.
+    def __init__(self, worker, axes=AXES):
+        self.worker = worker
+        self.axes = axes
+        self._lock = threading.Lock()
+        self._pending = {}  # axis name -> (stop generation, [(node id, value)])
+        self._scheduled = False  # a flush is queued in the worker thread
+        self._stop_generation = {name: 0 for name in axes}
+        self._stop_executor = ThreadPoolExecutor(1)
+        self._types = {}  # node id -> VariantType, defaults of the axes until the worker read the server's
+        for axis in axes.values():
+            self._types.update(axis.types)
+        # commands that must reach the PLC even if the connection was down: axes whose jog
+        # has to be released and axes to stop, sent by resend_held() after reconnecting
+        self._held_releases = set()
+        self._held_stops = set()
+
+    def resolve_types(self):
+        # Worker thread: read the data types once after connecting, the stop thread only uses this table
+        for axis in self.axes.values():
+            for node_id in (axis.jog_positive, axis.jog_negative, axis.target_position, axis.move_absolute, axis.stop):
+                try:
+                    self._types[node_id] = self.worker.node_cache.variant_type(node_id)
+                except Exception as e:
+                    print(f"Error while reading the data type of {node_id}:", e)
+
+    # commands, called from the GUI thread
+
+    def jog(self, axis, direction):
+        # direction > 0 positive, < 0 negative, 0 ends jogging
+        axis = self.axes[axis]
+        self._submit(axis, [(axis.jog_positive, direction > 0), (axis.jog_negative, direction < 0)])
+
+    def move_to(self, axis, position):
+        axis = self.axes[axis]
+        self._submit(axis, [(axis.jog_positive, False), (axis.jog_negative, False),
+                            (axis.target_position, position), (axis.move_absolute, True)])
+
+    def stop(self, axis=None):
+        # Stop one or all axes. Pending commands of these axes are discarded.
+        names = list(self.axes) if axis is None else [axis]
+        with self._lock:
+            for name in names:
+                self._pending.pop(name, None)
+                self._stop_generation[name] += 1
+        self._stop_executor.submit(self._write_stop, names)
+
+    def _submit(self, axis, values):
+        with self._lock:
+            self._pending[axis.name] = (self._stop_generation[axis.name], values)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.worker.motion_requested.emit()
+
+    # writes, called from the worker thread and the stop thread
+
+    def flush(self):
+        # Worker thread: send the newest command of every axis in one Write service call
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._scheduled = False
+        if not pending:
+            return
+        client = self.worker.client
+        if client is None:
+            # the command is dropped, but an axis that may still be jogging is released after reconnecting
+            with self._lock:
+                self._held_releases.update(pending)
+            self.worker.message.emit("Achssteuerung", "Keine Verbindung zur SPS, Fahrbefehl verworfen. "
+                                     "Tippbetrieb wird nach dem Verbindungsaufbau beendet.", WARNING)
+            return
+        values = [value for _, axis_values in pending.values() for value in axis_values]
+        try:
+            failed = self._write(client, values)
+        except Exception as e:
+            print("Error while sending a motion command:", e)
+            failed = {node_id: str(e) for node_id, _ in values}
+            # the connection may have dropped with a jog on the way, release the axes after reconnecting
+            with self._lock:
+                self._held_releases.update(pending)
+        if failed:
+            self.worker.message.emit("Achssteuerung", f"Fahrbefehl fehlgeschlagen: {', '.join(f'{n} ({s})' for n, s in failed.items())}", ERROR)
+        # a stop issued while this command was on the way may have arrived first, repeat it
+        with self._lock:
+            stopped = [name for name, (generation, _) in pending.items() if generation != self._stop_generation[name]]
+        if stopped:
+            self._write_stop(stopped)
+
+    def _write_stop(self, names):
+        client = self.worker.client
+        if client is None:
+            with self._lock:
+                self._held_stops.update(names)
+            self.worker.message.emit("Achssteuerung", "Keine Verbindung zur SPS, HALT wird nach dem Verbindungsaufbau gesendet!", ERROR)
+            return
+        values = []
+        for name in names:
+            axis = self.axes[name]
+            values += [(axis.jog_positive, False), (axis.jog_negative, False), (axis.move_absolute, False), (axis.stop, True)]
+        try:
+            failed = self._write(client, values)
+        except Exception as e:
+            print("Error while sending a stop command:", e)
+            failed = {"HALT": str(e)}
+        if failed:
+            self.worker.message.emit("Achssteuerung", f"HALT fehlgeschlagen: {', '.join(f'{n} ({s})' for n, s in failed.items())}", ERROR)
+
+    def resend_held(self):
+        # Worker thread, after reconnecting: release and stop the axes whose commands were dropped
+        with self._lock:
+            releases, self._held_releases = self._held_releases - self._held_stops, set()
+            stops, self._held_stops = self._held_stops, set()
+        if stops:
+            self._write_stop(sorted(stops))
+        if releases:
+            values = [value for name in sorted(releases) for value in self.axes[name].release()]
+            try:
+                failed = self._write(self.worker.client, values)
+            except Exception as e:
+                print("Error while releasing the jog:", e)
+                failed = {node_id: str(e) for node_id, _ in values}
+            if failed:
+                self.worker.message.emit("Achssteuerung", f"Tippbetrieb nicht beendet: {', '.join(f'{n} ({s})' for n, s in failed.items())}", ERROR)
+
+    def _write(self, client, values):
+        # values: [(node id, value)], later values for the same node win. Returns {node id: status} of failed writes.
+        params = ua.WriteParameters()
+        node_ids = list(dict(values))
+        latest = dict(values)
+        for node_id in node_ids:
+            variant_type = self._types[node_id]
+            write_value = ua.WriteValue()
+            write_value.NodeId = ua.NodeId.from_string(node_id)
+            write_value.AttributeId = ua.AttributeIds.Value
+            write_value.Value = ua.DataValue(ua.Variant(convert_value(latest[node_id], variant_type), variant_type))
+            params.NodesToWrite.append(write_value)
+        results = client.uaclient.write(params)
+        return {node_id: result for node_id, result in zip(node_ids, results) if not result.is_good()}
+
+    def close(self):
+        self._stop_executor.shutdown(wait=True)
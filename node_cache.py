@@ -0,0 +1,140 @@
+from opcua import ua
+from opcua.common.structures import StructGenerator, _clean_name
+from enum import EnumMeta
+import base64
+import hashlib
+import json
+import os
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".local_gui", "node_cache.json")
+
+# Values that identify the address space of a server, the cache is invalid when one changes
+FINGERPRINT_NODES = [
+    ua.ObjectIds.Server_NamespaceArray,
+    ua.ObjectIds.Server_ServerStatus_BuildInfo_ProductUri,
+    ua.ObjectIds.Server_ServerStatus_BuildInfo_SoftwareVersion,
+    ua.ObjectIds.Server_ServerStatus_BuildInfo_BuildNumber,
+    ua.ObjectIds.Server_ServerStatus_BuildInfo_BuildDate,
+]
+
+
+class NodeCache:
+    # Cache of resolved nodes, their data types and the custom structure definitions
+    # of one server. Everything except the Node objects is persisted to disk keyed by
+    # server URL + namespace array + build info, so a reconnect only needs a single
+    # Read to validate the cache instead of browsing the address space again.
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.fingerprint = None
+        self.entry = None  # cached data of the current server
+        self._loaded_fingerprint = None  # structures registered in this process
+        self._client = None
+        self._nodes = {}
+        self._store = self._read_store()
+
+    def _read_store(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._store, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print("Error while saving the node cache:", e)
+
+    def attach(self, client, url):
+        # Called after every connect. Node objects belong to one client, the rest
+        # survives as long as the server fingerprint is unchanged.
+        self._client = client
+        self._nodes = {}
+        params = ua.ReadParameters()
+        for object_id in FINGERPRINT_NODES:
+            read_value = ua.ReadValueId()
+            read_value.NodeId = ua.NodeId(object_id)
+            read_value.AttributeId = ua.AttributeIds.Value
+            params.NodesToRead.append(read_value)
+        results = client.uaclient.read(params)
+        identity = json.dumps([url] + [str(result.Value.Value) for result in results])
+        fingerprint = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            if fingerprint not in self._store:
+                # drop entries of older builds of this server
+                for key in [key for key, entry in self._store.items() if entry.get("url") == url]:
+                    del self._store[key]
+                self._store[fingerprint] = {"url": url, "nodes": {}, "type_dictionaries": None}
+            self.entry = self._store[fingerprint]
+        return fingerprint
+
+    def get_node(self, node_id):
+        node = self._nodes.get(node_id)
+        if node is None:
+            node = self._nodes[node_id] = self._client.get_node(node_id)
+        return node
+
+    def variant_type(self, node_id):
+        # VariantType of a variable node, read from the server only the first time
+        nodes = self.entry["nodes"]
+        name = nodes.get(node_id)
+        if name is None:
+            name = self.get_node(node_id).get_data_type_as_variant_type().name
+            nodes[node_id] = name
+            self.save()
+        return ua.VariantType[name]
+
+    def load_type_definitions(self):
+        # Register the server's custom structures. Nothing is done if they are already
+        # registered for this fingerprint, the stored XML is replayed if they are on disk.
+        if self._loaded_fingerprint == self.fingerprint:
+            return
+        dictionaries = self.entry["type_dictionaries"]
+        if dictionaries is None:
+            dictionaries = self._download_type_dictionaries()
+            self.entry["type_dictionaries"] = dictionaries
+            self.save()
+        register_type_dictionaries(dictionaries)
+        self._loaded_fingerprint = self.fingerprint
+
+    def _download_type_dictionaries(self):
+        # Same browse as opcua.common.structures.load_type_definitions, but the
+        # dictionary XML and type ids are kept so they can be replayed later
+        dictionaries = []
+        client = self._client
+        for desc in client.nodes.opc_binary.get_children_descriptions():
+            if desc.BrowseName == ua.QualifiedName("Opc.Ua"):
+                continue
+            node = client.get_node(desc.NodeId)
+            typeids = {}
+            for ndesc in node.get_children_descriptions():
+                ndesc_node = client.get_node(ndesc.NodeId)
+                ref_desc_list = ndesc_node.get_references(refs=ua.ObjectIds.HasDescription, direction=ua.BrowseDirection.Inverse)
+                if ref_desc_list:
+                    typeids[_clean_name(ndesc.BrowseName.Name)] = ref_desc_list[0].NodeId.to_string()
+            dictionaries.append({
+                "xml": base64.b64encode(node.get_value()).decode("ascii"),
+                "typeids": typeids,
+            })
+        return dictionaries
+
+
+def register_type_dictionaries(dictionaries):
+    # Generate the Python classes from stored dictionary XML and register them in the ua module
+    for dictionary in dictionaries:
+        structs_dict = {}
+        generator = StructGenerator()
+        generator.make_model_from_string(base64.b64decode(dictionary["xml"]))
+        generator.get_python_classes(structs_dict)
+        for name, typeid in dictionary["typeids"].items():
+            if name in structs_dict:
+                ua.register_extension_object(name, ua.NodeId.from_string(typeid), structs_dict[name])
+        for key, val in structs_dict.items():
+            if isinstance(val, EnumMeta) and key != "IntEnum":
+                setattr(ua, key, val)
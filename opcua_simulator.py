@@ -0,0 +1,293 @@
+from opcua import Server, ua
+from opcua.common import utils
+from opcua.server.uaprocessor import UaProcessor
+from opcua.ua.ua_binary import struct_from_binary
+
+import argparse
+from datetime import datetime
+import math
+import random
+import threading
+import time
+
+from motion_control import AXES
+from opcua_worker import STATUS_NODE
+from parameter_transfer import SCAN_PARAMETERS
+
+
+# TwinCAT publishes the PLC symbols in namespace 4
+PLC_NAMESPACES = ["urn:local_gui:sim:ns2", "urn:local_gui:sim:ns3", "urn:BeckhoffAutomation:Ua:PLC1"]
+DEFAULT_NODES = ["ns=4;s=MAIN.myVar1", STATUS_NODE]
+
+
+def variable_node_ids(count):
+    # Simulated process values, subscribed by the headless runner
+    return [f"ns=4;s=MAIN.aSim[{i}]" for i in range(count)]
+
+
+class _FaultInjection:
+    # Latency and outages applied to every message of every client connection
+    latency = 0.0  # s per request
+    outage_until = 0.0  # time.monotonic() until which connections are refused
+
+
+class _SubscriptionTransfer:
+    # Subscriptions of dropped connections live on for lifetime seconds, like the subscriptions
+    # of a PLC session that has not timed out, and can be taken over with TransferSubscriptions.
+    # Disabled, the service is rejected with BadServiceUnsupported like python-opcua does.
+    enabled = True
+    lifetime = 30.0  # s
+    orphaned = set()  # subscription ids without a session
+
+
+_process = UaProcessor.process
+_process_message = UaProcessor._process_message
+_close = UaProcessor.close
+
+
+def _faulty_process(processor, header, body):
+    # Runs on the server's asyncio thread, a delay here delays every connection like a busy PLC
+    if time.monotonic() < _FaultInjection.outage_until:
+        return False  # closes the connection
+    if _FaultInjection.latency:
+        time.sleep(_FaultInjection.latency)
+    return _process(processor, header, body)
+
+
+def _process_message_with_transfer(processor, typeid, requesthdr, seqhdr, body):
+    if not _SubscriptionTransfer.enabled or typeid != ua.NodeId(ua.ObjectIds.TransferSubscriptionsRequest_Encoding_DefaultBinary):
+        return _process_message(processor, typeid, requesthdr, seqhdr, body)
+    if processor.session is None:
+        raise utils.ServiceError(ua.StatusCodes.BadSessionIdInvalid)
+    params = struct_from_binary(ua.TransferSubscriptionsParameters, body)
+    service = processor.iserver.subscription_service
+    response = ua.TransferSubscriptionsResponse()
+    for subscription_id in params.SubscriptionIds:
+        result = ua.TransferResult()
+        subscription = service.subscriptions.get(subscription_id)
+        if subscription is None or subscription_id not in _SubscriptionTransfer.orphaned:
+            result.StatusCode = ua.StatusCode(ua.StatusCodes.BadSubscriptionIdInvalid)
+        else:
+            _SubscriptionTransfer.orphaned.discard(subscription_id)
+            subscription.callback = processor.forward_publish_response
+            processor.session.subscriptions.append(subscription_id)
+            if params.SendInitialValues:
+                _send_current_values(processor.iserver.aspace, subscription)
+        response.Parameters.Results.append(result)
+    processor.send_response(requesthdr.RequestHandle, seqhdr, response)
+    return True
+
+
+def _send_current_values(aspace, subscription):
+    items = subscription.monitored_item_srv
+    for handle in list(items._monitored_datachange):
+        nodeid, attribute = aspace._handle_to_attribute_map[handle]
+        items.trigger_datachange(handle, nodeid, attribute)
+
+
+def _close_keeping_subscriptions(processor):
+    # A dropped connection leaves its subscriptions to a transfer, a CloseSession has deleted them already
+    session = processor.session
+    if _SubscriptionTransfer.enabled and session is not None and session.subscriptions:
+        orphaned = session.subscriptions[:]
+        session.subscriptions.clear()
+        _SubscriptionTransfer.orphaned.update(orphaned)
+        iserver = processor.iserver
+        iserver.loop.call_later(_SubscriptionTransfer.lifetime, lambda: _expire(iserver, orphaned))
+    _close(processor)
+
+
+def _expire(iserver, subscription_ids):
+    expired = [subscription_id for subscription_id in subscription_ids if subscription_id in _SubscriptionTransfer.orphaned]
+    _SubscriptionTransfer.orphaned.difference_update(expired)
+    iserver.subscription_service.delete_subscriptions(expired)
+
+
+class PlcSimulator:
+    # Local OPC UA server with a TwinCAT-like address space: the status node, the scan
+    # parameters, the motion axes and count process values that change rate times per
+    # second. Run/Config mode, request latency and connection losses can be injected.
+    # transfer_subscriptions=False rejects TransferSubscriptions like servers without the service.
+    def __init__(self, endpoint="opc.tcp://127.0.0.1:4840", variables=100, rate=10.0, username="admin1", password="admin1",
+                 transfer_subscriptions=True):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.transfer_subscriptions = transfer_subscriptions
+        self.username = username
+        self.password = password
+        self.running_mode = True  # TwinCAT Run mode, False = Config mode
+        self.updates = 0  # value changes published so far
+        self.server = Server()
+        self.server.set_endpoint(endpoint)
+        self.server.set_server_name("Local GUI PLC simulator")
+        self.server.set_security_policy([ua.SecurityPolicyType.NoSecurity])
+        if username:
+            self.server.user_manager.set_user_manager(self._check_user)
+        for uri in PLC_NAMESPACES:
+            self.server.register_namespace(uri)
+        self.aspace = self.server.iserver.aspace
+
+        self.nodes = {}  # node id string -> NodeId
+        self._add(STATUS_NODE, True, ua.VariantType.Boolean)
+        self._add("ns=4;s=MAIN.myVar1", 0, ua.VariantType.Int16)
+        for _, node_id, variant_type in SCAN_PARAMETERS:
+            self._add(node_id, "" if variant_type == ua.VariantType.String else False if variant_type == ua.VariantType.Boolean else 0, variant_type)
+        for axis in AXES.values():
+            for node_id in (axis.jog_positive, axis.jog_negative, axis.move_absolute, axis.stop):
+                self._add(node_id, False, ua.VariantType.Boolean)
+            self._add(axis.target_position, 0.0, ua.VariantType.Double)
+            self._add(axis.actual_position, 0.0, ua.VariantType.Double)
+        self.variables = [self._add(node_id, 0.0, ua.VariantType.Double) for node_id in variable_node_ids(variables)]
+
+        self._stop_event = threading.Event()
+        self._threads = [threading.Thread(target=self._update_variables, daemon=True),
+                         threading.Thread(target=self._update_axes, daemon=True)]
+
+    def _check_user(self, isession, username, password):
+        if isinstance(password, bytes):
+            password = password.decode("utf-8", "replace")
+        return username == self.username and password == self.password
+
+    def _add(self, node_id, value, variant_type):
+        node = self.server.get_objects_node().add_variable(ua.NodeId.from_string(node_id), node_id.split("=")[-1], ua.Variant(value, variant_type))
+        node.set_writable()
+        self.nodes[node_id] = node.nodeid
+        return node.nodeid
+
+    def start(self):
+        UaProcessor.process = _faulty_process
+        UaProcessor._process_message = _process_message_with_transfer
+        UaProcessor.close = _close_keeping_subscriptions
+        _SubscriptionTransfer.enabled = self.transfer_subscriptions
+        self.server.start()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self.server.stop()
+        UaProcessor.process = _process
+        UaProcessor._process_message = _process_message
+        UaProcessor.close = _close
+        _SubscriptionTransfer.orphaned.clear()
+
+    # fault injection
+
+    def set_latency(self, seconds):
+        _FaultInjection.latency = seconds
+
+    def set_running(self, running):
+        # Config mode: the PLC symbols report a bad status, values stop changing
+        self.running_mode = running
+        status = ua.StatusCode(ua.StatusCodes.Good if running else ua.StatusCodes.BadOutOfService)
+        for nodeid in self.nodes.values():
+            data_value = self.aspace.get_attribute_value(nodeid, ua.AttributeIds.Value)
+            self._set(nodeid, data_value.Value, status)
+
+    def disconnect_clients(self, outage=0.0):
+        # Drop every client connection, new connections are refused for outage seconds
+        _FaultInjection.outage_until = time.monotonic() + outage
+        iserver = self.server.iserver
+        for transport in list(iserver.asyncio_transports):
+            iserver.loop.call_soon(transport.close)
+
+    # simulated process
+
+    def _set(self, nodeid, variant, status=None):
+        data_value = ua.DataValue(variant, status or ua.StatusCode(ua.StatusCodes.Good))
+        data_value.SourceTimestamp = data_value.ServerTimestamp = datetime.utcnow()
+        self.aspace.set_attribute_value(nodeid, ua.AttributeIds.Value, data_value)
+
+    def _value(self, node_id):
+        return self.aspace.get_attribute_value(self.nodes[node_id], ua.AttributeIds.Value).Value.Value
+
+    def _update_variables(self):
+        interval = 1 / self.rate
+        next_time = time.monotonic()
+        while not self._stop_event.is_set():
+            if self.running_mode:
+                now = time.monotonic()
+                for i, nodeid in enumerate(self.variables):
+                    self._set(nodeid, ua.Variant(math.sin(now + i) + random.random() * 1e-3, ua.VariantType.Double))
+                self.updates += len(self.variables)
+            next_time += interval
+            # a slow tick is not made up for, the rate drops instead of bursting
+            next_time = max(next_time, time.monotonic())
+            self._stop_event.wait(next_time - time.monotonic())
+
+    def _update_axes(self, interval=0.02, velocity=10.0):
+        # Jog and absolute moves at velocity units/s, the PLC resets bMoveAbs and bStop
+        targets = {name: None for name in AXES}
+        while not self._stop_event.wait(interval):
+            if not self.running_mode:
+                continue
+            for name, axis in AXES.items():
+                position = self._value(axis.actual_position)
+                if self._value(axis.stop):
+                    targets[name] = None
+                    self._set(self.nodes[axis.stop], ua.Variant(False, ua.VariantType.Boolean))
+                    continue
+                if self._value(axis.move_absolute):
+                    targets[name] = float(self._value(axis.target_position))
+                    self._set(self.nodes[axis.move_absolute], ua.Variant(False, ua.VariantType.Boolean))
+                step = velocity * interval
+                if self._value(axis.jog_positive):
+                    targets[name] = None
+                    position += step
+                elif self._value(axis.jog_negative):
+                    targets[name] = None
+                    position -= step
+                elif targets[name] is not None:
+                    delta = targets[name] - position
+                    position = targets[name] if abs(delta) <= step else position + math.copysign(step, delta)
+                    if position == targets[name]:
+                        targets[name] = None
+                else:
+                    continue
+                self._set(self.nodes[axis.actual_position], ua.Variant(position, ua.VariantType.Double))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OPC UA PLC simulator")
+    parser.add_argument("--endpoint", default="opc.tcp://127.0.0.1:4840")
+    parser.add_argument("--variables", type=int, default=100, help="number of simulated process values")
+    parser.add_argument("--rate", type=float, default=10.0, help="changes per second of every process value")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay per request in s")
+    parser.add_argument("--toggle-mode", type=float, default=0.0, metavar="S", help="switch between Run and Config mode every S seconds")
+    parser.add_argument("--disconnect-every", type=float, default=0.0, metavar="S", help="drop all connections every S seconds")
+    parser.add_argument("--outage", type=float, default=0.0, metavar="S", help="refuse connections for S seconds after a drop")
+    parser.add_argument("--no-transfer", action="store_true", help="reject TransferSubscriptions after a drop")
+    parser.add_argument("--username", default="admin1")
+    parser.add_argument("--password", default="admin1")
+    args = parser.parse_args(argv)
+
+    simulator = PlcSimulator(args.endpoint, args.variables, args.rate, args.username, args.password,
+                             transfer_subscriptions=not args.no_transfer)
+    simulator.set_latency(args.latency)
+    simulator.start()
+    print(f"Simulator listening on {args.endpoint} with {args.variables} variables at {args.rate} Hz", flush=True)
+    start = time.monotonic()
+    next_toggle = start + args.toggle_mode if args.toggle_mode else None
+    next_disconnect = start + args.disconnect_every if args.disconnect_every else None
+    try:
+        while True:
+            time.sleep(0.05)
+            now = time.monotonic()
+            if next_toggle is not None and now >= next_toggle:
+                simulator.set_running(not simulator.running_mode)
+                print("Run mode" if simulator.running_mode else "Config mode", flush=True)
+                next_toggle += args.toggle_mode
+            if next_disconnect is not None and now >= next_disconnect:
+                simulator.disconnect_clients(args.outage)
+                print("Connections dropped", flush=True)
+                next_disconnect += args.disconnect_every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal, pyqtSlot
+
+from concurrent.futures import Future
+from opcua.ua.ua_binary import struct_from_binary
+import opcua as ua
+import random
+import time
+
+from client_sub import MySubHandler
+from message_log import WARNING
+from history import NodeHistory
+from metrics import EventLoopLag, metrics
+from motion_control import MotionController
+from node_cache import NodeCache
+from parameter_transfer import ParameterTransfer
+
+
+STATUS_NODE = "ns=4;s=OPCUA.bBOOL1"  # TwinCAT run state, subscribed besides the node list
+
+
+class ConnectionState:
+    # Values of OpcuaWorker.status_changed, 0-2 keep the meaning of the old gui_main status
+    DISCONNECTED = 0
+    CONNECTED = 1  # TwinCAT in Run mode
+    PLC_CONFIG = 2  # server reachable, TwinCAT in Config mode
+    CONNECTING = 3
+    DEGRADED = 4  # health checks failing, not yet considered lost
+
+
+def transfer_subscriptions(uaclient, subscriptions):
+    # TransferSubscriptions of subscriptions whose session was lost to the session of uaclient.
+    # Returns the StatusCode per subscription, the ones with a good status publish through
+    # uaclient again. Sent like UaClient.create_subscription: the answer is handled on the
+    # receive thread, the only thread that may touch the publish callbacks of uaclient.
+    request = ua.ua.TransferSubscriptionsRequest()
+    request.Parameters.SubscriptionIds = [subscription.subscription_id for subscription in subscriptions]
+    request.Parameters.SendInitialValues = True
+    result = Future()
+
+    def transferred(data_future):
+        try:
+            data = data_future.result()
+            # a server without the service answers with a ServiceFault, check_answer raises it
+            uaclient._uasocket.check_answer(data, " in response to TransferSubscriptionsRequest")
+            response = struct_from_binary(ua.ua.TransferSubscriptionsResponse, data)
+            response.ResponseHeader.ServiceResult.check()
+            statuses = [transfer.StatusCode for transfer in response.Parameters.Results]
+            for subscription, status in zip(subscriptions, statuses):
+                if status.is_good():
+                    subscription.server = uaclient
+                    uaclient._publishcallbacks[subscription.subscription_id] = subscription.publish_callback
+                    # two publish requests in flight, as after CreateSubscription
+                    uaclient.publish()
+                    uaclient.publish()
+            result.set_result(statuses)
+        except Exception as e:
+            result.set_exception(e)
+
+    uaclient._uasocket.send_request(request, transferred)
+    return result.result(uaclient._timeout)
+
+
+class OpcuaWorker(QtCore.QObject):
+    # Worker that owns the OPC UA client. It is moved to its own QThread so that
+    # every network round-trip (connect, health check, read, write, subscribe)
+    # runs off the Qt GUI thread. Results are delivered to the GUI through
+    # queued signals. The connection is a timer driven state machine, nothing
+    # in here sleeps.
+
+    # signals to the GUI
+    status_changed = pyqtSignal(int)  # ConnectionState
+    message = pyqtSignal(str, str, int)  # title, message, severity for show_message
+    write_failed = pyqtSignal(str, str)  # node_id, error
+    parameters_written = pyqtSignal(dict)  # {parameter name: error}, empty when all writes succeeded
+    parameters_read = pyqtSignal(dict)  # {parameter name: value}
+
+    # requests from the GUI (emitted in the GUI thread, executed in the worker thread)
+    connect_requested = pyqtSignal()
+    write_requested = pyqtSignal(str, object)
+    parameters_write_requested = pyqtSignal(dict)
+    parameters_read_requested = pyqtSignal()
+    motion_requested = pyqtSignal()  # pending motion commands, see MotionController
+    stop_requested = pyqtSignal()
+
+    def __init__(self, url, username, password, node_list, status_node=STATUS_NODE, history_depth=65536):
+        super().__init__()
+        self.url = url
+        self.username = username
+        self.password = password
+        self.node_list = node_list
+        self.status_node_id = status_node
+
+        self.client = None
+        self.parameter_transfer = None
+        self.node_cache = NodeCache()
+        self.state = ConnectionState.DISCONNECTED
+        self.timeout = 4  # seconds per service call
+        self.check_interval = 500  # ms between health checks
+        self.max_failed_checks = 3  # failed health checks before the connection counts as lost
+        self.failed_checks = 0
+        self.retry_count = 0
+        self.backoff_base = 0.5  # s
+        self.backoff_max = 30  # s
+        self.subscription = None
+        self.subscription_info = {}  # node_id -> (subscription, handle)
+        self.lost_subscription = None  # kept after a connection loss for a transfer to the next session
+        self.lost_subscription_info = {}
+        # One handler for the lifetime of the worker, the GUI drains its changes every frame
+        self.history = NodeHistory(history_depth)
+        self.my_sub_handler = MySubHandler(self.history)
+        self.motion = MotionController(self)
+        self.event_loop_lag = None
+
+        self.connect_requested.connect(self.reconnect_now)
+        self.write_requested.connect(self.write_value)
+        self.parameters_write_requested.connect(self.write_parameters)
+        self.parameters_read_requested.connect(self.read_parameters)
+        self.motion_requested.connect(self.send_motion)
+        # the GUI waits for the disconnect to finish before closing
+        self.stop_requested.connect(self.stop, QtCore.Qt.ConnectionType.BlockingQueuedConnection)
+
+    @pyqtSlot()
+    def start(self):
+        # Called once the worker thread is running, timers must be created in this thread
+        self.connection_check_timer = QtCore.QTimer(self)
+        self.connection_check_timer.setInterval(self.check_interval)
+        self.connection_check_timer.timeout.connect(self.check_server_status)
+
+        self.reconnect_timer = QtCore.QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.opcua_server_connect)
+        # the GUI creates the worker after its first paint, nothing to wait for
+        self.reconnect_timer.start(0)
+
+        if metrics.enabled:
+            # blocking service calls delay everything queued to this thread
+            self.event_loop_lag = EventLoopLag("opcua_worker", parent=self)
+            self.event_loop_lag.start()
+
+    @pyqtSlot()
+    def stop(self):
+        self.reconnect_timer.stop()
+        self.connection_check_timer.stop()
+        if self.event_loop_lag is not None:
+            self.event_loop_lag.stop()
+        self.opcua_server_disconnect()
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.status_changed.emit(state)
+
+    def setup(self):
+        # Get the node once and store it
+        self.bBOOL1 = self.node_cache.get_node(self.status_node_id)
+        self.parameter_transfer = ParameterTransfer(self.client)
+        self.motion.resolve_types()
+        self.motion.resend_held()
+
+    @pyqtSlot()
+    def reconnect_now(self):
+        # Manual reconnect, skips the remaining backoff
+        if self.state in (ConnectionState.DISCONNECTED, ConnectionState.DEGRADED):
+            if self.state == ConnectionState.DEGRADED:
+                self.connection_lost()
+            self.retry_count = 0
+            self.reconnect_timer.stop()
+            self.opcua_server_connect()
+
+    def schedule_reconnect(self):
+        # Jittered exponential backoff, the next attempt is a timer event
+        delay = min(self.backoff_max, self.backoff_base * 2 ** self.retry_count)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.retry_count += 1
+        self.set_state(ConnectionState.DISCONNECTED)
+        self.reconnect_timer.start(int(delay * 1000))
+        return delay
+
+    @pyqtSlot()
+    def opcua_server_connect(self):
+        if self.state != ConnectionState.DISCONNECTED:
+            return
+        self.set_state(ConnectionState.CONNECTING)
+        try:
+            self.client = ua.Client(self.url, timeout=self.timeout)
+            self.client.set_user(self.username)
+            self.client.set_password(self.password)
+            self.client.connect()
+            print("Connected to OPC UA server")
+            # Structures are only downloaded if the server build changed since the last run
+            self.node_cache.attach(self.client, self.url)
+            self.node_cache.load_type_definitions()
+            self.setup()
+        except Exception as e:
+            print("Error while connecting to the OPC UA server:", e)
+            self.drop_client()
+            delay = self.schedule_reconnect()
+            self.message.emit("Systemstatus", f"Beim Versuch, eine Verbindung zum OPC UA-Server herzustellen, ist ein Fehler aufgetreten {self.retry_count}. Neuer Versuch in {delay:.1f} s", WARNING)
+            return
+        self.retry_count = 0
+        self.failed_checks = 0
+        self.connection_check_timer.start()
+        self.check_server_status()
+
+    def drop_client(self):
+        # Close the socket of a client whose session is gone, without waiting for the server
+        if self.client is not None:
+            try:
+                if self.client.keepalive is not None:
+                    self.client.keepalive.stop()
+                self.client.disconnect_socket()
+            except Exception:
+                pass
+        self.client = None
+        self.parameter_transfer = None
+
+    def connection_lost(self):
+        self.connection_check_timer.stop()
+        if self.subscription is not None:
+            # The session may still live on the server, the next connection tries to take the subscription over
+            self.lost_subscription = self.subscription
+            self.lost_subscription_info = dict(self.subscription_info)
+            self.subscription = None
+            self.subscription_info.clear()
+        self.drop_client()
+        self.schedule_reconnect()
+
+    def opcua_server_disconnect(self):
+        if self.client is not None:
+            try:
+                self.delete_subscriptions()
+                self.client.disconnect()
+                print("Disconnected from OPC UA server")
+            except Exception as e:
+                print("Error disconnecting from OPC UA server:", e)
+            self.client = None
+        else:
+            print("OPC UA client not initialized or already disconnected")
+
+    def delete_subscriptions(self):
+        # a lost subscription monitors the symbols of before, TwinCAT recreates them in Config mode
+        self.lost_subscription = None
+        self.lost_subscription_info = {}
+        if self.subscription is None:
+            return
+        try:
+            # all monitored items in one DeleteMonitoredItems call, then the subscription itself
+            handles = [handle for _, handle in self.subscription_info.values()]
+            self.subscription.unsubscribe(handles)
+            self.subscription.delete()
+            print("Subscriptions deleted")
+        except Exception as e:
+            print("Error while deleting subscription:", e)
+        self.subscription = None
+        self.subscription_info.clear()
+
+    def subscribe_to_nodes(self):
+        if self.client is None:
+            print("OPC UA client not initialized or already disconnected")
+            return
+        # The status node is pushed like every other variable instead of being polled
+        node_ids = list(dict.fromkeys(self.node_list + [self.status_node_id]))
+        self.my_sub_handler.register(node_ids)
+
+        if self.lost_subscription is not None:
+            subscription, subscription_info = self.lost_subscription, self.lost_subscription_info
+            self.lost_subscription = None
+            self.lost_subscription_info = {}
+            try:
+                status = transfer_subscriptions(self.client.uaclient, [subscription])[0]
+                if status.is_good():
+                    self.subscription = subscription
+                    self.subscription_info = subscription_info
+                    print("Subscription transferred to the new session")
+                    return
+                print(f"Subscription transfer rejected, subscribing again: {status}")
+            except Exception as e:
+                print("Subscription transfer failed, subscribing again:", e)
+
+        try:
+            self.subscription = self.client.create_subscription(100, self.my_sub_handler)
+            # one CreateMonitoredItems call for all nodes
+            handles = self.subscription.subscribe_data_change([self.node_cache.get_node(node_id) for node_id in node_ids])
+            for node_id, handle in zip(node_ids, handles):
+                if isinstance(handle, ua.ua.StatusCode):
+                    print(f"Error subscribing to data changes for {node_id}: {handle}")
+                    continue
+                self.subscription_info[node_id] = (self.subscription, handle)
+            print(f"Subscribed to data changes for {len(self.subscription_info)} nodes")
+        except Exception as e:
+            print(f"Error subscribing to data changes for nodes: {e}")
+
+    def probe(self):
+        # One Read for the server state and the PLC status node.
+        # Returns None if the server did not answer, otherwise True if TwinCAT is running.
+        params = ua.ua.ReadParameters()
+        for nodeid in (ua.ua.NodeId(ua.ua.ObjectIds.Server_ServerStatus_State), self.bBOOL1.nodeid):
+            read_value = ua.ua.ReadValueId()
+            read_value.NodeId = nodeid
+            read_value.AttributeId = ua.ua.AttributeIds.Value
+            params.NodesToRead.append(read_value)
+        try:
+            server_state, plc_status = self.client.uaclient.read(params)
+        except Exception:
+            return None
+        return server_state.Value.Value == ua.ua.ServerState.Running and plc_status.StatusCode.is_good()
+
+    @pyqtSlot()
+    def check_server_status(self):
+        if self.client is None:
+            return
+        if metrics.enabled:
+            t0 = time.perf_counter()
+            plc_running = self.probe()
+            metrics.time("opcua_worker.health_check", time.perf_counter() - t0)
+        else:
+            plc_running = self.probe()
+        if plc_running is None:
+            self.failed_checks += 1
+            if self.failed_checks >= self.max_failed_checks:
+                print("Connection to the OPC UA server lost")
+                self.connection_lost()
+            else:
+                self.set_state(ConnectionState.DEGRADED)
+            return
+        self.failed_checks = 0
+        if plc_running:
+            if self.subscription is None:
+                self.subscribe_to_nodes()
+            self.set_state(ConnectionState.CONNECTED)
+        else:
+            # TwinCAT recreates its symbols when it leaves Config mode, subscribe again then
+            self.delete_subscriptions()
+            self.set_state(ConnectionState.PLC_CONFIG)
+
+    @pyqtSlot(str, object)
+    def write_value(self, node_id, value):
+        if self.client is None:
+            self.write_failed.emit(node_id, "OPC UA client not initialized")
+            return
+        try:
+            variant = ua.ua.Variant(value, self.node_cache.variant_type(node_id))
+            self.node_cache.get_node(node_id).set_value(variant)
+        except Exception as e:
+            print(f"Error while writing {node_id}:", e)
+            self.write_failed.emit(node_id, str(e))
+
+    @pyqtSlot(dict)
+    def write_parameters(self, values):
+        # Whole parameter set in a single Write service call
+        if self.parameter_transfer is None:
+            self.parameters_written.emit({name: "OPC UA client not initialized" for name in values})
+            return
+        try:
+            failed = self.parameter_transfer.write(values)
+            self.parameters_written.emit({name: str(status) for name, status in failed.items()})
+        except Exception as e:
+            print("Error while writing the scan parameters:", e)
+            self.parameters_written.emit({name: str(e) for name in values})
+
+    @pyqtSlot()
+    def read_parameters(self):
+        if self.parameter_transfer is None:
+            return
+        try:
+            self.parameters_read.emit(self.parameter_transfer.read())
+        except Exception as e:
+            print("Error while reading the scan parameters:", e)
+
+    @pyqtSlot()
+    def send_motion(self):
+        self.motion.flush()
@@ -0,0 +1,133 @@
+from opcua import ua
+
+
+# Scan parameters collected by Ui_MainWindow.advance_update_parameters and the PLC
+# variables they belong to: (attribute name, node id, variant type)
+# The node ids are assumptions: the GVL OPCUA.stOpcua structure is not part of this
+# repository, the member names follow the advance_ attribute names and the TwinCAT
+# prefixes. Check them against the PLC project before the first scan.
+SCAN_PARAMETERS = [
+    ("advance_kV", "ns=4;s=OPCUA.stOpcua.fVoltage", ua.VariantType.Float),
+    ("advance_mA", "ns=4;s=OPCUA.stOpcua.fCurrent", ua.VariantType.Float),
+    ("advance_blackLevel", "ns=4;s=OPCUA.stOpcua.nBlackLevel", ua.VariantType.Int32),
+    ("advance_lutSteps", "ns=4;s=OPCUA.stOpcua.nLutSteps", ua.VariantType.Int32),
+
+    # stOpcua
+    ("advance_fileName", "ns=4;s=OPCUA.stOpcua.sFileName", ua.VariantType.String),
+    ("advance_filePath", "ns=4;s=OPCUA.stOpcua.sFilePath", ua.VariantType.String),
+    ("advance_exposureTime", "ns=4;s=OPCUA.stOpcua.fExposureTime", ua.VariantType.Float),
+    ("advance_gainMaster", "ns=4;s=OPCUA.stOpcua.nGainMaster", ua.VariantType.Int32),
+    ("advance_numberOfFrames", "ns=4;s=OPCUA.stOpcua.nNumberOfFrames", ua.VariantType.Int32),
+    ("advance_numberOfPositionsPreScan", "ns=4;s=OPCUA.stOpcua.nNumberOfPositionsPreScan", ua.VariantType.Int32),
+    ("advance_numberOfFramesPreScan", "ns=4;s=OPCUA.stOpcua.nNumberOfFramesPreScan", ua.VariantType.Int32),
+    ("advance_numberOfPositionsScan", "ns=4;s=OPCUA.stOpcua.nNumberOfPositionsScan", ua.VariantType.Int32),
+    ("advance_numberOfFramesScan", "ns=4;s=OPCUA.stOpcua.nNumberOfFramesScan", ua.VariantType.Int32),
+    ("advance_numberOfSkippedFrames", "ns=4;s=OPCUA.stOpcua.nNumberOfSkippedFrames", ua.VariantType.Int32),
+    ("advance_stopAndGoOrContinuous", "ns=4;s=OPCUA.stOpcua.bStopAndGoOrContinuous", ua.VariantType.Boolean),
+    ("advance_LutOrFlatFieldCorrection", "ns=4;s=OPCUA.stOpcua.bLutOrFlatFieldCorrection", ua.VariantType.Boolean),
+] + [
+    (f"advance_ScanBin{i}", f"ns=4;s=OPCUA.stOpcua.bScanBin{i}", ua.VariantType.Boolean) for i in range(1, 9)
+] + [
+    (f"advance_preScanBin{i}", f"ns=4;s=OPCUA.stOpcua.bPreScanBin{i}", ua.VariantType.Boolean) for i in range(1, 9)
+]
+
+INTEGER_TYPES = (ua.VariantType.SByte, ua.VariantType.Byte, ua.VariantType.Int16, ua.VariantType.UInt16,
+                 ua.VariantType.Int32, ua.VariantType.UInt32, ua.VariantType.Int64, ua.VariantType.UInt64)
+FLOAT_TYPES = (ua.VariantType.Float, ua.VariantType.Double)
+
+
+# Fields of only one scan mode, a recipe leaves the fields of the other mode at the empty .ui default
+CONTINUOUS_PARAMETERS = ("advance_numberOfFrames",)
+STOP_AND_GO_PARAMETERS = ("advance_numberOfPositionsScan", "advance_numberOfFramesScan")
+
+
+def active_mode_values(values):
+    # values without the fields of the scan mode that is not selected,
+    # advance_stopAndGoOrContinuous is True for stop and go
+    if "advance_stopAndGoOrContinuous" not in values:
+        return dict(values)
+    inactive = CONTINUOUS_PARAMETERS if values["advance_stopAndGoOrContinuous"] else STOP_AND_GO_PARAMETERS
+    return {name: value for name, value in values.items() if name not in inactive}
+
+
+def convert_value(value, variant_type):
+    # Convert the text of a QLineEdit (or an already typed value) to the PLC type
+    if variant_type == ua.VariantType.Boolean:
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "yes")
+        return bool(value)
+    if variant_type in INTEGER_TYPES:
+        if isinstance(value, str):
+            value = value.strip().replace(',', '.')
+        return int(float(value))
+    if variant_type in FLOAT_TYPES:
+        if isinstance(value, str):
+            value = value.strip().replace(',', '.')
+        return float(value)
+    if variant_type == ua.VariantType.String:
+        return "" if value is None else str(value)
+    return value
+
+
+def convert_parameters(values, parameters=SCAN_PARAMETERS):
+    # Returns the typed values and a list of (name, raw value) that could not be converted
+    converted = {}
+    errors = []
+    for name, _, variant_type in parameters:
+        if name not in values:
+            continue
+        try:
+            converted[name] = convert_value(values[name], variant_type)
+        except (TypeError, ValueError):
+            errors.append((name, values[name]))
+    return converted, errors
+
+
+class ParameterTransfer:
+    # Pushes and pulls the whole scan parameter set with one Write / Read service call.
+    # The NodeIds are resolved once per client and reused for every transfer.
+    def __init__(self, client, parameters=SCAN_PARAMETERS):
+        self.client = client
+        self.parameters = parameters
+        self._node_ids = {name: ua.NodeId.from_string(node_id) for name, node_id, _ in parameters}
+        self._types = {name: variant_type for name, _, variant_type in parameters}
+
+    def nodes(self):
+        return {name: self.client.get_node(nodeid) for name, nodeid in self._node_ids.items()}
+
+    def write(self, values):
+        # values: {attribute name: typed value}. Returns {attribute name: StatusCode} of failed writes.
+        params = ua.WriteParameters()
+        names = []
+        for name, value in values.items():
+            if name not in self._node_ids:
+                continue
+            write_value = ua.WriteValue()
+            write_value.NodeId = self._node_ids[name]
+            write_value.AttributeId = ua.AttributeIds.Value
+            write_value.Value = ua.DataValue(ua.Variant(value, self._types[name]))
+            params.NodesToWrite.append(write_value)
+            names.append(name)
+        if not names:
+            return {}
+        results = self.client.uaclient.write(params)
+        return {name: result for name, result in zip(names, results) if not result.is_good()}
+
+    def read(self, names=None):
+        # Returns {attribute name: value}, names with a bad status are left out
+        if names is None:
+            names = list(self._node_ids)
+        params = ua.ReadParameters()
+        for name in names:
+            read_value = ua.ReadValueId()
+            read_value.NodeId = self._node_ids[name]
+            read_value.AttributeId = ua.AttributeIds.Value
+            params.NodesToRead.append(read_value)
+        results = self.client.uaclient.read(params)
+        values = {}
+        for name, data_value in zip(names, results):
+            if data_value.StatusCode.is_good():
+                values[name] = data_value.Value.Value
+            else:
+                print(f"Error while reading parameter {name}: {data_value.StatusCode}")
+        return values
@@ -0,0 +1,210 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
+import threading
+
+from binning import bin_frame
+
+
+FLAT_FIELD = "flat field"
+LUT = "lut"
+
+
+def flip_frame(frame, flip_value):
+    # flipValue of ImageSensor0: 0 = none, 1 = horizontal, 2 = vertical, 3 = both. Returns a view.
+    if flip_value == 1:
+        return frame[:, ::-1]
+    if flip_value == 2:
+        return frame[::-1, :]
+    if flip_value == 3:
+        return frame[::-1, ::-1]
+    return frame
+
+
+def bin_map(values, factor):
+    # Mean binning of a float calibration map
+    if factor <= 1:
+        return values
+    h = values.shape[0] // factor * factor
+    w = values.shape[1] // factor * factor
+    return values[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+def format_shape(shape):
+    return f"{shape[-1]}x{shape[-2]}"
+
+
+class CorrectionMaps:
+    # Precomputed maps for one frame shape / binning level
+    def __init__(self, offset, gain=None, lut_levels=None, lut_slopes=None, lut_intercepts=None):
+        self.offset = offset  # dark image, subtracted from every frame
+        self.gain = gain  # flat-field gain, mean(flat - dark) / (flat - dark)
+        self.lut_levels = lut_levels  # (steps - 2, h, w) inner breakpoints of the piecewise linear LUT
+        self.lut_slopes = lut_slopes  # (steps - 1, h, w)
+        self.lut_intercepts = lut_intercepts  # (steps - 1, h, w)
+
+
+class Preprocessor:
+    # Dark subtraction, flat-field or multi-step LUT correction and flip for live frames.
+    # All maps are computed once per binning level, the per-frame work is a few in-place
+    # float32 operations, optionally striped across rows on a thread pool.
+    def __init__(self, threads=1, report=print):
+        self.method = FLAT_FIELD
+        self.flip_value = 0
+        self.black_level = 0
+        self.dark = None  # float32 (h, w)
+        self.flat = None  # float32 (h, w)
+        self.lut_steps = None  # float32 (steps, h, w), mean images of increasing intensity
+        self.frame_shape = None  # (h, w) of the last unbinned frame
+        # callable(text) for calibration images that do not fit the frames, called once per problem,
+        # possibly from the thread that processes the frames
+        self.report = report
+        self._reported = set()  # (calibration, its size, frame size) of the reported problems
+        self._maps = {}  # binning -> CorrectionMaps
+        self._buffers = {}  # shape -> (float32 work buffer, uint16 output buffer)
+        self._lock = threading.Lock()
+        self.threads = threads
+        self._pool = ThreadPoolExecutor(threads) if threads > 1 else None
+
+    def configure(self, parameters):
+        # Normalization and ImageSensor0 settings of a recipe
+        normalization = parameters.get('Normalization', {})
+        method = str(normalization.get('normalizationMethod(flat field/lut)', FLAT_FIELD)).lower()
+        image_sensor0 = parameters.get('ImageSensor0', {})
+        with self._lock:
+            self.method = LUT if method == LUT else FLAT_FIELD
+            self.flip_value = int(image_sensor0.get('flipValue') or 0)
+            self.black_level = int(image_sensor0.get('blackLevel') or 0)
+            self._maps.clear()
+
+    def set_dark(self, frames):
+        # frames: single image or stack of dark frames, averaged
+        with self._lock:
+            self.dark = np.asarray(frames, dtype=np.float32).reshape((-1,) + np.shape(frames)[-2:]).mean(axis=0)
+            self._calibration_changed()
+
+    def set_flat(self, frames):
+        with self._lock:
+            self.flat = np.asarray(frames, dtype=np.float32).reshape((-1,) + np.shape(frames)[-2:]).mean(axis=0)
+            self._calibration_changed()
+
+    def set_lut_steps(self, step_images):
+        # step_images: (steps, h, w) mean images taken at increasing source intensity
+        with self._lock:
+            self.lut_steps = np.asarray(step_images, dtype=np.float32)
+            self._calibration_changed()
+
+    def _calibrations(self):
+        return [(name, values) for name, values in (("Dunkelbild", self.dark), ("Hellbild", self.flat), ("LUT-Stufen", self.lut_steps))
+                if values is not None]
+
+    def _calibration_changed(self):
+        # Check the calibration images against each other and against the frames seen so far.
+        self._maps.clear()
+        calibrations = self._calibrations()
+        shapes = {values.shape[-2:] for _, values in calibrations}
+        if len(shapes) > 1:
+            self._report_once(("sizes", tuple(sorted(shapes))), "Kalibrierbilder haben unterschiedliche Größen: "
+                              + ", ".join(f"{name} {format_shape(values.shape)}" for name, values in calibrations))
+        if self.frame_shape is not None:
+            for name, values in calibrations:
+                if values.shape[-2:] != self.frame_shape:
+                    self._report_once((name, values.shape[-2:], self.frame_shape), f"{name} ({format_shape(values.shape)}) passt nicht zur Bildgröße "
+                                            f"{format_shape(self.frame_shape)}, wird nicht verwendet.")
+
+    def _report_once(self, key, text):
+        if key not in self._reported:
+            self._reported.add(key)
+            self.report(text)
+
+    def _binned_calibration(self, name, values, shape, binning):
+        # Calibration image binned like the frames, None if it does not fit them
+        binned = np.stack([bin_map(step, binning) for step in values]) if values.ndim == 3 else bin_map(values, binning)
+        if binned.shape[-2:] != shape:
+            self._report_once((name, values.shape[-2:], self.frame_shape), f"{name} ({format_shape(values.shape)}) passt bei Binning {binning} nicht zur Bildgröße "
+                              f"{format_shape(shape)}, wird nicht verwendet.")
+            return None
+        return binned
+
+    def load_calibration(self, directory):
+        # dark.npy, flat.npy and lut_steps.npy, every file is optional
+        for name, setter in (("dark.npy", self.set_dark), ("flat.npy", self.set_flat), ("lut_steps.npy", self.set_lut_steps)):
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                setter(np.load(path))
+
+    def _compute_maps(self, shape, binning):
+        offset = self._binned_calibration("Dunkelbild", self.dark, shape, binning) if self.dark is not None else None
+        if offset is None:
+            # without dark frames the black level of the sensor is the best offset estimate
+            h, w = shape
+            offset = np.full((h, w), self.black_level, dtype=np.float32)
+
+        steps = None
+        if self.method == LUT and self.lut_steps is not None and len(self.lut_steps) >= 2:
+            steps = self._binned_calibration("LUT-Stufen", self.lut_steps, shape, binning)
+        if steps is not None:
+            steps = steps - offset
+            # every pixel is mapped piecewise linearly from its own response to the mean response of the step
+            targets = steps.mean(axis=(1, 2), dtype=np.float32)[:, np.newaxis, np.newaxis]
+            delta = np.diff(steps, axis=0)
+            delta[np.abs(delta) < 1e-6] = 1e-6
+            slopes = np.diff(targets, axis=0) / delta
+            intercepts = targets[:-1] - slopes * steps[:-1]
+            return CorrectionMaps(offset, lut_levels=steps[1:-1].astype(np.float32),
+                                  lut_slopes=slopes.astype(np.float32), lut_intercepts=intercepts.astype(np.float32))
+
+        flat = self._binned_calibration("Hellbild", self.flat, shape, binning) if self.flat is not None else None
+        if flat is not None:
+            signal = flat - offset
+            signal[signal < 1e-6] = 1e-6
+            gain = (signal.mean() / signal).astype(np.float32)
+            return CorrectionMaps(offset, gain=gain)
+        return CorrectionMaps(offset)
+
+    def maps(self, shape, binning):
+        maps = self._maps.get(binning)
+        if maps is None or maps.offset.shape != shape:
+            with self._lock:
+                maps = self._maps[binning] = self._compute_maps(shape, binning)
+        return maps
+
+    def _buffers_for(self, shape):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = self._buffers[shape] = (np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.uint16))
+        return buffers
+
+    def _correct_rows(self, frame, maps, work, out, rows):
+        frame = frame[rows]
+        work = work[rows]
+        np.subtract(frame, maps.offset[rows], out=work, dtype=np.float32)
+        if maps.lut_slopes is not None:
+            # segment index per pixel: number of inner breakpoints below the value
+            segment = np.zeros(work.shape, dtype=np.intp)
+            for level in maps.lut_levels:
+                segment += work > level[rows]
+            slope = np.take_along_axis(maps.lut_slopes[:, rows], segment[np.newaxis], axis=0)[0]
+            intercept = np.take_along_axis(maps.lut_intercepts[:, rows], segment[np.newaxis], axis=0)[0]
+            work *= slope
+            work += intercept
+        elif maps.gain is not None:
+            work *= maps.gain[rows]
+        np.clip(work, 0, 65535, out=work)
+        out[rows] = work
+
+    def process(self, frame, binning=1):
+        # Bin first and correct with binned maps, the live view never needs full resolution corrections
+        if frame.shape != self.frame_shape:
+            with self._lock:
+                self.frame_shape = frame.shape
+        frame = bin_frame(frame, binning)
+        maps = self.maps(frame.shape, binning)
+        work, out = self._buffers_for(frame.shape)
+        if self._pool is None:
+            self._correct_rows(frame, maps, work, out, slice(None))
+        else:
+            bounds = np.linspace(0, frame.shape[0], self.threads + 1).astype(int)
+            stripes = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+            list(self._pool.map(lambda rows: self._correct_rows(frame, maps, work, out, rows), stripes))
+        return flip_frame(out, self.flip_value)
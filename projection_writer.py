@@ -0,0 +1,124 @@
+from datetime import datetime
+import json
+import numpy as np
+import os
+import queue
+import threading
+
+from binning import BinningPyramid
+
+
+class ProjectionWriter:
+    # Streams projections to preallocated memory-mapped .npy files, one per binning level.
+    # Acquisition only puts frames into a small bounded queue, binning and disk writes
+    # happen on the writer thread, so at most queue_size frames are held in RAM.
+    def __init__(self, directory, name, n_projections, binnings=(1,), metadata=None, queue_size=8,
+                 frame_shape=None, dtype=np.uint16, flush_every=32):
+        self.directory = os.path.join(directory, name)
+        self.name = name
+        self.n_projections = n_projections
+        self.binnings = sorted(set(int(b) for b in binnings)) or [1]
+        self.metadata = metadata or {}
+        self.frame_shape = frame_shape
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+        self.datasets = {}  # binning -> memmap (n_projections, h, w)
+        self.pyramid = BinningPyramid(self.binnings)
+        self.written = 0
+        self.dropped = []  # projection indices that did not fit into the queue
+        self.error = None
+        self._next_index = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._close_lock = threading.Lock()
+        self.closed = False
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.frame_shape is not None:
+            self._allocate(self.frame_shape)
+        self._thread.start()
+
+    def dataset_path(self, binning):
+        return os.path.join(self.directory, f"{self.name}_bin{binning}.npy")
+
+    def _allocate(self, frame_shape):
+        # Whole scan preallocated up front, the files are complete .npy arrays from the start
+        self.frame_shape = tuple(frame_shape)
+        h, w = self.frame_shape
+        for binning in self.binnings:
+            shape = (self.n_projections, h // binning, w // binning)
+            self.datasets[binning] = np.lib.format.open_memmap(self.dataset_path(binning), mode='w+', dtype=self.dtype, shape=shape)
+
+    def put(self, frame, index=None, timeout=0):
+        # Queue a projection. Never blocks longer than timeout, a full queue drops the frame
+        # and records its index. The frame must not be modified after it was queued.
+        if index is None:
+            index = self._next_index
+        self._next_index = index + 1
+        if index >= self.n_projections or self.error is not None:
+            return False
+        try:
+            if timeout:
+                self._queue.put((index, frame), timeout=timeout)
+            else:
+                self._queue.put_nowait((index, frame))
+            return True
+        except queue.Full:
+            self.dropped.append(index)
+            return False
+
+    @property
+    def complete(self):
+        return self._next_index >= self.n_projections
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            index, frame = item
+            try:
+                if not self.datasets:
+                    self._allocate(frame.shape)
+                # all binning levels from one pass over the frame
+                for binning, binned in self.pyramid.compute(frame).items():
+                    self.datasets[binning][index] = binned
+                self.written += 1
+                if self.written % self.flush_every == 0:
+                    # write dirty pages back so the page cache does not grow with the scan
+                    for dataset in self.datasets.values():
+                        dataset.flush()
+            except Exception as e:
+                print("Error while writing a projection:", e)
+                self.error = str(e)
+
+    def close(self):
+        # Write the remaining frames, flush the files and store the metadata next to them.
+        # Only the first call does that, the scan end and the window closing may both call it.
+        with self._close_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._close()
+
+    def _close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for dataset in self.datasets.values():
+            dataset.flush()
+        self.datasets.clear()
+        metadata = {
+            "name": self.name,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "numberOfProjections": self.n_projections,
+            "written": self.written,
+            "dropped": self.dropped,
+            "error": self.error,
+            "frameShape": list(self.frame_shape) if self.frame_shape else None,
+            "dtype": self.dtype.name,
+            "datasets": {str(b): os.path.basename(self.dataset_path(b)) for b in self.binnings},
+            "recipe": self.metadata,
+        }
+        with open(os.path.join(self.directory, f"{self.name}_metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
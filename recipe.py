@@ -0,0 +1,277 @@
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import threading
+
+
+class Field:
+    # One recipe value: type, default used when it is missing or invalid, optional choices and range
+    def __init__(self, type, default, choices=None, minimum=None, maximum=None):
+        self.type = type
+        self.default = default
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def convert(self, value):
+        if self.type is str:
+            value = str(value)
+            if self.choices is not None:
+                # choices are matched case-insensitively and returned in their canonical spelling
+                for choice in self.choices:
+                    if choice.lower() == value.strip().lower():
+                        return choice
+                raise ValueError(f"erlaubt sind {', '.join(self.choices)}")
+            return value
+        if isinstance(value, bool):
+            raise ValueError("Zahl erwartet")
+        if isinstance(value, str):
+            value = value.strip().replace(',', '.')
+        number = float(value)
+        if self.type is int:
+            if number != int(number):
+                raise ValueError("ganze Zahl erwartet")
+            number = int(number)
+        if self.minimum is not None and number < self.minimum:
+            raise ValueError(f"kleiner als {self.minimum}")
+        if self.maximum is not None and number > self.maximum:
+            raise ValueError(f"größer als {self.maximum}")
+        return number
+
+
+RECIPE_SCHEMA = {
+    'ScanParameter': {
+        'Mode(StopAndGo/Continuous)': Field(str, "StopAndGo", choices=("StopAndGo", "Continuous")),
+        'Z-Shift Range': Field(float, 0.0),
+        'numberOfPositions': Field(int, 0, minimum=0),
+        'numberOfImagesPerPosition': Field(int, 0, minimum=0),
+        'numberOfSkippedImages': Field(int, 0, minimum=0),
+        'distanceSourceObject(mm)': Field(float, 0.0, minimum=0),
+        'distanceSourceDetector(mm)': Field(float, 0.0, minimum=0),
+    },
+    'PreScanParameter': {
+        'numberOfPositions': Field(int, 0, minimum=0),
+        'numberOfImagesPerPosition': Field(int, 0, minimum=0),
+    },
+    'Normalization': {
+        'normalizationMethod(flat field/lut)': Field(str, "flat field", choices=("flat field", "LUT")),
+        'numberOfDarkFrames': Field(int, 0, minimum=0),
+        'numberOfLutSteps': Field(int, 0, minimum=0),
+    },
+    'ImageSensor0': {
+        'flipValue': Field(int, 0, minimum=0, maximum=3),
+        'exposureTime(ms)': Field(float, 0.0, minimum=0),
+        'gain(mdB)': Field(int, 0),
+        'blackLevel': Field(int, 0, minimum=0),
+    },
+    'ImageSensor1': {
+        'gain(mdB)': Field(int, 0),
+    },
+    'Scintilator': {
+        'scintilatorId': Field(str, ""),
+        'centerOfRotation(pixels)': Field(float, 0.0),
+        'middlePlane(pixels)': Field(float, 0.0),
+        'pixelSize(mm)': Field(float, 0.0, minimum=0),
+    },
+    'Source': {
+        'voltage(kV)': Field(float, 0.0, minimum=0),
+        'current(mA)': Field(float, 0.0, minimum=0),
+        'focalSpotSize(small/large)': Field(str, "Small", choices=("Small", "Large")),
+    },
+}
+
+
+def validate_recipe(data, schema=RECIPE_SCHEMA):
+    # Returns the parameters with every schema key present and typed, and a list of error texts.
+    # Missing or invalid values are replaced by the field default so the GUI never shows "None".
+    errors = []
+    if not isinstance(data, dict):
+        return {section: {key: field.default for key, field in fields.items()} for section, fields in schema.items()}, ["Rezept ist kein JSON-Objekt"]
+    parameters = {}
+    for section, fields in schema.items():
+        values = data.get(section)
+        if not isinstance(values, dict):
+            errors.append(f"Abschnitt {section} fehlt")
+            values = {}
+        result = {}
+        for key, field in fields.items():
+            if key not in values or values[key] is None:
+                errors.append(f"{section}.{key} fehlt")
+                result[key] = field.default
+                continue
+            try:
+                result[key] = field.convert(values[key])
+            except (TypeError, ValueError) as e:
+                errors.append(f"{section}.{key} ungültig ({values[key]!r}): {e}")
+                result[key] = field.default
+        parameters[section] = result
+    return parameters, errors
+
+
+class Recipe:
+    def __init__(self, path, name, digest, parameters, errors):
+        self.path = path
+        self.name = name
+        self.digest = digest  # sha1 of the file content
+        self.parameters = parameters
+        self.errors = errors
+
+
+class RecipeCache:
+    # Parsed and validated recipes keyed by the hash of the file content, least recently used are dropped
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, digest, entry):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+recipe_cache = RecipeCache()
+
+
+def load_recipe(path, cache=recipe_cache):
+    # Parse and validate a recipe file. Files with identical content are parsed only once.
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha1(content).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0]
+    cached = cache.get(digest) if cache is not None else None
+    if cached is None:
+        try:
+            data = json.loads(content)
+            parameters, errors = validate_recipe(data)
+        except ValueError as e:
+            parameters, errors = validate_recipe({})
+            errors = [f"Ungültiges JSON: {e}"]
+        cached = (parameters, errors)
+        if cache is not None:
+            cache.put(digest, cached)
+    parameters, errors = cached
+    return Recipe(path, name, digest, parameters, list(errors))
+
+
+class RecipeLoader(QtCore.QObject):
+    # Loads recipes on a background thread, the result arrives as a queued signal
+    loaded = pyqtSignal(object)  # Recipe
+    failed = pyqtSignal(str, str)  # path, error
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(1)
+
+    def load(self, path):
+        self._executor.submit(self._load, path)
+
+    def _load(self, path):
+        try:
+            self.loaded.emit(load_recipe(path))
+        except OSError as e:
+            self.failed.emit(path, str(e))
+
+
+class RecipeLibrary:
+    # Index of all recipe files below a directory. Rescans only re-read files whose
+    # mtime or size changed, the index is stored next to the recipes.
+    INDEX_FILE = ".recipe_index.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self.entries = {}  # relative path -> entry dict
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save_index(self):
+        try:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print("Error while saving the recipe index:", e)
+
+    def _scan(self, directory):
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._scan(entry.path)
+                elif entry.name.lower().endswith('.json') and entry.name != self.INDEX_FILE:
+                    yield entry
+
+    def rescan(self):
+        # Returns the number of files that had to be parsed
+        seen = set()
+        parsed = 0
+        for dir_entry in self._scan(self.directory):
+            rel_path = os.path.relpath(dir_entry.path, self.directory)
+            seen.add(rel_path)
+            stat = dir_entry.stat()
+            entry = self.entries.get(rel_path)
+            if entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            try:
+                recipe = load_recipe(dir_entry.path)
+            except OSError:
+                continue
+            parsed += 1
+            self.entries[rel_path] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "digest": recipe.digest,
+                "name": recipe.name,
+                "valid": not recipe.errors,
+                "search": self._search_text(recipe),
+                "summary": {section: dict(values) for section, values in recipe.parameters.items()},
+            }
+        removed = set(self.entries) - seen
+        for rel_path in removed:
+            del self.entries[rel_path]
+        if parsed or removed:
+            self._save_index()
+        return parsed
+
+    def _search_text(self, recipe):
+        values = [recipe.name]
+        for section in recipe.parameters.values():
+            values.extend(str(value) for value in section.values())
+        return " ".join(values).lower()
+
+    def search(self, text="", filters=None):
+        # Recipes whose name or values contain every word of text.
+        # filters: {(section, key): value} that must match exactly, e.g. {('Source', 'voltage(kV)'): 150.0}
+        words = text.lower().split()
+        filters = filters or {}
+        results = []
+        for rel_path, entry in self.entries.items():
+            if not all(word in entry["search"] for word in words):
+                continue
+            if all(entry["summary"].get(section, {}).get(key) == value for (section, key), value in filters.items()):
+                results.append(os.path.join(self.directory, rel_path))
+        return sorted(results)
+
+    def load(self, path):
+        return load_recipe(path)
@@ -0,0 +1,349 @@
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import glob
+import itertools
+import json
+import multiprocessing
+import numpy as np
+import os
+import queue
+import threading
+
+
+class ReconstructionCanceled(Exception):
+    pass
+
+
+class ConeBeamGeometry:
+    # Circular cone beam scan with a flat detector. Distances and pixel size in mm,
+    # center of rotation (detector column) and middle plane (detector row) in pixels.
+    def __init__(self, distance_source_object, distance_source_detector, pixel_size, center, middle):
+        self.dso = distance_source_object
+        self.dsd = distance_source_detector
+        self.pixel_size = pixel_size
+        self.center = center
+        self.middle = middle
+
+    @classmethod
+    def from_recipe(cls, parameters, frame_shape):
+        # Geometry from the ScanParameter and Scintilator sections of a recipe. A center or
+        # middle plane of 0 means not calibrated, the detector center is used instead.
+        scan = parameters.get('ScanParameter', {})
+        scintilator = parameters.get('Scintilator', {})
+        dso = float(scan.get('distanceSourceObject(mm)') or 0)
+        dsd = float(scan.get('distanceSourceDetector(mm)') or 0)
+        pixel_size = float(scintilator.get('pixelSize(mm)') or 0)
+        if dso <= 0 or dsd <= dso or pixel_size <= 0:
+            raise ValueError("Geometrie unvollständig (Abstände und Pixelgröße prüfen)")
+        rows, cols = frame_shape
+        center = float(scintilator.get('centerOfRotation(pixels)') or 0) or (cols - 1) / 2
+        middle = float(scintilator.get('middlePlane(pixels)') or 0) or (rows - 1) / 2
+        return cls(dso, dsd, pixel_size, center, middle)
+
+    def binned(self, binning):
+        # Pixel i of a level covers the full resolution pixels i * binning ... (i + 1) * binning - 1
+        return ConeBeamGeometry(self.dso, self.dsd, self.pixel_size * binning,
+                                (self.center + 0.5) / binning - 0.5, (self.middle + 0.5) / binning - 0.5)
+
+    @property
+    def voxel_size(self):
+        # detector pixel projected to the rotation axis
+        return self.pixel_size * self.dso / self.dsd
+
+    def to_dict(self):
+        return {"distanceSourceObject": self.dso, "distanceSourceDetector": self.dsd, "pixelSize": self.pixel_size,
+                "centerOfRotation": self.center, "middlePlane": self.middle, "voxelSize": self.voxel_size}
+
+
+def ramp_filter(n, spacing):
+    # Frequency response of the band limited ramp (Ram-Lak) filter for rows of n samples,
+    # zero padded to a power of two of at least 2n against wrap-around
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    kernel = np.zeros(size, dtype=np.float64)
+    kernel[0] = 1 / (4 * spacing * spacing)
+    odd = np.arange(1, size // 2, 2)
+    kernel[odd] = -1 / (np.pi * odd * spacing) ** 2
+    kernel[size - odd] = kernel[odd]
+    return size, (np.fft.rfft(kernel).real * spacing).astype(np.float32)
+
+
+def filter_projections(source_path, filtered_path, start, frames, geometry, i0):
+    # Worker process: -log, FDK cosine weighting and ramp filtering of the output projections
+    # start ... start + len(frames) - 1. frames holds the source frame indices averaged per projection.
+    source = np.load(source_path, mmap_mode='r')
+    filtered = np.load(filtered_path, mmap_mode='r+')
+    rows, cols = source.shape[1:]
+    d = geometry.voxel_size
+    # detector coordinates on a virtual detector through the rotation axis
+    u = (np.arange(cols, dtype=np.float32) - geometry.center) * d
+    v = (np.arange(rows, dtype=np.float32) - geometry.middle) * d
+    weight = geometry.dso / np.sqrt(geometry.dso ** 2 + u[np.newaxis, :] ** 2 + v[:, np.newaxis] ** 2)
+    size, response = ramp_filter(cols, d)
+    for offset, indices in enumerate(frames):
+        projection = np.mean(source[indices], axis=0, dtype=np.float32) if len(indices) > 1 else source[indices[0]].astype(np.float32)
+        projection /= i0
+        np.clip(projection, 1e-6, None, out=projection)
+        np.log(projection, out=projection)
+        projection *= -weight
+        spectrum = np.fft.rfft(projection, size, axis=1)
+        spectrum *= response
+        filtered[start + offset] = np.fft.irfft(spectrum, size, axis=1)[:, :cols]
+    filtered.flush()
+    return len(frames)
+
+
+def backproject_slices(filtered_path, volume_path, z_start, z_stop, angles, geometry):
+    # Worker process: FDK backprojection of the slices z_start ... z_stop - 1, bilinear
+    # interpolation on the detector, all voxels of the slab per angle in one vectorized step
+    filtered = np.load(filtered_path, mmap_mode='r')
+    volume = np.load(volume_path, mmap_mode='r+')
+    n, rows, cols = filtered.shape
+    nz, ny, nx = volume.shape
+    d = geometry.voxel_size
+    x = (np.arange(nx, dtype=np.float32) - (nx - 1) / 2) * d
+    y = (np.arange(ny, dtype=np.float32) - (ny - 1) / 2) * d
+    xx, yy = [a.ravel() for a in np.meshgrid(x, y)]
+    z = ((np.arange(z_start, z_stop, dtype=np.float32) - geometry.middle) * d)[:, np.newaxis]
+    slab = np.zeros((z_stop - z_start, ny * nx), dtype=np.float32)
+    for angle, projection in zip(angles, filtered):
+        projection = np.ascontiguousarray(projection).ravel()
+        cos, sin = np.float32(np.cos(angle)), np.float32(np.sin(angle))
+        s = xx * cos + yy * sin  # towards the source
+        t = yy * cos - xx * sin  # along the detector rows
+        magnification = geometry.dso / (geometry.dso - s)
+        col = t * magnification / d + geometry.center
+        c0 = np.floor(col)
+        fc = col - c0
+        weight = magnification * magnification
+        weight *= (c0 >= 0) & (c0 < cols - 1)
+        c0 = np.clip(c0, 0, cols - 2).astype(np.intp)
+        row = z * (magnification / d) + geometry.middle
+        r0 = np.floor(row)
+        fr = row - r0
+        inside = (r0 >= 0) & (r0 < rows - 1)
+        r0 = np.clip(r0, 0, rows - 2).astype(np.intp)
+        index = r0 * cols + c0
+        top = projection[index] * (1 - fc) + projection[index + 1] * fc
+        index += cols
+        bottom = projection[index] * (1 - fc) + projection[index + 1] * fc
+        top += (bottom - top) * fr
+        top *= weight
+        top *= inside
+        slab += top
+    # the full circle sees every ray twice
+    slab *= np.float32(np.pi / len(angles))
+    volume[z_start:z_stop] = slab.reshape(z_stop - z_start, ny, nx)
+    volume.flush()
+    return z_stop - z_start
+
+
+def load_scan(directory):
+    # Metadata of a scan written by ProjectionWriter
+    paths = glob.glob(os.path.join(directory, "*_metadata.json"))
+    if not paths:
+        raise ValueError(f"Keine Scan-Metadaten in {directory}")
+    with open(paths[0]) as f:
+        return json.load(f)
+
+
+class ReconstructionJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, directory, binning=None, preview=False, projection_step=1):
+        self.id = next(self._ids)
+        self.directory = directory
+        self.binning = binning  # None: finest level written by the scan
+        self.preview = preview
+        self.projection_step = projection_step  # use every n-th projection
+        self.output_path = None
+        self.cancel_event = threading.Event()
+
+
+class ReconstructionQueue(QtCore.QObject):
+    # Runs reconstruction jobs one after another on a background thread. The numerical
+    # work is split into chunks of projections and slices that run in a process pool,
+    # so neither the GUI nor the acquisition threads compete with it for the GIL.
+    started = pyqtSignal(int, str)  # job id, description
+    progress = pyqtSignal(int, int)  # job id, percent
+    finished = pyqtSignal(int, str)  # job id, volume path
+    failed = pyqtSignal(int, str)  # job id, error
+    canceled = pyqtSignal(int)  # job id
+
+    FILTER_SHARE = 20  # percent of the progress bar for the filtering step
+    SLAB_VOXELS = 2 * 1024 * 1024  # voxels per backprojection chunk, bounds the worker memory
+    CHUNKS_PER_PROCESS = 8  # small chunks keep progress fine grained and cancel responsive
+
+    def __init__(self, processes=None, parent=None):
+        super().__init__(parent)
+        self.processes = processes or os.cpu_count() or 1
+        self._queue = queue.Queue()
+        self._jobs = {}  # id -> queued or running job
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+
+    def submit(self, directory, binning=None, preview=False, projection_step=1):
+        job = ReconstructionJob(directory, binning, preview, projection_step)
+        with self._lock:
+            self._jobs[job.id] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job.id
+
+    def submit_with_preview(self, directory, preview_projections=180):
+        # A coarse preview from the highest binning level and a subset of the projections
+        # is queued first, the full resolution job follows. Returns both job ids.
+        scan = load_scan(directory)
+        levels = sorted(int(b) for b in scan["datasets"])
+        n_projections = scan["numberOfProjections"] // self._frames_per_projection(scan)
+        step = max(1, n_projections // preview_projections)
+        preview_id = self.submit(directory, levels[-1], preview=True, projection_step=step)
+        return preview_id, self.submit(directory, levels[0])
+
+    @property
+    def busy(self):
+        return bool(self._jobs)
+
+    def cancel(self, job_id=None):
+        # Cancel one job or all queued and running jobs
+        with self._lock:
+            jobs = list(self._jobs.values()) if job_id is None else [self._jobs.get(job_id)]
+        for job in jobs:
+            if job is not None:
+                job.cancel_event.set()
+
+    def close(self):
+        self.cancel()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn: forking a process that runs Qt and several threads is not safe
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            signal, args = self.finished, (job.id,)
+            try:
+                if job.cancel_event.is_set():
+                    raise ReconstructionCanceled()
+                self._reconstruct(job)
+                args = (job.id, job.output_path)
+            except ReconstructionCanceled:
+                signal = self.canceled
+            except BrokenProcessPool as e:
+                self._pool = None
+                signal, args = self.failed, (job.id, f"Rechenprozess abgebrochen: {e}")
+            except Exception as e:
+                print("Error while reconstructing:", e)
+                signal, args = self.failed, (job.id, str(e))
+            # the job is no longer busy when the GUI receives its result
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            signal.emit(*args)
+
+    def _frames_per_projection(self, scan):
+        # Stop and go scans take several images per position, they are averaged
+        scan_parameters = scan.get("recipe", {}).get('ScanParameter', {})
+        if str(scan_parameters.get('Mode(StopAndGo/Continuous)', '')).lower() == "stopandgo":
+            return max(1, int(scan_parameters.get('numberOfImagesPerPosition') or 1))
+        return 1
+
+    def _source_frames(self, scan, step):
+        # Source frame indices per used projection, dropped frames are replaced by the previous frame
+        per_projection = self._frames_per_projection(scan)
+        n_frames = scan["numberOfProjections"]
+        dropped = set(scan.get("dropped", []))
+        valid = np.arange(n_frames)
+        for index in sorted(dropped):
+            if 0 < index < n_frames:
+                valid[index] = valid[index - 1]
+        positions = range(0, n_frames // per_projection, step)
+        return [valid[p * per_projection:(p + 1) * per_projection].tolist() for p in positions], n_frames // per_projection
+
+    def _wait(self, job, futures, progress_start, progress_share, total):
+        # Collect the chunk results, cancel the remaining chunks when the job is canceled
+        done_units = 0
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_units += future.result()
+                if done:
+                    self.progress.emit(job.id, progress_start + progress_share * done_units // total)
+                if job.cancel_event.is_set():
+                    raise ReconstructionCanceled()
+        finally:
+            for future in pending:
+                future.cancel()
+            wait(pending)
+
+    def _reconstruct(self, job):
+        scan = load_scan(job.directory)
+        binning = job.binning or min(int(b) for b in scan["datasets"])
+        source_path = os.path.join(job.directory, scan["datasets"][str(binning)])
+        source = np.load(source_path, mmap_mode='r')
+        rows, cols = source.shape[1:]
+        full_shape = scan.get("frameShape") or (rows * binning, cols * binning)
+        geometry = ConeBeamGeometry.from_recipe(scan.get("recipe", {}), full_shape).binned(binning)
+        frames, n_positions = self._source_frames(scan, job.projection_step)
+        if len(frames) < 2:
+            raise ValueError("Zu wenige Projektionen")
+        # projections cover the full circle evenly
+        angles = np.arange(0, n_positions, job.projection_step)[:len(frames)] * (2 * np.pi / n_positions)
+        # unattenuated intensity estimated from a few projections
+        sample = source[np.linspace(0, len(source) - 1, min(8, len(source))).astype(int), ::4, ::4]
+        i0 = max(float(np.percentile(sample, 99.9)), 1.0)
+
+        output_dir = os.path.join(job.directory, "reconstruction")
+        os.makedirs(output_dir, exist_ok=True)
+        name = f"{scan['name']}_bin{binning}{'_preview' if job.preview else ''}"
+        job.output_path = os.path.join(output_dir, name + ".npy")
+        metadata_path = os.path.join(output_dir, name + ".json")
+        filtered_path = os.path.join(output_dir, f".{name}_filtered.npy")
+        self.started.emit(job.id, f"{name} ({len(frames)} Projektionen, {cols}x{cols}x{rows} Voxel)")
+
+        pool = self._executor()
+        try:
+            np.lib.format.open_memmap(filtered_path, mode='w+', dtype=np.float32, shape=(len(frames), rows, cols)).flush()
+            chunk = max(1, len(frames) // (self.CHUNKS_PER_PROCESS * self.processes))
+            futures = [pool.submit(filter_projections, source_path, filtered_path, start, frames[start:start + chunk], geometry, i0)
+                       for start in range(0, len(frames), chunk)]
+            self._wait(job, futures, 0, self.FILTER_SHARE, len(frames))
+
+            np.lib.format.open_memmap(job.output_path, mode='w+', dtype=np.float32, shape=(rows, cols, cols)).flush()
+            slab = max(1, min(rows // (self.CHUNKS_PER_PROCESS * self.processes), self.SLAB_VOXELS // (cols * cols)))
+            futures = [pool.submit(backproject_slices, filtered_path, job.output_path, z, min(z + slab, rows), angles, geometry)
+                       for z in range(0, rows, slab)]
+            self._wait(job, futures, self.FILTER_SHARE, 100 - self.FILTER_SHARE, rows)
+        except ReconstructionCanceled:
+            self._remove(job.output_path)
+            self._remove(metadata_path)
+            raise
+        finally:
+            self._remove(filtered_path)
+
+        with open(metadata_path, 'w') as f:
+            json.dump({"scan": scan["name"], "binning": binning, "preview": job.preview,
+                       "projections": len(frames), "geometry": geometry.to_dict()}, f, indent=2)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,180 @@
+from PyQt6 import QtCore, QtWidgets
+from opcua import ua
+
+import time
+
+import numpy as np
+
+from session_log import format_time
+
+
+class SessionPlayer(QtCore.QObject):
+    # Feeds a recorded session into a MySubHandler instead of a server. Notifications are
+    # injected once per display frame, events (connection states, parameter writes) are
+    # emitted as they come. Seeking restores the state at the target time from the nearest
+    # snapshot and only decodes the blocks after it.
+    event_replayed = QtCore.pyqtSignal(str, object)  # event type, data
+    position_changed = QtCore.pyqtSignal(float)  # s since the start of the session
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, log, sub_handler, speed=1.0, parent=None):
+        super().__init__(parent)
+        self.log = log
+        self.sub_handler = sub_handler
+        self.speed = speed
+        self.time = log.start  # session time that has been played
+        self.anchor = None  # (perf_counter, session time) while playing
+        self.batches = []  # index positions of the blocks still to be played
+        self.block = None
+        self.row = 0
+        self.event_row = 0
+        self.status_codes = {}  # status code value -> ua.StatusCode, shared between samples
+        self.started = False  # the state at the start is restored by the first seek, not here
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(16)
+        self.timer.timeout.connect(self.tick)
+
+    @property
+    def duration(self):
+        return self.log.end - self.log.start
+
+    @property
+    def position(self):
+        return self.time - self.log.start
+
+    @property
+    def playing(self):
+        return self.timer.isActive()
+
+    def play(self):
+        # the first start restores the state at the start of the session, once event_replayed is connected
+        if not self.started or self.position >= self.duration:
+            self.seek(0.0)
+        self.anchor = (time.perf_counter(), self.time)
+        self.timer.start()
+
+    def pause(self):
+        self.timer.stop()
+        self.anchor = None
+
+    def set_speed(self, speed):
+        self.speed = speed
+        if self.anchor is not None:
+            self.anchor = (time.perf_counter(), self.time)
+
+    def seek(self, position):
+        # position in s since the start of the session
+        t = self.log.start + min(max(position, 0.0), self.duration)
+        self.started = True
+        samples, events, index_position = self.log.state_at(t)
+        self.sub_handler.inject([(name, value, source_time, self.status_code(status))
+                                 for name, (value, source_time, status) in samples.items()])
+        # the connection state at the target time, parameter writes before it are not repeated
+        if "state" in events:
+            self.event_replayed.emit("state", events["state"][2])
+        self.time = t
+        self.batches = self.log.batches_after(index_position)
+        self.next_block()
+        # rows up to t are part of the restored state
+        while self.block is not None:
+            self.row = int(np.searchsorted(self.block.times, t, side='right'))
+            self.event_row = sum(1 for event in self.block.events if event[0] <= t)
+            if self.row < len(self.block) or self.event_row < len(self.block.events):
+                break
+            self.next_block()
+        if self.anchor is not None:
+            self.anchor = (time.perf_counter(), t)
+        self.position_changed.emit(self.position)
+
+    def next_block(self):
+        self.block = self.log.read(self.log.index[self.batches.pop(0)]) if self.batches else None
+        self.row = 0
+        self.event_row = 0
+
+    def status_code(self, value):
+        status = self.status_codes.get(value)
+        if status is None:
+            status = self.status_codes[value] = ua.StatusCode(value)
+        return status
+
+    def tick(self):
+        started, session_time = self.anchor
+        target = min(session_time + (time.perf_counter() - started) * self.speed, self.log.end)
+        samples = []
+        events = []
+        while self.block is not None:
+            block = self.block
+            stop = int(np.searchsorted(block.times, target, side='right'))
+            samples += [(name, value, source_time, self.status_code(status))
+                        for name, value, source_time, status in block.samples(self.row, stop)]
+            self.row = stop
+            while self.event_row < len(block.events) and block.events[self.event_row][0] <= target:
+                events.append(block.events[self.event_row])
+                self.event_row += 1
+            if self.row < len(block) or self.event_row < len(block.events):
+                break
+            self.next_block()
+        if samples:
+            self.sub_handler.inject(samples)
+        for t, event_type, data in events:
+            self.event_replayed.emit(event_type, data)
+        self.time = target
+        self.position_changed.emit(self.position)
+        if self.block is None or target >= self.log.end:
+            self.pause()
+            self.finished.emit()
+
+    def close(self):
+        self.pause()
+        self.log.close()
+
+
+class ReplayBar(QtWidgets.QWidget):
+    # Play/pause, speed and position of a SessionPlayer, shown in the statusbar
+    SPEEDS = [1, 2, 5, 10, 50]
+
+    def __init__(self, player, parent=None):
+        super().__init__(parent)
+        self.player = player
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(QtWidgets.QLabel("Wiedergabe", self))
+        self.play_button = QtWidgets.QPushButton(self)
+        self.play_button.clicked.connect(self.toggle)
+        layout.addWidget(self.play_button)
+        self.speed = QtWidgets.QComboBox(self)
+        for speed in self.SPEEDS:
+            self.speed.addItem(f"{speed}×", speed)
+        if player.speed not in self.SPEEDS:
+            self.speed.addItem(f"{player.speed:g}×", player.speed)
+        self.speed.setCurrentIndex(self.speed.findData(player.speed))
+        self.speed.currentIndexChanged.connect(lambda index: player.set_speed(self.speed.itemData(index)))
+        layout.addWidget(self.speed)
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal, self)
+        self.slider.setRange(0, int(player.duration * 10))  # 0.1 s steps
+        self.slider.setMinimumWidth(240)
+        self.slider.sliderReleased.connect(lambda: player.seek(self.slider.value() / 10))
+        layout.addWidget(self.slider)
+        self.time_label = QtWidgets.QLabel(self)
+        layout.addWidget(self.time_label)
+        player.position_changed.connect(self.show_position)
+        player.finished.connect(self.show_state)
+        self.show_position(player.position)
+        self.show_state()
+
+    def toggle(self):
+        if self.player.playing:
+            self.player.pause()
+        else:
+            self.player.play()
+        self.show_state()
+
+    def show_state(self):
+        self.play_button.setText("Pause" if self.player.playing else "Abspielen")
+
+    def show_position(self, position):
+        if not self.slider.isSliderDown():
+            self.slider.setValue(int(position * 10))
+        text = f"{format_time(self.player.time)[11:19]}  {position:.0f} / {self.player.duration:.0f} s"
+        if self.time_label.text() != text:
+            self.time_label.setText(text)
@@ -0,0 +1,409 @@
+from datetime import datetime, timedelta, timezone
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from history import EPOCH, to_seconds
+
+
+# Session log: every subscription notification, parameter write and connection state change
+# of a session in one append-only file, for diagnosing scan failures afterwards.
+#
+#   file     MAGIC, uint32 header length, JSON header, blocks
+#   block    BLOCK header (magic, kind, rows, t_first, t_last, payload length), zlib payload
+#   index    <file>.idx, one INDEX entry per block, rebuilt from the block headers if missing
+#
+# A BATCH block holds the notifications of one flush interval as columns plus the events of
+# that interval. A SNAPSHOT block holds the latest sample of every node and the latest event
+# of every type, so seeking only decodes the blocks after the nearest snapshot.
+MAGIC = b"LGSESS01"
+BLOCK_MAGIC = b"BLK1"
+BLOCK = struct.Struct("<4sBIddI")
+INDEX = struct.Struct("<BIddQ")
+INDEX_DTYPE = np.dtype([("kind", "u1"), ("rows", "<u4"), ("t_first", "<f8"), ("t_last", "<f8"), ("offset", "<u8")])
+PAYLOAD = struct.Struct("<IIII")  # rows, names, events, texts (bytes)
+BATCH = 1
+SNAPSHOT = 2
+
+# value tags, the numbers go to the float or integer column, everything else to the text column
+NONE, BOOL, INT, FLOAT, STRING, JSON, REPR = range(7)
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+DEFAULT_SESSION_DIR = os.path.join(os.path.expanduser("~"), ".local_gui", "sessions")
+
+
+def default_session_path():
+    return os.path.join(DEFAULT_SESSION_DIR, datetime.now().strftime("session_%Y%m%d_%H%M%S.lgs"))
+
+
+def encode_block(samples, events):
+    # samples: [(time, node id string, value, source time or None, status)], events: [(time, type, data)]
+    n = len(samples)
+    names = {}
+    times = np.empty(n, dtype=np.float64)
+    nodes = np.empty(n, dtype=np.uint32)
+    tags = np.empty(n, dtype=np.uint8)
+    source_delays = np.empty(n, dtype=np.int64)
+    statuses = np.empty(n, dtype=np.uint32)
+    floats = np.zeros(n, dtype=np.float64)
+    integers = np.zeros(n, dtype=np.int64)
+    texts = []
+    for i, (t, name, value, source_time, status) in enumerate(samples):
+        times[i] = t
+        nodes[i] = names.setdefault(name, len(names))
+        # source timestamps are close to the receive time, the difference compresses well
+        source_delays[i] = NO_TIMESTAMP if source_time is None else round((t - source_time) * 1e6)
+        statuses[i] = status
+        if value is None:
+            tags[i] = NONE
+        elif isinstance(value, bool):
+            tags[i] = BOOL
+            integers[i] = value
+        elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            tags[i] = INT
+            integers[i] = value
+        elif isinstance(value, float):
+            tags[i] = FLOAT
+            floats[i] = value
+        elif isinstance(value, str):
+            tags[i] = STRING
+            texts.append(value)
+        else:
+            try:
+                texts.append(json.dumps(value))
+                tags[i] = JSON
+            except (TypeError, ValueError):
+                # structures of the PLC are kept readable, they cannot be rebuilt without the server
+                texts.append(repr(value))
+                tags[i] = REPR
+    # receive times as microsecond steps, mostly small numbers
+    steps = np.diff(np.round(times * 1e6).astype(np.int64), prepend=np.int64(0))
+    names_json = json.dumps(list(names)).encode()
+    events_json = json.dumps(events, default=repr).encode()
+    texts_json = json.dumps(texts).encode()
+    payload = b"".join([PAYLOAD.pack(n, len(names_json), len(events_json), len(texts_json)),
+                        names_json, events_json, texts_json,
+                        steps.tobytes(), nodes.tobytes(), tags.tobytes(), source_delays.tobytes(),
+                        statuses.tobytes(), floats.tobytes(), integers.tobytes()])
+    return zlib.compress(payload, 6)
+
+
+class Block:
+    # Decoded block, the samples stay in columns until they are applied
+    def __init__(self, times, names, nodes, tags, source_delays, statuses, floats, integers, texts, events):
+        self.times = times
+        self.names = names
+        self.nodes = nodes
+        self.tags = tags
+        self.source_delays = source_delays
+        self.statuses = statuses
+        self.floats = floats
+        self.integers = integers
+        self.texts = texts
+        self.events = events  # [[time, type, data]]
+        # position of every row in texts
+        self.text_rows = np.flatnonzero(tags >= STRING)
+
+    def __len__(self):
+        return len(self.times)
+
+    def value(self, i):
+        tag = self.tags[i]
+        if tag == FLOAT:
+            return float(self.floats[i])
+        if tag == INT:
+            return int(self.integers[i])
+        if tag == BOOL:
+            return bool(self.integers[i])
+        if tag == NONE:
+            return None
+        text = self.texts[int(np.searchsorted(self.text_rows, i))]
+        return json.loads(text) if tag == JSON else text
+
+    def source_time(self, i):
+        delay = self.source_delays[i]
+        if delay == NO_TIMESTAMP:
+            return None
+        return EPOCH + timedelta(microseconds=round(self.times[i] * 1e6) - int(delay))
+
+    def samples(self, start=0, stop=None):
+        # [(node id string, value, source timestamp, status)] of the rows start..stop
+        stop = len(self) if stop is None else stop
+        return [(self.names[self.nodes[i]], self.value(i), self.source_time(i), int(self.statuses[i]))
+                for i in range(start, stop)]
+
+    def latest(self, stop=None):
+        # like samples(0, stop), but only the last row of every node
+        stop = len(self) if stop is None else stop
+        nodes, last = np.unique(self.nodes[:stop][::-1], return_index=True)
+        return [(self.names[node], self.value(i), self.source_time(i), int(self.statuses[i]))
+                for node, i in zip(nodes, stop - 1 - last)]
+
+
+def decode_block(data):
+    payload = zlib.decompress(data)
+    n, names_length, events_length, texts_length = PAYLOAD.unpack_from(payload)
+    position = PAYLOAD.size
+    names = json.loads(payload[position:position + names_length])
+    position += names_length
+    events = json.loads(payload[position:position + events_length])
+    position += events_length
+    texts = json.loads(payload[position:position + texts_length])
+    position += texts_length
+    columns = []
+    for dtype in (np.int64, np.uint32, np.uint8, np.int64, np.uint32, np.float64, np.int64):
+        column = np.frombuffer(payload, dtype=dtype, count=n, offset=position)
+        position += column.nbytes
+        columns.append(column)
+    steps, nodes, tags, source_delays, statuses, floats, integers = columns
+    times = np.cumsum(steps) / 1e6
+    return Block(times, names, nodes, tags, source_delays, statuses, floats, integers, texts, events)
+
+
+class SessionRecorder:
+    # Collects notifications (subscription thread) and events (GUI thread) and appends them as
+    # one compressed block per flush interval from its own thread. The hot path is a lock and
+    # a list append, conversions happen at flush time.
+    def __init__(self, path, metadata=None, flush_interval=1.0, snapshot_interval=10.0, max_rows=50000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.max_rows = max_rows
+        self.error = None
+        self._lock = threading.Lock()
+        self._samples = []
+        self._events = []
+        self._node_names = {}  # NodeId -> string, written by the flush thread only
+        self._latest = {}  # node id string -> last sample, for snapshots
+        self._latest_events = {}  # event type -> last event
+        self._last_snapshot = 0.0
+        self._wake = threading.Event()
+        self._stop = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            header = json.dumps(dict(metadata or {}, version=1, created=datetime.now(timezone.utc).isoformat())).encode()
+            self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+            self._file.flush()
+        self._index = open(path + ".idx", 'ab')
+        self._thread = threading.Thread(target=self._run, name="session-recorder", daemon=True)
+        self._thread.start()
+
+    def notification(self, nodeid, value, source_timestamp, status):
+        t = time.time()
+        with self._lock:
+            self._samples.append((t, nodeid, value, source_timestamp, status))
+            if len(self._samples) >= self.max_rows:
+                self._wake.set()
+
+    def event(self, event_type, data=None):
+        # data must be JSON serializable
+        with self._lock:
+            self._events.append((time.time(), event_type, data))
+
+    def close(self):
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+        self._file.close()
+        self._index.close()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush()
+        self._flush()
+        self._snapshot(time.time())
+
+    def _flush(self):
+        with self._lock:
+            samples, self._samples = self._samples, []
+            events, self._events = self._events, []
+        if not samples and not events:
+            return
+        now = time.time()
+        rows = []
+        for t, nodeid, value, source_timestamp, status in samples:
+            name = self._node_names.get(nodeid)
+            if name is None:
+                name = self._node_names[nodeid] = nodeid.to_string()
+            row = (t, name, value, None if source_timestamp is None else to_seconds(source_timestamp),
+                   0 if status is None else status.value)
+            rows.append(row)
+            self._latest[name] = row
+        rows.sort(key=lambda row: row[0])
+        events = [[t, event_type, data] for t, event_type, data in events]
+        for event in events:
+            self._latest_events[event[1]] = event
+        times = [row[0] for row in rows[:1] + rows[-1:]] + [event[0] for event in events]
+        self._write(BATCH, rows, events, min(times), max(times))
+        if now - self._last_snapshot >= self.snapshot_interval:
+            self._snapshot(now)
+
+    def _snapshot(self, now):
+        rows = sorted(self._latest.values(), key=lambda row: row[0])
+        events = sorted(self._latest_events.values(), key=lambda event: event[0])
+        if rows or events:
+            self._write(SNAPSHOT, rows, events, now, now)
+        self._last_snapshot = now
+
+    def _write(self, kind, rows, events, t_first, t_last):
+        try:
+            data = encode_block(rows, events)
+            offset = self._file.tell()
+            self._file.write(BLOCK.pack(BLOCK_MAGIC, kind, len(rows), t_first, t_last, len(data)) + data)
+            self._file.flush()
+            # the index entry follows the block, a crash in between only costs the index rebuild
+            self._index.write(INDEX.pack(kind, len(rows), t_first, t_last, offset))
+            self._index.flush()
+        except Exception as e:
+            if self.error is None:
+                print("Error while writing the session log:", e)
+            self.error = e
+
+
+class SessionLog:
+    # Reader of a session log, blocks are found through the time index
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} ist kein Sitzungsprotokoll")
+        length, = struct.unpack("<I", self._file.read(4))
+        self.header = json.loads(self._file.read(length))
+        self.data_start = self._file.tell()
+        self.index = self._load_index()
+        batches = self.index[self.index["kind"] == BATCH]
+        self.start = float(batches["t_first"].min()) if len(batches) else 0.0
+        self.end = float(batches["t_last"].max()) if len(batches) else 0.0
+
+    def close(self):
+        self._file.close()
+
+    def _load_index(self):
+        size = os.fstat(self._file.fileno()).st_size
+        try:
+            index = np.fromfile(self.path + ".idx", dtype=INDEX_DTYPE)
+        except (OSError, ValueError):
+            index = np.empty(0, dtype=INDEX_DTYPE)
+        # entries of blocks that were not completely written are dropped
+        index = index[index["offset"] + BLOCK.size <= size]
+        last_end = self.data_start
+        if len(index):
+            last = index[-1]
+            self._file.seek(int(last["offset"]))
+            last_end = int(last["offset"]) + BLOCK.size + BLOCK.unpack(self._file.read(BLOCK.size))[5]
+        if last_end > size:
+            index = index[:-1]
+        elif last_end < size:
+            # the index lags behind the log, read the remaining block headers
+            index = np.concatenate([index, self._scan(last_end, size)])
+        return index
+
+    def _scan(self, position, size):
+        entries = []
+        while position + BLOCK.size <= size:
+            self._file.seek(position)
+            magic, kind, rows, t_first, t_last, length = BLOCK.unpack(self._file.read(BLOCK.size))
+            if magic != BLOCK_MAGIC or position + BLOCK.size + length > size:
+                break
+            entries.append((kind, rows, t_first, t_last, position))
+            position += BLOCK.size + length
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def read(self, entry):
+        # Block of an index entry
+        self._file.seek(int(entry["offset"]))
+        magic, kind, rows, t_first, t_last, length = BLOCK.unpack(self._file.read(BLOCK.size))
+        return decode_block(self._file.read(length))
+
+    def batches_after(self, position):
+        # Positions in the index of the batch blocks from position on
+        return [i for i in range(position, len(self.index)) if self.index[i]["kind"] == BATCH]
+
+    def state_at(self, t):
+        # Latest sample per node and latest event per type at time t, and the index position
+        # from which the blocks still contain rows after t
+        snapshots = np.flatnonzero((self.index["kind"] == SNAPSHOT) & (self.index["t_last"] <= t))
+        samples = {}
+        events = {}
+        start = 0
+        if len(snapshots):
+            start = int(snapshots[-1])
+            block = self.read(self.index[start])
+            for name, value, source_time, status in block.samples():
+                samples[name] = (value, source_time, status)
+            for event in block.events:
+                events[event[1]] = event
+            start += 1
+        position = len(self.index)
+        for i in range(start, len(self.index)):
+            entry = self.index[i]
+            if entry["kind"] != BATCH:
+                continue
+            if entry["t_last"] > t:
+                position = min(position, i)
+            if entry["t_first"] > t:
+                break
+            block = self.read(entry)
+            stop = int(np.searchsorted(block.times, t, side='right'))
+            for name, value, source_time, status in block.latest(stop):
+                samples[name] = (value, source_time, status)
+            for event in block.events:
+                if event[0] <= t:
+                    events[event[1]] = event
+        return samples, events, position
+
+
+def format_time(t):
+    return datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the content of a session log")
+    parser.add_argument("path")
+    parser.add_argument("--start", type=float, default=0.0, help="s after the start of the session")
+    parser.add_argument("--end", type=float, help="s after the start of the session")
+    parser.add_argument("--node", help="only nodes containing this text")
+    parser.add_argument("--summary", action="store_true", help="only the header and block statistics")
+    args = parser.parse_args(argv)
+
+    log = SessionLog(args.path)
+    batches = log.index[log.index["kind"] == BATCH]
+    print(json.dumps(log.header))
+    print(f"{format_time(log.start)} - {format_time(log.end)} ({log.end - log.start:.1f} s), "
+          f"{len(batches)} Blöcke, {int(batches['rows'].sum())} Werte, {os.path.getsize(args.path)} Bytes")
+    if args.summary:
+        return 0
+    t0 = log.start + args.start if args.start else 0.0
+    t1 = log.start + args.end if args.end is not None else log.end
+    samples, events, position = log.state_at(t0)
+    for i in log.batches_after(position):
+        entry = log.index[i]
+        if entry["t_first"] > t1:
+            break
+        block = log.read(entry)
+        rows = [(block.times[j], block.names[block.nodes[j]], j) for j in range(len(block))]
+        rows += [(event[0], None, event) for event in block.events]
+        for t, name, item in sorted(rows, key=lambda row: row[0]):
+            if not t0 < t <= t1:
+                continue
+            if name is None:
+                print(f"{format_time(t)}  [{item[1]}] {json.dumps(item[2])}")
+            elif args.node is None or args.node in name:
+                print(f"{format_time(t)}  {name} = {block.value(item)!r}")
+    log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
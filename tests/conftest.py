@@ -0,0 +1,61 @@
+import os
+import socket
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt6 import QtWidgets
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(app, condition, timeout=5.0):
+    # process Qt events until condition() is true
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        app.processEvents()
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def window(qapp, monkeypatch):
+    # Ui_MainWindow without the deferred services, tests put their own worker in place
+    monkeypatch.chdir(REPO)  # the .ui file is loaded relative to the working directory
+    import main
+    window = main.Ui_MainWindow()
+    window.importing = True  # no background import, no connection attempts
+    yield window
+    window.opcua_worker = None
+    window.close()
+    qapp.processEvents()
+
+
+@pytest.fixture
+def plc_simulator():
+    # Starts PlcSimulator(variables, rate, **options) on a free local port, stopped after the test
+    from opcua_simulator import PlcSimulator
+    simulators = []
+
+    def start(variables=5, rate=20.0, **options):
+        simulator = PlcSimulator(f"opc.tcp://127.0.0.1:{free_port()}", variables, rate=rate, **options)
+        simulator.start()
+        simulators.append(simulator)
+        return simulator
+    yield start
+    for simulator in simulators:
+        simulator.stop()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from binning import BinningPyramid, bin_frame, block_sum, plan_levels, sum_dtype
+
+
+def reference_mean(frame, level):
+    h = frame.shape[0] // level * level
+    w = frame.shape[1] // level * level
+    return frame[:h, :w].reshape(h // level, level, w // level, level).astype(np.float64).mean(axis=(1, 3))
+
+
+def test_sum_dtype_follows_the_source():
+    assert sum_dtype(np.uint8) == np.uint32
+    assert sum_dtype(np.uint16) == np.uint32
+    assert sum_dtype(np.int16) == np.int64
+    assert sum_dtype(np.float16) == np.float32
+    assert sum_dtype(np.float32) == np.float32
+    assert sum_dtype(np.float64) == np.float64
+
+
+def test_block_sum_crops_edges():
+    frame = np.ones((7, 9), dtype=np.uint16)
+    sums = block_sum(frame, 3)
+    assert sums.dtype == np.uint32
+    assert sums.shape == (2, 3)
+    assert np.all(sums == 9)
+
+
+def test_block_sum_keeps_float_values():
+    frame = np.full((4, 4), 0.25, dtype=np.float32)
+    frame[0, 0] = -1.0
+    sums = block_sum(frame, 2)
+    assert sums.dtype == np.float32
+    assert sums.tolist() == [[-0.25, 1.0], [1.0, 1.0]]
+
+
+def test_block_sum_of_16_bit_frames_does_not_overflow():
+    frame = np.full((16, 16), 65535, dtype=np.uint16)
+    assert block_sum(frame, 16)[0, 0] == 65535 * 256
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int16, np.float32, np.float64])
+def test_bin_frame_keeps_the_dtype(dtype):
+    rng = np.random.default_rng(1)
+    frame = (rng.random((10, 12)) * 100 - (50 if np.dtype(dtype).kind != 'u' else 0)).astype(dtype)
+    binned = bin_frame(frame, 2)
+    assert binned.dtype == dtype
+    if np.dtype(dtype).kind == 'f':
+        assert np.allclose(binned, reference_mean(frame, 2), rtol=1e-6)
+    else:
+        assert np.array_equal(binned, np.floor(reference_mean(frame, 2)))
+
+
+def test_plan_levels_reuses_divisors():
+    levels, plan = plan_levels([8, 2, 4, 3, 6, 1, 2])
+    assert levels == [1, 2, 3, 4, 6, 8]
+    assert plan == {1: 1, 2: 1, 3: 1, 4: 2, 6: 3, 8: 4}
+
+
+@pytest.mark.parametrize("dtype", [np.uint16, np.float32])
+def test_pyramid_matches_separate_binning(dtype):
+    rng = np.random.default_rng(2)
+    frame = (rng.random((50, 70)) * 4000).astype(dtype)
+    pyramid = BinningPyramid([1, 2, 3, 4, 6, 8])
+    result = pyramid.compute(frame)
+    assert result[1] is frame
+    for level in (2, 3, 4, 6, 8):
+        assert result[level].dtype == dtype
+        if np.dtype(dtype).kind == 'f':
+            assert np.allclose(result[level], bin_frame(frame, level), rtol=1e-5)
+        else:
+            assert np.array_equal(result[level], bin_frame(frame, level))
+
+
+def test_pyramid_copies_only_on_request():
+    pyramid = BinningPyramid([2])
+    frame = np.arange(16, dtype=np.uint16).reshape(4, 4)
+    first = pyramid.compute(frame)[2]
+    kept = pyramid.compute(frame, copy=True)[2]
+    assert pyramid.compute(frame + 4)[2] is first
+    assert kept.tolist() == [[2, 4], [10, 12]]
+    assert first.tolist() == [[6, 8], [14, 16]]
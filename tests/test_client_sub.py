@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+import threading
+
+from opcua import ua
+
+from client_sub import MySubHandler
+
+
+class FakeNode:
+    def __init__(self, node_id):
+        self.nodeid = ua.NodeId.from_string(node_id)
+
+
+class FakeData:
+    # what python-opcua passes as data: data.monitored_item.Value is the DataValue
+    def __init__(self, value, source_timestamp=None, status=ua.StatusCodes.Good):
+        self.monitored_item = self
+        self.Value = ua.DataValue(ua.Variant(value), ua.StatusCode(status))
+        self.Value.SourceTimestamp = source_timestamp
+        self.Value.ServerTimestamp = source_timestamp
+
+
+def notify(handler, node, value, **kwargs):
+    handler.datachange_notification(node, value, FakeData(value, **kwargs))
+
+
+def test_get_and_snapshot_copy_the_latest_sample():
+    handler = MySubHandler()
+    node = FakeNode("ns=4;s=MAIN.myVar1")
+    other = "ns=4;s=MAIN.aSim[0]"
+    handler.register([other])
+    assert handler.get(node.nodeid) is None
+    assert handler.snapshot() == {}  # registered but never received
+    t = datetime(2024, 1, 1, 12)
+    notify(handler, node, 7, source_timestamp=t, status=ua.StatusCodes.BadOutOfService)
+    value, source_timestamp, server_timestamp, status, seq = handler.get("ns=4;s=MAIN.myVar1")
+    assert (value, source_timestamp, server_timestamp, seq) == (7, t, t, 1)
+    assert status.value == ua.StatusCodes.BadOutOfService
+    assert handler.snapshot(["ns=4;s=MAIN.myVar1", other]) == {"ns=4;s=MAIN.myVar1": handler.get(node.nodeid)}
+
+
+def test_changed_since_reports_nodes_after_a_sequence_number():
+    handler = MySubHandler()
+    a, b = FakeNode("ns=4;s=a"), FakeNode("ns=4;s=b")
+    notify(handler, a, 1)
+    notify(handler, b, 2)
+    changed, seq = handler.changed_since(0)
+    assert seq == 2 == handler.seq
+    assert {nodeid.to_string(): sample[0] for nodeid, sample in changed.items()} == {"ns=4;s=a": 1, "ns=4;s=b": 2}
+    notify(handler, a, 3)
+    changed, seq = handler.changed_since(seq)
+    assert seq == 3
+    assert list(changed) == [a.nodeid]
+    assert changed[a.nodeid][0] == 3 and changed[a.nodeid][4] == 3
+    assert handler.changed_since(seq) == ({}, 3)
+
+
+def test_inject_keeps_status_codes_and_source_times():
+    handler = MySubHandler()
+    t = datetime(2024, 1, 1, 12)
+    bad = ua.StatusCode(ua.StatusCodes.BadOutOfService)
+    handler.inject([("ns=4;s=a", 1.5, t, ua.StatusCode()),
+                    ("ns=4;s=b", True, t + timedelta(seconds=1), bad)])
+    value, source_timestamp, server_timestamp, status, seq = handler.get("ns=4;s=b")
+    assert (value, source_timestamp, server_timestamp, seq) == (True, t + timedelta(seconds=1), t + timedelta(seconds=1), 2)
+    assert status is bad
+    assert handler.get("ns=4;s=a")[3].is_good()
+    assert handler.changed_since(1)[0].keys() == {ua.NodeId.from_string("ns=4;s=b")}
+
+
+def test_concurrent_notifications_are_not_lost():
+    # one subscription thread per node writes increasing values while the GUI drains and snapshots
+    handler = MySubHandler()
+    nodes = [FakeNode(f"ns=4;s=MAIN.aSim[{i}]") for i in range(4)]
+    handler.register([node.nodeid for node in nodes])
+    count = 5000
+    data = [FakeData(i) for i in range(count)]
+
+    def write(node):
+        for i in range(count):
+            handler.datachange_notification(node, i, data[i])
+
+    threads = [threading.Thread(target=write, args=(node,)) for node in nodes]
+    for thread in threads:
+        thread.start()
+    seen = {node.nodeid: [] for node in nodes}
+    snapshots = {node.nodeid: -1 for node in nodes}
+    while any(thread.is_alive() for thread in threads):
+        for nodeid, value in handler.take_changes().items():
+            seen[nodeid].append(value)
+        for nodeid, sample in handler.snapshot().items():
+            assert sample[0] >= snapshots[nodeid]
+            snapshots[nodeid] = sample[0]
+    for thread in threads:
+        thread.join()
+    for nodeid, value in handler.take_changes().items():
+        seen[nodeid].append(value)
+
+    assert handler.seq == len(nodes) * count
+    for node in nodes:
+        # drained values of one node only move forward and end with the last one written
+        assert seen[node.nodeid] == sorted(seen[node.nodeid])
+        assert seen[node.nodeid][-1] == count - 1
+        assert handler.get(node.nodeid)[0] == count - 1
+    assert sorted(sample[4] for sample in handler.snapshot().values())[-1] == handler.seq
+
+
+def test_take_changes_reports_every_change_once():
+    handler = MySubHandler()
+    a, b = FakeNode("ns=4;s=a"), FakeNode("ns=4;s=b")
+    notify(handler, a, 1)
+    notify(handler, b, 2)
+    assert handler.pending == 2
+    assert handler.take_changes() == {a.nodeid: 1, b.nodeid: 2}
+    assert handler.pending == 0
+    assert handler.take_changes() == {}
+    # two changes between frames are one change with the latest value
+    notify(handler, a, 3)
+    notify(handler, a, 4)
+    assert handler.take_changes() == {a.nodeid: 4}
+
+
+def test_update_gui_applies_each_change_once(window):
+    handler = MySubHandler()
+    a, b = FakeNode("ns=4;s=a"), FakeNode("ns=4;s=b")
+    calls = []
+    window.sub_handler = handler
+    window.gui_updaters = {a.nodeid: lambda value: calls.append(("a", value)),
+                           b.nodeid: lambda value: calls.append(("b", value))}
+    notify(handler, a, 1)
+    notify(handler, a, 2)
+    notify(handler, FakeNode("ns=4;s=unknown"), 0)  # no updater, drained anyway
+    window.update_GUI()
+    assert calls == [("a", 2)]
+    window.update_GUI()
+    assert calls == [("a", 2)]
+    notify(handler, b, True)
+    window.update_GUI()
+    assert calls == [("a", 2), ("b", True)]
+    assert handler.pending == 0
@@ -0,0 +1,34 @@
+from headless import HeadlessRunner
+from motion_control import AXES
+from opcua_simulator import DEFAULT_NODES, variable_node_ids
+from opcua_worker import ConnectionState
+from tests.conftest import wait_until
+
+
+def test_runner_against_the_simulator(qapp, plc_simulator):
+    simulator = plc_simulator()
+    node_list = DEFAULT_NODES + variable_node_ids(5) + [axis.actual_position for axis in AXES.values()]
+    runner = HeadlessRunner(simulator.endpoint, "admin1", "admin1", node_list)
+    try:
+        runner.start()
+        assert wait_until(qapp, lambda: runner.status == ConnectionState.CONNECTED, 20)
+        assert wait_until(qapp, lambda: runner.drained_values > 10, 5)
+
+        # Config mode of the PLC and back
+        simulator.set_running(False)
+        assert wait_until(qapp, lambda: runner.status == ConnectionState.PLC_CONFIG, 10)
+        simulator.set_running(True)
+        assert wait_until(qapp, lambda: runner.status == ConnectionState.CONNECTED, 10)
+
+        # an absolute move through the motion controller reaches the simulated axis
+        runner.opcua_worker.motion.move_to("R", 0.5)
+        position = AXES["R"].actual_position
+        assert wait_until(qapp, lambda: (runner.sub_handler.get(position) or (None,))[0] == 0.5, 10)
+
+        report = runner.report()
+        assert report["notifications"] > 0
+        assert report["time_to_connect_s"] > 0
+        assert [state for _, state in report["state_changes"]][-2:] == [ConnectionState.PLC_CONFIG, ConnectionState.CONNECTED]
+    finally:
+        runner.stop()
+        runner.opcua_worker.motion.close()
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from history import NodeHistory, RingBuffer, decimate, to_seconds
+
+
+def test_ring_buffer_keeps_the_newest_samples():
+    buffer = RingBuffer(4)
+    for i in range(6):
+        buffer.append(float(i), i * 10.0)
+    assert len(buffer) == 4
+    times, values = buffer.range()
+    assert times.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert values.tolist() == [20.0, 30.0, 40.0, 50.0]
+    assert buffer.latest() == (5.0, 50.0)
+
+
+def test_ring_buffer_range_across_the_wrap_around():
+    buffer = RingBuffer(5)
+    for i in range(8):
+        buffer.append(float(i), float(i))
+    times, _ = buffer.range(4.0, 7.0)
+    assert times.tolist() == [4.0, 5.0, 6.0]
+    assert buffer.range(10.0)[0].size == 0
+
+
+def test_ring_buffer_keeps_time_monotonic():
+    buffer = RingBuffer(4)
+    buffer.append(2.0, 1.0)
+    buffer.append(1.0, 2.0)  # late sample
+    assert buffer.range()[0].tolist() == [2.0, 2.0]
+    assert RingBuffer(4).latest() is None
+
+
+def test_decimate_min_max_mean_per_bin():
+    times = np.array([0.1, 0.2, 0.6, 2.5, 3.9])
+    values = np.array([1.0, 3.0, 2.0, 5.0, 7.0])
+    centers, mins, maxs, means = decimate(times, values, 0.0, 4.0, 4)
+    assert centers.tolist() == [0.5, 1.5, 2.5, 3.5]
+    assert mins[0] == 1.0 and maxs[0] == 3.0 and means[0] == 2.0
+    assert np.isnan(mins[1]) and np.isnan(means[1])  # empty bins are gaps
+    assert means[2] == 5.0 and means[3] == 7.0
+
+
+def test_decimate_without_samples():
+    centers, mins, maxs, means = decimate(np.empty(0), np.empty(0), 0.0, 1.0, 3)
+    assert len(centers) == 3
+    assert np.all(np.isnan(means))
+
+
+def test_node_history_skips_non_numeric_values():
+    history = NodeHistory(8)
+    start = datetime(2024, 1, 1)
+    history.append("a", start, 1.5)
+    history.append("a", start + timedelta(seconds=1), True)
+    history.append("b", start, "text")
+    assert history.node_ids() == ["a"]
+    times, values = history.range("a")
+    assert times.tolist() == [to_seconds(start), to_seconds(start) + 1]
+    assert values.tolist() == [1.5, 1.0]
+    assert history.range("b")[0].size == 0
+    centers, mins, maxs, means = history.decimated("a", to_seconds(start), to_seconds(start) + 2, 2)
+    assert means.tolist() == [1.5, 1.0]
+
+
+def test_ring_buffer_grows_up_to_its_depth():
+    buffer = RingBuffer(10, initial=4)
+    assert len(buffer.times) == 4
+    for i in range(9):
+        buffer.append(float(i), float(i))
+    assert len(buffer.times) == 10  # 4 -> 8 -> 10
+    assert buffer.range()[0].tolist() == [float(i) for i in range(9)]
+    for i in range(9, 13):
+        buffer.append(float(i), float(i))
+    assert len(buffer.times) == 10
+    assert buffer.range()[1].tolist() == [float(i) for i in range(3, 13)]
+    assert buffer.latest() == (12.0, 12.0)
@@ -0,0 +1,66 @@
+import numpy as np
+
+from live_view import FileFrameSource, FrameProcessor, LatestFrameSlot, Windowing, auto_window, numpy_to_qimage
+
+
+def test_slot_keeps_only_the_newest_frame():
+    slot = LatestFrameSlot()
+    assert slot.take() is None
+    slot.put("a")
+    slot.put("b")
+    assert slot.take() == "b"
+    assert slot.dropped == 1
+    assert slot.take() is None
+    assert slot.wait(0.01) is None
+    slot.put("c")
+    assert slot.wait(0.01) == "c"
+
+
+def test_auto_window():
+    frame = np.tile(np.arange(1000, dtype=np.uint16), (16, 1))
+    low, high = auto_window(frame, sample_step=1)
+    assert low == 4 and high == 994
+    assert auto_window(np.full((8, 8), 7, dtype=np.uint16)) == (7, 8)
+
+
+def test_windowing_maps_the_window_to_8_bit():
+    windowing = Windowing()
+    frame = np.array([[0, 100, 150, 200, 60000]], dtype=np.uint16)
+    assert windowing.apply(frame, 100, 200).tolist() == [[0, 0, 127, 255, 255]]
+    lut = windowing.lut(100, 200)
+    assert windowing.lut(100, 200) is lut
+    eight_bit = np.zeros((2, 2), dtype=np.uint8)
+    assert windowing.apply(eight_bit, 0, 1) is eight_bit
+
+
+def test_processor_bins_windows_and_alternates_buffers():
+    processor = FrameProcessor(LatestFrameSlot(), LatestFrameSlot())
+    processor.binning = 2
+    processor.window = (0, 255)
+    frame = np.arange(16, dtype=np.uint16).reshape(4, 4) * 10
+    first = processor.process(frame)
+    assert first.dtype == np.uint8
+    assert first.tolist() == [[25, 45], [105, 125]]
+    second = processor.process(frame)
+    assert second is not first
+    assert processor.process(frame) is first
+
+    processor.preprocess = lambda frame, binning: np.full((3, 3), 1000, dtype=np.uint16)
+    assert processor.process(frame).shape == (3, 3)
+
+
+def test_file_source_replays_a_stack(tmp_path):
+    path = tmp_path / "frames.npy"
+    np.save(path, np.arange(2 * 2 * 3, dtype=np.uint16).reshape(2, 2, 3))
+    source = FileFrameSource(str(path), fps=1000, loop=False)
+    source.open()
+    assert source.read()[0, 0] == 0
+    assert source.read()[0, 0] == 6
+    assert source.read() is None
+
+
+def test_qimage_shares_the_array(qapp):
+    array = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    image = numpy_to_qimage(array)
+    assert (image.width(), image.height()) == (4, 3)
+    assert image.pixelColor(1, 2).red() == 9
@@ -0,0 +1,109 @@
+import logging
+
+from PyQt6.QtCore import Qt
+
+from message_log import ERROR, INFO, WARNING, MessageLogModel, SeverityFilterModel
+
+
+def rows(model):
+    return [model.data(model.index(row, 0)) for row in range(model.rowCount())]
+
+
+def test_rows_are_inserted_in_one_batch(qapp):
+    model = MessageLogModel(log_path=None)
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.append("a")
+    model.append("b")
+    assert model.rowCount() == 0
+    model.flush()
+    assert rows(model) == ["a", "b"]
+    assert inserted == [(0, 1)]
+
+
+def test_repeats_are_folded_regardless_of_numbers(qapp):
+    model = MessageLogModel(log_path=None)
+    model.append("Verbindungsversuch 1, neuer Versuch in 0.5 s", WARNING)
+    model.flush()
+    model.append("Verbindungsversuch 2, neuer Versuch in 1.0 s", WARNING)
+    model.append("Verbindungsversuch 3, neuer Versuch in 2.0 s", WARNING)
+    model.flush()
+    assert rows(model) == ["Verbindungsversuch 3, neuer Versuch in 2.0 s (3x)"]
+    assert model.suppressed == 2
+
+
+def test_repeats_after_the_interval_get_a_new_row(qapp):
+    model = MessageLogModel(repeat_interval=0.0, log_path=None)
+    model.append("System Ready!")
+    model.append("System Ready!")
+    model.flush()
+    assert rows(model) == ["System Ready!", "System Ready!"]
+
+
+def test_continuous_repeats_stay_folded(qapp, monkeypatch):
+    # every repeat restarts the interval, a message repeated every 6 s stays one row
+    now = [0.0]
+    monkeypatch.setattr("message_log.time.monotonic", lambda: now[0])
+    model = MessageLogModel(repeat_interval=10.0, log_path=None)
+    for i in range(4):
+        now[0] = 6.0 * i
+        model.append(f"Verbindungsversuch {i}", WARNING)
+    model.flush()
+    assert rows(model) == ["Verbindungsversuch 3 (4x)"]
+
+
+def test_repeat_of_an_evicted_row_gets_a_new_row(qapp):
+    model = MessageLogModel(max_rows=2, log_path=None)
+    model.append("Verbindungsversuch 1", WARNING)
+    model.flush()
+    model.append("a")
+    model.append("b")
+    model.flush()
+    model.append("Verbindungsversuch 2", WARNING)
+    model.flush()
+    assert rows(model) == ["b", "Verbindungsversuch 2"]
+    assert model.suppressed == 0
+
+
+def test_repeats_are_not_folded_across_severities(qapp):
+    model = MessageLogModel(log_path=None)
+    model.append("Achse R: Status 1", WARNING)
+    model.append("Achse R: Status 2", ERROR)
+    model.append("Achse R: Status 3", ERROR)
+    model.flush()
+    assert rows(model) == ["Achse R: Status 1", "Achse R: Status 3 (2x)"]
+    assert model.data(model.index(1, 0), Qt.ItemDataRole.UserRole) == ERROR
+
+
+def test_oldest_rows_are_evicted(qapp):
+    model = MessageLogModel(max_rows=3, log_path=None)
+    for i in range(5):
+        model.append(f"Meldung {chr(ord('a') + i)}")
+        model.flush()
+    assert rows(model) == ["Meldung c", "Meldung d", "Meldung e"]
+
+
+def test_severity_filter(qapp):
+    model = MessageLogModel(log_path=None)
+    model.append("info", INFO)
+    model.append("warnung", WARNING)
+    model.append("fehler", ERROR)
+    model.flush()
+    view = SeverityFilterModel()
+    view.setSourceModel(model)
+    view.set_minimum_severity(WARNING)
+    assert [view.data(view.index(row, 0)) for row in range(view.rowCount())] == ["warnung", "fehler"]
+    assert view.data(view.index(1, 0), Qt.ItemDataRole.UserRole) == ERROR
+
+
+def test_file_log_handlers_are_removed_on_close(qapp, tmp_path):
+    logger = logging.getLogger("local_gui.messages")
+    handlers = len(logger.handlers)
+    path = tmp_path / "messages.log"
+    for i in range(3):
+        model = MessageLogModel(log_path=str(path))
+        model.append(f"Meldung {chr(ord('a') + i)}")
+        model.close()
+    assert len(logger.handlers) == handlers
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [line.split(" INFO ")[1] for line in lines] == ["Meldung a", "Meldung b", "Meldung c"]
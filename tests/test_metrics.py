@@ -0,0 +1,70 @@
+import json
+import urllib.request
+
+import metrics as metrics_module
+from metrics import Metrics, MetricsReporter, Timing, reporter_from_environment
+from tests.conftest import free_port
+
+
+def test_timing_summary():
+    timing = Timing(size=4)
+    assert timing.summary() == {"count": 0}
+    for ms in (1, 2, 3, 4, 50, 6):
+        timing.add(ms / 1000)
+    summary = timing.summary()
+    assert summary["count"] == 6
+    assert summary["max_ms"] == 50.0
+    assert summary["mean_ms"] == 11.0
+    assert summary["p50_ms"] == 6.0  # of the 4 most recent samples
+    assert summary["p99_ms"] == 50.0
+
+
+def test_sample_turns_counters_into_rates(monkeypatch):
+    registry = Metrics()
+    clock = iter([10.0, 12.0])
+    monkeypatch.setattr(metrics_module.time, "perf_counter", lambda: next(clock))
+    registry.count("notifications", 5)
+    registry.add_source(lambda: registry.gauge("pending", 3))
+    first = registry.sample()
+    assert first["counters"] == {"notifications": 5}
+    assert first["rates_per_s"] == {}
+    assert first["gauges"] == {"pending": 3}
+    registry.count("notifications", 8)
+    registry.set_total("seq", 20)
+    registry.time("update_gui", 0.002)
+    second = registry.sample()
+    assert second["rates_per_s"] == {"notifications": 4.0, "seq": 10.0}
+    assert second["timings"]["update_gui"]["count"] == 1
+    assert registry.last_sample is second
+
+
+def test_failing_source_does_not_stop_the_sample(capsys):
+    registry = Metrics()
+    registry.add_source(lambda: 1 / 0)
+    assert "counters" in registry.sample()
+    assert "Error while sampling metrics" in capsys.readouterr().out
+
+
+def test_reporter_is_off_without_environment(monkeypatch):
+    for name in ("LOCAL_GUI_METRICS", "LOCAL_GUI_METRICS_FILE", "LOCAL_GUI_METRICS_PORT"):
+        monkeypatch.delenv(name, raising=False)
+    assert reporter_from_environment() is None
+    monkeypatch.setenv("LOCAL_GUI_METRICS", "0")
+    assert reporter_from_environment() is None
+
+
+def test_reporter_writes_the_file_and_serves_the_last_sample(qapp, tmp_path):
+    port = free_port()
+    path = tmp_path / "metrics.jsonl"
+    reporter = MetricsReporter(path=str(path), port=port, file_every=2)
+    samples = []
+    reporter.sampled.connect(samples.append)
+    try:
+        for _ in range(3):
+            reporter.sample()
+        assert len(samples) == 3
+        assert len(path.read_text().splitlines()) == 1
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert json.load(response)["time"] == samples[-1]["time"]
+    finally:
+        reporter.close()
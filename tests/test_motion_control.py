@@ -0,0 +1,120 @@
+from opcua import ua
+
+from motion_control import AXES, MotionController
+
+
+class Signal:
+    def __init__(self):
+        self.calls = []
+
+    def emit(self, *args):
+        self.calls.append(args)
+
+
+class UaClient:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, params):
+        self.writes.append({value.NodeId.to_string(): value.Value.Value.Value for value in params.NodesToWrite})
+        return [ua.StatusCode() for _ in params.NodesToWrite]
+
+
+class Client:
+    def __init__(self):
+        self.uaclient = UaClient()
+
+
+class NodeCache:
+    def variant_type(self, node_id):
+        raise AssertionError("no type lookups while writing")
+
+
+class Worker:
+    def __init__(self, client=None):
+        self.client = client
+        self.node_cache = NodeCache()
+        self.message = Signal()
+        self.motion_requested = Signal()
+
+
+def test_commands_of_an_axis_are_coalesced():
+    worker = Worker(Client())
+    motion = MotionController(worker)
+    motion.jog("R", 1)
+    motion.jog("R", -1)
+    motion.move_to("ZB", 12.5)
+    assert len(worker.motion_requested.calls) == 1
+    motion.flush()
+    r, zb = AXES["R"], AXES["ZB"]
+    assert worker.client.uaclient.writes == [{r.jog_positive: False, r.jog_negative: True,
+                                              zb.jog_positive: False, zb.jog_negative: False,
+                                              zb.target_position: 12.5, zb.move_absolute: True}]
+    motion.close()
+
+
+def test_stop_discards_the_pending_command():
+    worker = Worker(Client())
+    motion = MotionController(worker)
+    motion.jog("R", 1)
+    motion.stop("R")
+    motion.close()
+    motion.flush()
+    r = AXES["R"]
+    assert worker.client.uaclient.writes == [{r.jog_positive: False, r.jog_negative: False,
+                                              r.move_absolute: False, r.stop: True}]
+
+
+def test_stop_during_a_flush_is_repeated():
+    worker = Worker(Client())
+    motion = MotionController(worker)
+    motion.jog("R", 1)
+    write = worker.client.uaclient.write
+
+    def write_and_stop(params):
+        # the stop generation changes while the jog is on the way
+        motion._stop_generation["R"] += 1
+        worker.client.uaclient.write = write
+        return write(params)
+    worker.client.uaclient.write = write_and_stop
+    motion.flush()
+    writes = worker.client.uaclient.writes
+    assert len(writes) == 2
+    assert writes[1][AXES["R"].stop] is True
+    motion.close()
+
+
+def test_release_and_stop_are_sent_after_reconnecting():
+    worker = Worker()
+    motion = MotionController(worker)
+    motion.jog("R", 1)
+    motion.flush()
+    motion.stop("ZB")
+    motion.close()
+    assert len(worker.message.calls) == 2
+
+    worker.client = Client()
+    motion.resend_held()
+    r, zb = AXES["R"], AXES["ZB"]
+    assert worker.client.uaclient.writes == [{zb.jog_positive: False, zb.jog_negative: False, zb.move_absolute: False, zb.stop: True},
+                                             {r.jog_positive: False, r.jog_negative: False}]
+    motion.resend_held()
+    assert len(worker.client.uaclient.writes) == 2
+
+
+def test_release_is_sent_after_a_failed_write():
+    worker = Worker(Client())
+    motion = MotionController(worker)
+
+    def write_fails(params):
+        raise ConnectionError("connection lost")
+    worker.client.uaclient.write = write_fails
+    motion.jog("R", 1)
+    motion.flush()
+    assert len(worker.message.calls) == 1
+    motion.close()
+
+    worker.client = Client()
+    motion.resend_held()
+    r = AXES["R"]
+    assert worker.client.uaclient.writes == [{r.jog_positive: False, r.jog_negative: False}]
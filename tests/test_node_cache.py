@@ -0,0 +1,74 @@
+from opcua import ua
+
+from node_cache import FINGERPRINT_NODES, NodeCache
+
+
+class Node:
+    def __init__(self, client, node_id):
+        self.client = client
+        self.node_id = node_id
+
+    def get_data_type_as_variant_type(self):
+        self.client.type_reads += 1
+        return self.client.types[self.node_id]
+
+
+class UaClient:
+    def __init__(self, client):
+        self.client = client
+
+    def read(self, params):
+        assert len(params.NodesToRead) == len(FINGERPRINT_NODES)
+        return [ua.DataValue(ua.Variant(self.client.build))] + [ua.DataValue(ua.Variant("x"))] * (len(FINGERPRINT_NODES) - 1)
+
+
+class Client:
+    def __init__(self, build="1"):
+        self.build = build
+        self.types = {"ns=4;s=a": ua.VariantType.Double, "ns=4;s=b": ua.VariantType.Int16}
+        self.type_reads = 0
+        self.uaclient = UaClient(self)
+
+    def get_node(self, node_id):
+        return Node(self, node_id)
+
+
+def test_data_types_are_read_once_and_persisted(tmp_path):
+    path = str(tmp_path / "node_cache.json")
+    client = Client()
+    cache = NodeCache(path)
+    fingerprint = cache.attach(client, "opc.tcp://plc")
+    assert cache.variant_type("ns=4;s=a") == ua.VariantType.Double
+    assert cache.variant_type("ns=4;s=a") == ua.VariantType.Double
+    assert client.type_reads == 1
+    assert cache.get_node("ns=4;s=a") is cache.get_node("ns=4;s=a")
+
+    # a new process with the same server reads nothing but the fingerprint
+    client = Client()
+    cache = NodeCache(path)
+    assert cache.attach(client, "opc.tcp://plc") == fingerprint
+    assert cache.variant_type("ns=4;s=a") == ua.VariantType.Double
+    assert client.type_reads == 0
+
+
+def test_a_new_server_build_invalidates_the_cache(tmp_path):
+    path = str(tmp_path / "node_cache.json")
+    cache = NodeCache(path)
+    old = cache.attach(Client("1"), "opc.tcp://plc")
+    cache.variant_type("ns=4;s=b")
+    other = cache.attach(Client("1"), "opc.tcp://other")
+    client = Client("2")
+    new = cache.attach(client, "opc.tcp://plc")
+    assert new != old
+    assert cache.variant_type("ns=4;s=b") == ua.VariantType.Int16
+    assert client.type_reads == 1
+    # entries of older builds of this server are dropped, other servers are kept
+    assert set(NodeCache(path)._store) == {other, new}
+
+
+def test_unreadable_cache_file_starts_empty(tmp_path):
+    path = tmp_path / "node_cache.json"
+    path.write_text("{")
+    cache = NodeCache(str(path))
+    cache.attach(Client(), "opc.tcp://plc")
+    assert cache.entry["nodes"] == {}
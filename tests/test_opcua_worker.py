@@ -0,0 +1,54 @@
+from PyQt6 import QtCore
+
+from opcua_simulator import DEFAULT_NODES, variable_node_ids
+from opcua_worker import ConnectionState, OpcuaWorker
+from tests.conftest import wait_until
+
+
+def reconnect(qapp, simulator):
+    # Connects a worker, drops the connection in the simulator and waits for the reconnect.
+    # Returns the subscription before and after, the subscriptions left on the server and
+    # whether the status node, which does not change, was sent again.
+    node_list = DEFAULT_NODES + variable_node_ids(5)
+    thread = QtCore.QThread()
+    worker = OpcuaWorker(simulator.endpoint, "admin1", "admin1", node_list)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.start)
+    states = []
+    worker.status_changed.connect(states.append)
+    try:
+        thread.start()
+        assert wait_until(qapp, lambda: states and states[-1] == ConnectionState.CONNECTED, 20)
+        assert wait_until(qapp, lambda: worker.my_sub_handler.get(worker.status_node_id) is not None, 5)
+        first = worker.subscription
+        status_seq = worker.my_sub_handler.get(worker.status_node_id)[4]
+
+        count = len(states)
+        simulator.disconnect_clients()
+        assert wait_until(qapp, lambda: len(states) > count and states[-1] == ConnectionState.CONNECTED, 30)
+        assert wait_until(qapp, lambda: worker.subscription is not None, 5)
+        assert set(worker.subscription_info) == set(node_list + [worker.status_node_id])
+        # values keep arriving through the subscription
+        seq = worker.my_sub_handler.seq
+        assert wait_until(qapp, lambda: worker.my_sub_handler.seq > seq, 5)
+        resent = worker.my_sub_handler.get(worker.status_node_id)[4] > status_seq
+        return first, worker.subscription, len(simulator.server.iserver.subscription_service.subscriptions), resent
+    finally:
+        worker.stop_requested.emit()
+        thread.quit()
+        thread.wait()
+
+
+def test_subscription_is_transferred_after_a_connection_loss(qapp, plc_simulator):
+    first, subscription, on_server, resent = reconnect(qapp, plc_simulator())
+    assert subscription is first
+    assert on_server == 1
+    assert resent  # SendInitialValues
+
+
+def test_subscription_is_recreated_when_the_transfer_is_rejected(qapp, plc_simulator):
+    first, subscription, on_server, resent = reconnect(qapp, plc_simulator(transfer_subscriptions=False))
+    assert subscription is not first
+    assert subscription.subscription_id != first.subscription_id
+    assert on_server == 1
+    assert resent  # initial values of the new monitored items
@@ -0,0 +1,72 @@
+import json
+
+from PyQt6 import QtCore
+from opcua import ua
+
+from parameter_transfer import SCAN_PARAMETERS, active_mode_values, convert_parameters, convert_value
+from tests.conftest import wait_until
+
+
+RECIPE = {
+    "ScanParameter": {"Mode(StopAndGo/Continuous)": "StopAndGo", "Z-Shift Range": 0.0, "numberOfPositions": 360,
+                      "numberOfImagesPerPosition": 2, "numberOfSkippedImages": 0,
+                      "distanceSourceObject(mm)": 300.0, "distanceSourceDetector(mm)": 900.0},
+    "PreScanParameter": {"numberOfPositions": 36, "numberOfImagesPerPosition": 1},
+    "Normalization": {"normalizationMethod(flat field/lut)": "flat field", "numberOfDarkFrames": 10, "numberOfLutSteps": 4},
+    "ImageSensor0": {"flipValue": 0, "exposureTime(ms)": 50.0, "gain(mdB)": 0, "blackLevel": 100},
+    "ImageSensor1": {"gain(mdB)": 0},
+    "Scintilator": {"scintilatorId": "CsI", "centerOfRotation(pixels)": 768.0, "middlePlane(pixels)": 768.0, "pixelSize(mm)": 0.1},
+    "Source": {"voltage(kV)": 150.0, "current(mA)": 0.2, "focalSpotSize(small/large)": "Small"},
+}
+
+
+class Worker(QtCore.QObject):
+    # stands in for OpcuaWorker, records the parameter sets the GUI sends
+    parameters_write_requested = QtCore.pyqtSignal(dict)
+
+
+def test_convert_value_parses_line_edit_text():
+    assert convert_value(" 12,5 ", ua.VariantType.Float) == 12.5
+    assert convert_value("7.0", ua.VariantType.Int32) == 7
+    assert convert_value("True", ua.VariantType.Boolean) is True
+    assert convert_value("0", ua.VariantType.Boolean) is False
+    assert convert_value(None, ua.VariantType.String) == ""
+
+
+def test_convert_parameters_reports_invalid_values():
+    converted, errors = convert_parameters({"advance_kV": "150", "advance_mA": "abc", "unknown": "1"})
+    assert converted == {"advance_kV": 150.0}
+    assert errors == [("advance_mA", "abc")]
+
+
+def test_active_mode_values_drops_the_other_mode():
+    values = {"advance_numberOfFrames": "", "advance_numberOfPositionsScan": "360",
+              "advance_numberOfFramesScan": "2", "advance_stopAndGoOrContinuous": True}
+    assert active_mode_values(values) == {"advance_numberOfPositionsScan": "360", "advance_numberOfFramesScan": "2",
+                                          "advance_stopAndGoOrContinuous": True}
+    values["advance_stopAndGoOrContinuous"] = False
+    assert active_mode_values(values) == {"advance_numberOfFrames": "", "advance_stopAndGoOrContinuous": False}
+
+
+def test_single_mode_recipe_is_written(window, qapp, tmp_path):
+    # a fresh window only has the fields of the recipe's mode filled, the other mode's stay empty
+    window.changePage(1)
+    window.assign_functions()
+    window.functions_assigned = True
+    worker = window.opcua_worker = Worker()
+    written = []
+    worker.parameters_write_requested.connect(written.append)
+
+    path = tmp_path / "single_mode.json"
+    path.write_text(json.dumps(RECIPE))
+    window.groupBox_8.loader.load(str(path))
+    assert wait_until(qapp, lambda: written)
+
+    parameters = written[0]
+    assert window.json_continous_frames.text() == ""
+    assert "advance_numberOfFrames" not in parameters
+    assert parameters["advance_numberOfPositionsScan"] == 360
+    assert parameters["advance_numberOfFramesScan"] == 2
+    assert parameters["advance_stopAndGoOrContinuous"] is True
+    assert parameters["advance_kV"] == 150.0
+    assert set(parameters) <= {name for name, _, _ in SCAN_PARAMETERS}
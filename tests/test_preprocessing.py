@@ -0,0 +1,83 @@
+import numpy as np
+
+from preprocessing import LUT, Preprocessor, bin_map, flip_frame
+
+
+def test_bin_map_averages_blocks_and_crops_edges():
+    values = np.arange(30, dtype=np.float32).reshape(5, 6)
+    binned = bin_map(values, 2)
+    assert binned.shape == (2, 3)
+    assert binned[0, 0] == (0 + 1 + 6 + 7) / 4
+
+
+def test_flat_field_maps():
+    reports = []
+    preprocessor = Preprocessor(report=reports.append)
+    preprocessor.set_dark(np.full((2, 4, 4), 100, dtype=np.uint16))
+    flat = np.full((4, 4), 1100, dtype=np.float32)
+    flat[0, 0] = 600  # half as sensitive
+    preprocessor.set_flat(flat)
+    maps = preprocessor.maps((4, 4), 1)
+    assert np.all(maps.offset == 100)
+    assert maps.gain[0, 0] == 2 * maps.gain[1, 1]
+
+    frame = np.full((4, 4), 1100, dtype=np.uint16)
+    frame[0, 0] = 600
+    out = preprocessor.process(frame)
+    assert np.ptp(out) <= 1
+    assert reports == []
+
+
+def test_maps_are_binned_with_the_frames():
+    preprocessor = Preprocessor(report=AssertionError)
+    preprocessor.set_dark(np.arange(16, dtype=np.float32).reshape(4, 4))
+    assert preprocessor.maps((2, 2), 2).offset.tolist() == [[2.5, 4.5], [10.5, 12.5]]
+    assert preprocessor.maps((4, 4), 1).offset.shape == (4, 4)
+
+
+def test_black_level_without_dark_frames():
+    preprocessor = Preprocessor()
+    preprocessor.configure({"ImageSensor0": {"blackLevel": 64, "flipValue": 1}})
+    assert np.all(preprocessor.maps((3, 5), 1).offset == 64)
+    frame = np.array([[64, 65, 66]], dtype=np.uint16)
+    assert preprocessor.process(frame).tolist() == [[2, 1, 0]]
+
+
+def test_lut_maps_every_step_to_its_mean():
+    preprocessor = Preprocessor()
+    preprocessor.configure({"Normalization": {"normalizationMethod(flat field/lut)": "LUT"}})
+    gains = np.array([[1.0, 2.0], [0.5, 1.0]], dtype=np.float32)
+    steps = np.stack([gains * level for level in (0.0, 100.0, 400.0)])
+    preprocessor.set_lut_steps(steps)
+    maps = preprocessor.maps((2, 2), 1)
+    assert maps.lut_slopes.shape == (2, 2, 2)
+    out = preprocessor.process((gains * 100).astype(np.uint16))
+    assert np.all(np.abs(out.astype(int) - int(steps[1].mean())) <= 1)
+
+
+def test_mismatching_calibration_is_reported_once_and_not_used():
+    reports = []
+    preprocessor = Preprocessor(report=reports.append)
+    preprocessor.set_dark(np.full((8, 8), 100, dtype=np.float32))
+    frame = np.full((6, 6), 300, dtype=np.uint16)
+    for _ in range(3):
+        out = preprocessor.process(frame)
+    assert len(reports) == 1
+    assert "Dunkelbild (8x8)" in reports[0]
+    assert np.all(out == 300)  # black level 0 instead of the dark image
+    preprocessor.process(frame, 2)
+    assert len(reports) == 1
+
+    # a new calibration is checked against the frames at once
+    preprocessor.set_flat(np.ones((4, 4), dtype=np.float32))
+    assert len(reports) == 3
+    assert "unterschiedliche Größen" in reports[1]
+    assert "Hellbild (4x4)" in reports[2]
+    preprocessor.process(frame)
+    assert len(reports) == 3
+
+
+def test_flip_frame_returns_views():
+    frame = np.arange(6).reshape(2, 3)
+    assert flip_frame(frame, 3).tolist() == [[5, 4, 3], [2, 1, 0]]
+    assert np.shares_memory(flip_frame(frame, 2), frame)
@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from binning import bin_frame
+from projection_writer import ProjectionWriter
+
+
+def test_projections_are_written_at_every_binning(tmp_path):
+    writer = ProjectionWriter(str(tmp_path), "scan", 3, binnings=(2, 1), metadata={"numberOfPositions": 3}, flush_every=2)
+    writer.start()
+    frames = [np.full((4, 6), i * 100, dtype=np.uint16) + np.arange(6, dtype=np.uint16) for i in range(3)]
+    for frame in frames:
+        assert writer.put(frame, timeout=5)
+    assert writer.complete
+    assert not writer.put(frames[0])
+    writer.close()
+
+    full = np.load(writer.dataset_path(1))
+    binned = np.load(writer.dataset_path(2))
+    assert full.shape == (3, 4, 6) and binned.shape == (3, 2, 3)
+    assert np.array_equal(full, np.stack(frames))
+    assert np.array_equal(binned[2], bin_frame(frames[2], 2))
+    with open(os.path.join(writer.directory, "scan_metadata.json")) as f:
+        metadata = json.load(f)
+    assert metadata["written"] == 3 and metadata["dropped"] == [] and metadata["error"] is None
+    assert metadata["frameShape"] == [4, 6]
+    assert metadata["datasets"] == {"1": "scan_bin1.npy", "2": "scan_bin2.npy"}
+    assert metadata["recipe"] == {"numberOfPositions": 3}
+
+
+def test_a_full_queue_drops_frames_instead_of_blocking(tmp_path):
+    writer = ProjectionWriter(str(tmp_path), "scan", 4, queue_size=1, frame_shape=(2, 2))
+    frame = np.ones((2, 2), dtype=np.uint16)
+    # the writer thread is not started yet, nothing leaves the queue
+    assert writer.put(frame)
+    assert not writer.put(frame)
+    assert writer.put(frame, index=3) is False
+    assert writer.dropped == [1, 3]
+    writer.start()
+    writer.close()
+    stored = np.load(writer.dataset_path(1))
+    assert stored.shape == (4, 2, 2)
+    assert stored[0].tolist() == [[1, 1], [1, 1]]
+    assert writer.written == 1
+
+
+def test_close_is_idempotent(tmp_path):
+    writer = ProjectionWriter(str(tmp_path), "scan", 2, frame_shape=(2, 2))
+    writer.start()
+    writer.put(np.ones((2, 2), dtype=np.uint16))
+    threads = [threading.Thread(target=writer.close) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    assert writer.closed
+    # a repeated close would have queued another end marker that nobody takes
+    assert writer._queue.empty()
+    with open(os.path.join(writer.directory, "scan_metadata.json")) as f:
+        assert json.load(f)["written"] == 1
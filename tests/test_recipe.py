@@ -0,0 +1,78 @@
+import json
+
+from recipe import RECIPE_SCHEMA, RecipeCache, load_recipe, validate_recipe
+
+
+def test_values_are_converted_to_the_field_types():
+    parameters, errors = validate_recipe({
+        "ScanParameter": {"Mode(StopAndGo/Continuous)": " continuous", "numberOfPositions": "360",
+                          "distanceSourceObject(mm)": "300,5"},
+        "Source": {"focalSpotSize(small/large)": "large"},
+    })
+    scan = parameters["ScanParameter"]
+    assert scan["Mode(StopAndGo/Continuous)"] == "Continuous"
+    assert scan["numberOfPositions"] == 360 and isinstance(scan["numberOfPositions"], int)
+    assert scan["distanceSourceObject(mm)"] == 300.5
+    assert parameters["Source"]["focalSpotSize(small/large)"] == "Large"
+    assert "ScanParameter.numberOfPositions fehlt" not in errors
+    assert "ScanParameter.numberOfSkippedImages fehlt" in errors
+
+
+def test_missing_and_invalid_values_get_the_default():
+    parameters, errors = validate_recipe({
+        "ScanParameter": {"numberOfPositions": 1.5, "numberOfImagesPerPosition": -1, "Z-Shift Range": None},
+        "ImageSensor0": {"flipValue": 4, "blackLevel": True},
+    })
+    assert parameters["ScanParameter"]["numberOfPositions"] == 0
+    assert parameters["ScanParameter"]["numberOfImagesPerPosition"] == 0
+    assert parameters["ImageSensor0"]["flipValue"] == 0
+    assert any(error.startswith("ScanParameter.numberOfPositions ungültig") and "ganze Zahl" in error for error in errors)
+    assert any("kleiner als 0" in error for error in errors)
+    assert any("größer als 3" in error for error in errors)
+    assert any(error.startswith("ImageSensor0.blackLevel ungültig") for error in errors)
+    assert "ScanParameter.Z-Shift Range fehlt" in errors
+    assert "Abschnitt Normalization fehlt" in errors
+    # every schema key is present
+    assert {section: set(values) for section, values in parameters.items()} == \
+        {section: set(fields) for section, fields in RECIPE_SCHEMA.items()}
+
+
+def test_non_object_recipe():
+    parameters, errors = validate_recipe([1, 2])
+    assert errors == ["Rezept ist kein JSON-Objekt"]
+    assert parameters["Source"]["focalSpotSize(small/large)"] == "Small"
+
+
+def test_identical_files_are_parsed_once(tmp_path):
+    cache = RecipeCache()
+    first = tmp_path / "a.json"
+    second = tmp_path / "b.json"
+    content = json.dumps({"PreScanParameter": {"numberOfPositions": 36}})
+    first.write_text(content)
+    second.write_text(content)
+    a = load_recipe(str(first), cache)
+    b = load_recipe(str(second), cache)
+    assert (a.name, b.name) == ("a", "b")
+    assert a.digest == b.digest
+    assert a.parameters is b.parameters
+    assert a.parameters["PreScanParameter"]["numberOfPositions"] == 36
+    # errors are copied, callers may extend their list
+    assert a.errors == b.errors and a.errors is not b.errors
+
+
+def test_invalid_json(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text("{")
+    recipe = load_recipe(str(path), None)
+    assert len(recipe.errors) == 1 and recipe.errors[0].startswith("Ungültiges JSON")
+    assert recipe.parameters["ScanParameter"]["numberOfPositions"] == 0
+
+
+def test_cache_drops_the_least_recently_used():
+    cache = RecipeCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
@@ -0,0 +1,84 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from projection_writer import ProjectionWriter
+from reconstruction import ConeBeamGeometry, ReconstructionQueue, ramp_filter
+from tests.conftest import wait_until
+
+
+RECIPE = {
+    "ScanParameter": {"Mode(StopAndGo/Continuous)": "Continuous", "distanceSourceObject(mm)": 300.0,
+                      "distanceSourceDetector(mm)": 600.0},
+    "Scintilator": {"pixelSize(mm)": 0.2, "centerOfRotation(pixels)": 0, "middlePlane(pixels)": 0},
+}
+
+
+def test_geometry_from_recipe():
+    geometry = ConeBeamGeometry.from_recipe(RECIPE, (32, 48))
+    assert (geometry.center, geometry.middle) == (23.5, 15.5)  # detector center when not calibrated
+    assert geometry.voxel_size == pytest.approx(0.1)
+    binned = geometry.binned(2)
+    assert (binned.center, binned.middle, binned.pixel_size) == (11.5, 7.5, 0.4)
+    with pytest.raises(ValueError):
+        ConeBeamGeometry.from_recipe({"ScanParameter": {"distanceSourceObject(mm)": 300.0}}, (32, 48))
+
+
+def test_ramp_filter_is_padded_against_wrap_around():
+    size, response = ramp_filter(100, 1.0)
+    assert size == 256
+    assert len(response) == size // 2 + 1
+    assert response[0] == pytest.approx(0, abs=1e-3)
+    assert response[-1] > response[len(response) // 2] > 0
+
+
+def test_source_frames_average_positions_and_replace_dropped_frames():
+    queue = ReconstructionQueue(processes=1)
+    scan = {"numberOfProjections": 8, "dropped": [3, 4],
+            "recipe": {"ScanParameter": {"Mode(StopAndGo/Continuous)": "StopAndGo", "numberOfImagesPerPosition": 2}}}
+    frames, positions = queue._source_frames(scan, 1)
+    assert positions == 4
+    assert frames == [[0, 1], [2, 2], [2, 5], [6, 7]]
+    frames, _ = queue._source_frames(scan, 2)
+    assert frames == [[0, 1], [2, 5]]
+
+
+def write_cylinder_scan(directory, n_projections=48, size=24):
+    # parallel beam projections of a centered cylinder, close enough for the small cone angle
+    recipe = json.loads(json.dumps(RECIPE))
+    writer = ProjectionWriter(str(directory), "phantom", n_projections, metadata=recipe)
+    writer.start()
+    voxel = 0.1
+    u = (np.arange(size) - (size - 1) / 2) * voxel
+    radius = 0.6
+    chord = 2 * np.sqrt(np.clip(radius ** 2 - u ** 2, 0, None))
+    frame = np.tile((10000 * np.exp(-2.0 * chord)).astype(np.uint16), (size, 1))
+    for _ in range(n_projections):
+        writer.put(frame, timeout=5)
+    writer.close()
+    return writer.directory
+
+
+def test_reconstruction_of_a_cylinder(qapp, tmp_path):
+    directory = write_cylinder_scan(tmp_path)
+    queue = ReconstructionQueue(processes=1)
+    results = []
+    queue.finished.connect(lambda job_id, path: results.append(("finished", path)))
+    queue.failed.connect(lambda job_id, error: results.append(("failed", error)))
+    try:
+        queue.submit(directory)
+        assert wait_until(qapp, lambda: results, 120)
+    finally:
+        queue.close()
+    kind, path = results[0]
+    assert kind == "finished", path
+    volume = np.load(path)
+    assert volume.shape == (24, 24, 24)
+    middle = volume[12]
+    # attenuation 2 / mm inside the cylinder, nothing between the cylinder and the edge of the field of view
+    assert middle[10:14, 10:14].mean() == pytest.approx(2.0, rel=0.1)
+    assert np.abs(middle[[12, 12, 2, 21], [2, 21, 12, 12]]).max() < 0.2
+    assert not queue.busy
+    assert sorted(os.listdir(os.path.dirname(path))) == ["phantom_bin1.json", "phantom_bin1.npy"]
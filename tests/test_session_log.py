@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+from opcua import ua
+
+from client_sub import MySubHandler
+from history import to_seconds
+from replay import SessionPlayer
+from session_log import BATCH, SNAPSHOT, SessionLog, SessionRecorder, decode_block, encode_block
+from tests.conftest import wait_until
+
+
+T0 = 1700000000.0
+
+
+def test_block_round_trip():
+    samples = [(T0 + 0.000001, "ns=4;s=a", 1.5, T0 - 0.25, 0),
+               (T0 + 0.5, "ns=4;s=b", True, None, 0x80000000),
+               (T0 + 0.6, "ns=4;s=a", -7, T0 + 0.6, 0),
+               (T0 + 0.7, "ns=4;s=c", "Fehler", T0, 0),
+               (T0 + 0.8, "ns=4;s=c", [1, {"x": 2}], T0, 0),
+               (T0 + 0.9, "ns=4;s=d", None, T0, 0),
+               (T0 + 1.0, "ns=4;s=d", object(), T0, 0)]
+    events = [[T0 + 0.4, "state", 1], [T0 + 0.45, "parameters", {"numberOfPositions": 360}]]
+    block = decode_block(encode_block(samples, events))
+    assert len(block) == len(samples)
+    assert np.allclose(block.times, [sample[0] for sample in samples], rtol=0, atol=1e-6)
+    decoded = block.samples()
+    assert [row[0] for row in decoded] == [sample[1] for sample in samples]
+    assert [row[1] for row in decoded[:6]] == [1.5, True, -7, "Fehler", [1, {"x": 2}], None]
+    assert isinstance(decoded[2][1], int) and isinstance(decoded[1][1], bool)
+    assert decoded[6][1].startswith("<object object")  # kept readable
+    assert abs(to_seconds(decoded[0][2]) - (T0 - 0.25)) < 1e-5
+    assert decoded[1][2] is None
+    assert decoded[1][3] == 0x80000000
+    assert block.events == events
+
+
+def test_block_latest_per_node():
+    samples = [(T0 + i, name, float(i), None, 0) for i, name in enumerate("abab")]
+    block = decode_block(encode_block(samples, []))
+    assert sorted((name, value) for name, value, _, _ in block.latest()) == [("a", 2.0), ("b", 3.0)]
+    assert sorted((name, value) for name, value, _, _ in block.latest(3)) == [("a", 2.0), ("b", 1.0)]
+
+
+def write_session(path):
+    # three batches of one second each and a snapshot after the second one
+    recorder = SessionRecorder(str(path), {"url": "opc.tcp://test"}, flush_interval=3600)
+    recorder._write(BATCH, [(T0 + 0.5, "a", 1.0, None, 0), (T0 + 0.9, "b", 10.0, None, 0)], [[T0 + 0.1, "state", 3]], T0 + 0.1, T0 + 0.9)
+    recorder._write(BATCH, [(T0 + 1.5, "a", 2.0, None, 0)], [[T0 + 1.2, "state", 1]], T0 + 1.2, T0 + 1.5)
+    recorder._write(SNAPSHOT, [(T0 + 0.9, "b", 10.0, None, 0), (T0 + 1.5, "a", 2.0, None, 0)], [[T0 + 1.2, "state", 1]], T0 + 2.0, T0 + 2.0)
+    recorder._write(BATCH, [(T0 + 2.5, "a", 3.0, None, 0), (T0 + 2.8, "b", 20.0, None, 0)], [[T0 + 2.6, "state", 4]], T0 + 2.5, T0 + 2.8)
+    recorder.close()
+    assert recorder.error is None
+
+
+def values(samples):
+    return {name: sample[0] for name, sample in samples.items()}
+
+
+def test_state_at(tmp_path):
+    path = tmp_path / "session.lgs"
+    write_session(path)
+    log = SessionLog(str(path))
+    try:
+        assert log.header["url"] == "opc.tcp://test"
+        assert (log.start, log.end) == (T0 + 0.1, T0 + 2.8)
+        samples, events, position = log.state_at(T0 + 0.7)
+        assert values(samples) == {"a": 1.0}
+        assert events["state"][2] == 3
+        assert position == 0
+        # from the snapshot, the batch after it is not yet reached
+        samples, events, position = log.state_at(T0 + 2.2)
+        assert values(samples) == {"a": 2.0, "b": 10.0}
+        assert events["state"][2] == 1
+        assert log.batches_after(position) == [3]
+        samples, events, position = log.state_at(T0 + 2.6)
+        assert values(samples) == {"a": 3.0, "b": 10.0}
+        assert events["state"][2] == 4
+    finally:
+        log.close()
+
+
+def test_index_is_rebuilt_and_torn_blocks_are_ignored(tmp_path):
+    path = tmp_path / "session.lgs"
+    write_session(path)
+    with open(str(path) + ".idx", 'rb') as f:
+        complete = f.read()
+    os.remove(str(path) + ".idx")
+    with open(path, 'ab') as f:
+        f.write(b"BLK1\x01")  # crash while writing the next block header
+    log = SessionLog(str(path))
+    try:
+        assert log.index.tobytes() == complete
+        assert values(log.state_at(T0 + 2.9)[0]) == {"a": 3.0, "b": 20.0}
+    finally:
+        log.close()
+
+
+def test_recorder_records_notifications_and_events(tmp_path):
+    path = tmp_path / "session.lgs"
+    recorder = SessionRecorder(str(path), flush_interval=3600)
+    node = ua.NodeId.from_string("ns=4;s=OPCUA.bBOOL1")
+    recorder.notification(node, True, None, ua.StatusCode())
+    recorder.event("state", 1)
+    recorder.close()
+    log = SessionLog(str(path))
+    try:
+        samples, events, _ = log.state_at(log.end)
+        assert values(samples) == {"ns=4;s=OPCUA.bBOOL1": True}
+        assert events["state"][2] == 1
+        assert log.index["kind"][0] == BATCH and log.index["kind"][-1] == SNAPSHOT
+    finally:
+        log.close()
+
+
+def test_player_replays_the_state_at_the_start(qapp, tmp_path):
+    path = tmp_path / "session.lgs"
+    recorder = SessionRecorder(str(path), flush_interval=3600)
+    recorder.event("state", 1)  # at log.start
+    recorder.notification(ua.NodeId.from_string("ns=4;s=OPCUA.bBOOL1"), True, None, ua.StatusCode())
+    recorder.event("state", 2)
+    recorder.close()
+    sub_handler = MySubHandler()
+    player = SessionPlayer(SessionLog(str(path)), sub_handler)
+    events = []
+    finished = []
+    player.event_replayed.connect(lambda event_type, data: events.append((event_type, data)))
+    player.finished.connect(lambda: finished.append(True))
+    try:
+        player.play()
+        assert wait_until(qapp, lambda: finished, 5)
+    finally:
+        player.close()
+    assert events == [("state", 1), ("state", 2)]
+    assert sub_handler.get("ns=4;s=OPCUA.bBOOL1")[0] is True
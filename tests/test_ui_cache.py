@@ -0,0 +1,94 @@
+import os
+
+from PyQt6 import QtWidgets
+
+from ui_cache import CompiledUi, split_form
+
+
+FORM = """<?xml version="1.0" encoding="UTF-8"?>
+<ui version="4.0">
+ <class>Form</class>
+ <widget class="QWidget" name="Form">
+  <layout class="QVBoxLayout" name="layout">
+   <item>
+    <widget class="QStackedWidget" name="stack">
+     <widget class="QWidget" name="page_main">
+      <layout class="QVBoxLayout" name="main_layout">
+       <item>
+        <widget class="QLabel" name="title">
+         <property name="text"><string>%s</string></property>
+        </widget>
+       </item>
+      </layout>
+     </widget>
+     <widget class="QWidget" name="page_lazy">
+      <layout class="QVBoxLayout" name="lazy_layout">
+       <item>
+        <widget class="QLineEdit" name="lazy_edit"/>
+       </item>
+      </layout>
+     </widget>
+    </widget>
+   </item>
+  </layout>
+ </widget>
+ <resources/>
+ <connections/>
+</ui>
+"""
+
+
+def write_form(path, title="Titel"):
+    path.write_text(FORM % title, encoding="utf-8")
+    return str(path)
+
+
+def test_split_form_keeps_the_page_empty_in_the_main_form():
+    documents = split_form((FORM % "x").encode(), ["page_lazy"])
+    assert set(documents) == {None, "page_lazy"}
+    assert "lazy_edit" not in documents[None]
+    assert 'name="page_lazy"' in documents[None]
+    assert "<class>page_lazy</class>" in documents["page_lazy"]
+    assert "lazy_edit" in documents["page_lazy"]
+
+
+def test_lazy_page_is_built_on_request(qapp, tmp_path):
+    ui = CompiledUi(write_form(tmp_path / "form.ui"), ["page_lazy"], str(tmp_path / "cache"))
+    widget = QtWidgets.QWidget()
+    ui.setup(widget)
+    assert widget.title.text() == "Titel"
+    assert widget.stack.count() == 2
+    assert not hasattr(widget, "lazy_edit")
+    assert not ui.is_built("page_lazy")
+    assert ui.build_page("page_lazy")
+    assert widget.lazy_edit.parent() is widget.page_lazy
+    assert not ui.build_page("page_lazy")
+
+
+def test_forms_are_compiled_once_and_replaced_when_the_file_changes(qapp, tmp_path):
+    cache = tmp_path / "cache"
+    path = write_form(tmp_path / "form.ui")
+    CompiledUi(path, ["page_lazy"], str(cache)).setup(QtWidgets.QWidget())
+    first = sorted(name for name in os.listdir(cache) if name.endswith(".py"))
+    assert len(first) == 2
+    mtimes = [os.path.getmtime(cache / name) for name in first]
+    CompiledUi(path, ["page_lazy"], str(cache)).setup(QtWidgets.QWidget())
+    assert [os.path.getmtime(cache / name) for name in first] == mtimes
+
+    write_form(tmp_path / "form.ui", "Neu")
+    widget = QtWidgets.QWidget()
+    CompiledUi(path, ["page_lazy"], str(cache)).setup(widget)
+    assert widget.title.text() == "Neu"
+    second = sorted(name for name in os.listdir(cache) if name.endswith(".py"))
+    assert len(second) == 2 and not set(first) & set(second)
+
+
+def test_falls_back_to_load_ui(qapp, tmp_path, capsys):
+    blocked = tmp_path / "cache"
+    blocked.write_text("not a directory")
+    ui = CompiledUi(write_form(tmp_path / "form.ui"), ["page_lazy"], str(blocked))
+    widget = QtWidgets.QWidget()
+    ui.setup(widget)
+    assert widget.lazy_edit.parent() is widget.page_lazy
+    assert ui.is_built("page_lazy")
+    assert "Compiled UI not available" in capsys.readouterr().out
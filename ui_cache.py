@@ -0,0 +1,145 @@
+from PyQt6.QtCore import PYQT_VERSION_STR
+
+import importlib.util
+import os
+import py_compile
+import sys
+import zlib
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".local_gui", "ui_cache")
+FORMAT_VERSION = "1"  # bump when the way forms are split changes
+
+
+class CompiledUi:
+    # A .ui file compiled to Python once and cached, keyed by a checksum of the .ui file and the
+    # PyQt version, so a start imports bytecode instead of parsing the XML. The pages named in
+    # lazy_pages (direct children of a QStackedWidget) are compiled to forms of their own and
+    # stay empty until build_page() is called. Widgets end up as attributes of the target
+    # widget like with uic.loadUi. If the cache cannot be used, the file is loaded with loadUi.
+    def __init__(self, ui_path, lazy_pages=(), cache_dir=DEFAULT_CACHE_DIR):
+        self.ui_path = ui_path
+        self.lazy_pages = list(lazy_pages)
+        self.cache_dir = cache_dir
+        self.widget = None
+        self.paths = {}  # form name (None for the main form) -> path of the generated module
+        self.built = set()
+
+    def setup(self, widget):
+        self.widget = widget
+        try:
+            self.paths = self._compiled_paths()
+            module = self._import(self.paths[None])
+        except Exception as e:
+            print(f"Compiled UI not available, loading {self.ui_path}:", e)
+            from PyQt6 import uic
+            uic.loadUi(self.ui_path, widget)
+            self.built.update(self.lazy_pages)
+            return
+        self._setup_form(module, widget)
+
+    def is_built(self, page_name):
+        return page_name in self.built
+
+    def build_page(self, page_name):
+        # Create the content of a lazy page, returns False if it was already built
+        if page_name in self.built:
+            return False
+        self.built.add(page_name)
+        # the module of the page and its custom widgets are only imported now
+        self._setup_form(self._import(self.paths[page_name]), getattr(self.widget, page_name))
+        return True
+
+    def _setup_form(self, module, target):
+        # the generated class is Ui_<class>, its widgets are copied to the window
+        ui = next(value for name, value in vars(module).items() if name.startswith("Ui_") and isinstance(value, type))()
+        ui.setupUi(target)
+        for name, value in vars(ui).items():
+            setattr(self.widget, name, value)
+
+    def _compiled_paths(self):
+        # {form name: path of the generated module}, compiled if the .ui file changed
+        with open(self.ui_path, 'rb') as f:
+            source = f.read()
+        # a checksum is enough to notice an edited file, hashlib would load OpenSSL at every start
+        key = "%08x%08x" % (zlib.crc32(b"\0".join([PYQT_VERSION_STR.encode(), FORMAT_VERSION.encode(),
+                                                   sys.implementation.cache_tag.encode()] +
+                                                  [name.encode() for name in self.lazy_pages])),
+                            zlib.crc32(source))
+        stem = os.path.splitext(os.path.basename(self.ui_path))[0].replace(".", "_").replace("-", "_")
+        paths = {name: os.path.join(self.cache_dir, f"ui_{stem}_{name + '_' if name else ''}{key}.py")
+                 for name in [None] + self.lazy_pages}
+        if not all(os.path.exists(path) for path in paths.values()):
+            self._compile(source, paths, stem)
+        return paths
+
+    def _import(self, path):
+        # the bytecode written by _compile is in __pycache__ next to the module
+        spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _compile(self, source, paths, stem):
+        from PyQt6 import uic
+        import io
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name, document in split_form(source, self.lazy_pages).items():
+            code = io.StringIO()
+            uic.compileUi(io.StringIO(document), code)
+            temporary = paths[name] + ".tmp"
+            with open(temporary, 'w', encoding="utf-8") as f:
+                f.write(code.getvalue())
+            os.replace(temporary, paths[name])
+            # written even with PYTHONDONTWRITEBYTECODE, the import then only unmarshals the code
+            py_compile.compile(paths[name], doraise=True)
+        # forms of older versions of the .ui file and their bytecode
+        current = {os.path.splitext(os.path.basename(path))[0] for path in paths.values()}
+        for directory in (self.cache_dir, os.path.join(self.cache_dir, "__pycache__")):
+            for file_name in os.listdir(directory) if os.path.isdir(directory) else ():
+                if file_name.startswith(f"ui_{stem}_") and file_name.split(".")[0] not in current:
+                    try:
+                        os.remove(os.path.join(directory, file_name))
+                    except OSError:
+                        pass
+
+
+def split_form(source, page_names):
+    # {None: main form, page name: form of the page} as .ui documents. The pages stay in the
+    # main form as empty widgets so the QStackedWidget keeps its indices.
+    import copy
+    import xml.etree.ElementTree as ET
+    root = ET.fromstring(source)
+    documents = {}
+    for page_name in page_names:
+        page = next((widget for widget in root.iter("widget") if widget.get("name") == page_name), None)
+        if page is None:
+            raise ValueError(f"Seite {page_name} nicht gefunden")
+        form = ET.Element("ui", root.attrib)
+        ET.SubElement(form, "class").text = page_name
+        content = copy.deepcopy(page)
+        content.set("class", "QWidget")
+        form.append(content)
+        for child in page[:]:
+            if child.tag not in ("property", "attribute"):
+                page.remove(child)
+        documents[page_name] = form
+    documents[None] = root
+
+    customwidgets = root.find("customwidgets")
+    for name, form in documents.items():
+        if customwidgets is not None:
+            used = {widget.get("class") for widget in form.iter("widget")}
+            if name is not None:
+                form.append(copy.deepcopy(customwidgets))
+            section = form.find("customwidgets")
+            # pyuic imports every declared custom widget, keep only the ones this form creates
+            for customwidget in section.findall("customwidget"):
+                if customwidget.findtext("class") not in used:
+                    section.remove(customwidget)
+            if not len(section):
+                form.remove(section)
+        if name is not None:
+            ET.SubElement(form, "resources")
+            ET.SubElement(form, "connections")
+    return {name: ET.tostring(form, encoding="unicode") for name, form in documents.items()}